@@ -0,0 +1,54 @@
+# AST benchmark: memory held by a parsed multi-thousand-line program, and the
+# time the type checker, the fused front end and the closure compiler take
+# to walk a large AST.
+# Usage: python -m benchmarks.bench_ast [lines]
+
+import sys
+import time
+import tracemalloc
+from benchmarks.programs import declaration_source, wide_program
+from compiler.ast_nodes import from_dict
+from compiler.frontend import check_program
+from compiler.interpreter import run_program
+from compiler.parser import parse_cascade
+from compiler.semantic_analyzer import analyze_semantics
+from compiler.type_checker import TypeEnv, check_type
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parsed_memory(source):
+    """(retained, peak) bytes allocated while parsing source and keeping its AST."""
+    tracemalloc.start()
+    ast = parse_cascade(source)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ast
+    return retained, peak
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    retained, peak = parsed_memory(declaration_source(lines))
+    print(f"parse {lines} lines: AST {retained / 1024:8.1f} KiB retained, {peak / 1024:8.1f} KiB peak")
+    source = declaration_source(lines)
+    ast = parse_cascade(source)
+    t_parse = best_of(lambda: parse_cascade(source))
+    t_check = best_of(lambda: check_type(ast, TypeEnv()))
+    print(f"parse {t_parse*1000:8.2f} ms, check_type {t_check*1000:8.2f} ms")
+    wide = from_dict(wide_program(lines))
+    t_wide_check = best_of(lambda: check_type(wide, TypeEnv()))
+    t_wide_run = best_of(lambda: run_program(wide))
+    print(f"wide program ({lines} stmts): check_type {t_wide_check*1000:8.2f} ms, "
+          f"compile+run {t_wide_run*1000:8.2f} ms")
+    t_separate = best_of(lambda: (check_type(wide, TypeEnv()), analyze_semantics(wide)))
+    t_fused = best_of(lambda: check_program(wide, TypeEnv()))
+    print(f"front end: check_type + analyze_semantics {t_separate*1000:8.2f} ms, "
+          f"fused {t_fused*1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
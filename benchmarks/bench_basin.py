@@ -0,0 +1,56 @@
+# Basin benchmark: plain lists vs packed DepthBasins for stdlib reductions and
+# element-wise arithmetic, and a list of record dicts vs a columnar
+# ReservoirBasin for projecting a field and taking its stats.
+# Usage: python -m benchmarks.bench_basin [size]
+
+import sys
+import time
+import tracemalloc
+import compiler.stdlib as stdlib
+from compiler.basin import DepthBasin, ReservoirBasin
+
+SAMPLE = {'timestamp': 'rivulet', 'location': 'rivulet', 'ph': 'depth', 'turbidity': 'depth',
+          'temperature': 'depth'}
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    values = [float(i % 1013) for i in range(size)]
+    plain = list(values)
+    packed = DepthBasin.from_values(values)
+    print(f"n={size}, packed storage: {'numpy' if packed.vectorized else 'array'}")
+    cases = [
+        ('sum_basin', lambda b: stdlib.sum_basin(b)),
+        ('avg_basin', lambda b: stdlib.avg_basin(b)),
+        ('max_basin', lambda b: stdlib.max_basin(b)),
+        ('sort_basin', lambda b: stdlib.sort_basin(b)),
+        ('scale', lambda b: b * 2.5 if isinstance(b, DepthBasin) else [x * 2.5 for x in b]),
+    ]
+    for label, fn in cases:
+        t_list = best_of(lambda: fn(plain))
+        t_packed = best_of(lambda: fn(packed))
+        print(f"{label:10} list {t_list*1000:8.2f} ms, packed {t_packed*1000:8.2f} ms "
+              f"({t_list/t_packed:5.1f}x)")
+    records = [{'timestamp': f"t{i % 86400}", 'location': f"site{i % 7}", 'ph': 6.5 + i % 10 / 10,
+                'turbidity': float(i % 5), 'temperature': 12.0 + i % 9} for i in range(size)]
+    columnar = ReservoirBasin.from_records(SAMPLE, records)
+    for label, rows in (('dicts', records), ('columnar', columnar)):
+        elapsed = best_of(lambda: stdlib.stats_basin(stdlib.field_basin(rows, 'ph')))
+        print(f"{label:10} project ph + stats_basin {elapsed*1000:8.2f} ms")
+    for label, build in (('dicts', lambda: [dict(r) for r in records]),
+                         ('columnar', lambda: ReservoirBasin.from_records(SAMPLE, records))):
+        tracemalloc.start()
+        kept = build()
+        size_kib = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+        print(f"{label:10} storage {size_kib:10.1f} KiB for {len(kept)} records")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# CSV ingestion benchmark: peak memory and time of summing one column of a
+# generated sample file, reading the whole file and splitting it on newlines
+# (as csv_parser.pool used to) vs streaming records from csv_records.
+# Usage: python -m benchmarks.bench_csv [rows]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from compiler.csv_records import read_records
+
+FIELDS = {'timestamp': 'rivulet', 'location': 'rivulet', 'ph': 'depth', 'turbidity': 'depth',
+          'temperature': 'depth'}
+
+def make_file(path, rows):
+    with open(path, "w") as f:
+        f.write("timestamp,location,ph,turbidity,temperature\n")
+        for n in range(rows):
+            f.write(f"2024-01-01T{n % 24:02d}:00,site{n % 7},{6.5 + n % 10 / 10},{n % 5},{12 + n % 9}\n")
+
+def split_whole_file(path):
+    with open(path) as f:
+        lines = f.read().split("\n")
+    samples = []
+    for line in lines[1:]:
+        if line.strip():
+            fields = line.split(",")
+            samples.append({'timestamp': fields[0], 'location': fields[1], 'ph': float(fields[2]),
+                            'turbidity': float(fields[3]), 'temperature': float(fields[4])})
+    return sum(sample['ph'] for sample in samples)
+
+def stream_records(path, use_mmap):
+    return sum(record['ph'] for record in read_records(path, FIELDS, use_mmap=use_mmap))
+
+def measure_run(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "samples.csv")
+        make_file(path, rows)
+        for label, fn, args in (("read + split", split_whole_file, (path,)),
+                                ("stream (buffered)", stream_records, (path, False)),
+                                ("stream (mmap)", stream_records, (path, True))):
+            result, elapsed, peak = measure_run(fn, *args)
+            print(f"{label:18s} {rows} rows: {elapsed*1000:8.1f} ms, peak {peak / 1024:10.1f} KiB, sum {result:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Interpreter benchmark: reference tree-walker vs the closure-compiled backend
+# and the bytecode VM.
+# Usage: python -m benchmarks.bench_interpreter [size]
+
+import sys
+import time
+from compiler.interpreter import Env, exec_stmt, run_program
+import compiler.vm as vm
+from benchmarks.programs import loop_program, call_program, nested_program, early_return_program
+
+def run_tree_walker(ast):
+    env = Env()
+    functions = {}
+    types = {}
+    for stmt in ast['body']:
+        exec_stmt(stmt, env, functions, types)
+    return env, functions, types
+
+def best_of(fn, ast, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(ast)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for label, build in (('loop', loop_program), ('calls', call_program), ('nested', nested_program),
+                         ('return', early_return_program)):
+        ast = build(size)
+        tree = best_of(run_tree_walker, ast)
+        closures = best_of(run_program, ast)
+        bytecode = best_of(vm.run_program, ast)
+        print(f"{label:6} n={size}: tree-walker {tree*1000:8.1f} ms, "
+              f"closures {closures*1000:8.1f} ms ({tree/closures:4.2f}x), "
+              f"vm {bytecode*1000:8.1f} ms ({tree/bytecode:4.2f}x)")
+
+if __name__ == "__main__":
+    main()
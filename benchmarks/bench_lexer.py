@@ -0,0 +1,46 @@
+# Lexer benchmark: a materialized token list vs the TokenBuffer the parser
+# reads, on a generated many-thousand-line source.
+# Usage: python -m benchmarks.bench_lexer [lines]
+
+import sys
+import time
+import tracemalloc
+from benchmarks.programs import declaration_source
+from compiler.cascade_parser import Parser
+from compiler.lexer import TokenBuffer, tokenize
+
+def traced(fn):
+    """(result, peak bytes) of fn()."""
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def buffered(source):
+    tokens = TokenBuffer(source)
+    tokens.fill(len(source))
+    return tokens
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    source = declaration_source(lines)
+    tokens, list_peak = traced(lambda: tokenize(source))
+    buffer, buffer_peak = traced(lambda: buffered(source))
+    print(f"{lines} lines, {len(tokens)} tokens")
+    print(f"token list   peak {list_peak / 1024:9.1f} KiB, {best_of(lambda: tokenize(source))*1000:8.2f} ms")
+    print(f"token buffer peak {buffer_peak / 1024:9.1f} KiB, {best_of(lambda: buffered(source))*1000:8.2f} ms")
+    first = best_of(lambda: Parser(source).parse_statement())
+    full = best_of(lambda: Parser(source).parse())
+    print(f"first statement {first*1000:8.3f} ms, full parse {full*1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
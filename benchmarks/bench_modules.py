@@ -0,0 +1,51 @@
+# Module loading benchmark: start-up of a program that opens many channels
+# but calls into one, with lazy loading against compiling every channel up
+# front, and the cost of a second program reusing the process's loader.
+# Usage: python -m benchmarks.bench_modules [channels]
+
+import os
+import sys
+import tempfile
+import time
+from benchmarks.programs import call, num, pour, program
+from compiler.interpreter import run_program
+from compiler.modules import ModuleLoader, check_program
+
+def make_project(root, channels):
+    with open(os.path.join(root, "fountain.config"), "w") as f:
+        f.write("{}")
+    os.makedirs(os.path.join(root, "pools"))
+    for n in range(channels):
+        with open(os.path.join(root, "pools", f"m{n}.pool"), "w") as f:
+            for k in range(60):
+                f.write(f"pool p{n}_{k}(x:depth, y:depth):depth {{\n  pour x into r\n  return y\n}}\n")
+    imports = [{'type': 'ImportStatement', 'path': f"pools.m{n}"} for n in range(channels)]
+    return program(*imports, pour('v', call('p0_1', num(1), num(2))))
+
+def start(loader, ast, eager=False):
+    channels = loader.channels(ast)
+    if eager:
+        for name in channels.names:
+            loader.load(name)
+    check_program(ast, channels)
+    env, _, _ = run_program(ast, channels.functions())
+    return env
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as root:
+        ast = make_project(root, count)
+        for eager in (True, False):
+            loader = ModuleLoader(root)
+            begin = time.perf_counter()
+            env = start(loader, ast, eager)
+            elapsed = time.perf_counter() - begin
+            assert env.get('v') == 2.0
+            label = "compile every channel" if eager else "lazy loading"
+            print(f"{count} channels, {label:22s} {elapsed*1000:8.2f} ms ({len(loader.modules)} compiled)")
+        begin = time.perf_counter()
+        start(loader, ast)
+        print(f"second program, same loader {'':8s} {(time.perf_counter() - begin)*1000:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Parallel benchmark: a CPU-bound reduction with its partitions run in-process
+# against `cycle ... in parallel` on worker processes, and the stdlib's
+# map_basin/reduce_basin against their chunked parallel_* counterparts.
+# Usage: python -m benchmarks.bench_parallel [elements] [workers]
+
+import os
+import sys
+import time
+import compiler.interpreter as interpreter
+import compiler.stdlib as stdlib
+from compiler.interpreter import run_program
+from benchmarks.programs import binop, call, cycle, fill, ident, num, pool, pour, program, ret
+
+def make_program(n, work=200):
+    # Each element calls a pool that loops `work` times, so partitions dominate shipping cost.
+    body = [pour('acc', num(0)),
+            cycle({'type': 'ListLiteral', 'elements': [num(k) for k in range(work)]}, 'k', [
+                pour('step', binop('*', ident('x'), ident('k'))),
+            ]),
+            ret(binop('*', ident('x'), ident('x')))]
+    return program(
+        pool('work', [('x', 'depth')], 'depth', body),
+        pour('total', num(0)),
+        cycle({'type': 'ListLiteral', 'elements': [num(i) for i in range(n)]}, 'x', [
+            fill('total', binop('+', ident('total'), call('work', ident('x')))),
+        ], parallel=True),
+    )
+
+def work(x):
+    total = 0.0
+    for k in range(200):
+        total += (x * k) % 7
+    return total
+
+def add(a, b):
+    return a + b
+
+def timed_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def timed(ast):
+    start = time.perf_counter()
+    env, _, _ = run_program(ast)
+    return env.get('total'), time.perf_counter() - start
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    ast = make_program(n)
+    interpreter.set_parallel_workers(1)
+    serial, serial_time = timed(ast)
+    interpreter.set_parallel_workers(workers)
+    timed(ast)  # start the worker processes
+    parallel, parallel_time = timed(ast)
+    assert parallel == serial
+    print(f"{n} elements: in-process {serial_time*1000:8.1f} ms, {workers} worker(s) {parallel_time*1000:8.1f} ms")
+    interpreter.set_parallel_workers(None)
+    data = list(range(n * 10))
+    serial, serial_time = timed_call(lambda: stdlib.reduce_basin(stdlib.map_basin(data, work), add, 0))
+    stdlib.parallel_map_basin(data[:workers * 2], work, workers=workers)  # start the worker processes
+    parallel, parallel_time = timed_call(lambda: stdlib.parallel_reduce_basin(
+        stdlib.parallel_map_basin(data, work, workers=workers), add, 0, associative=True, workers=workers))
+    assert parallel == serial
+    print(f"{len(data)} items map+reduce: sequential {serial_time*1000:8.1f} ms, "
+          f"{workers} worker(s) {parallel_time*1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Project build benchmark: compiling every source of a generated project
+# in-process and on worker processes, against loading each channel through
+# the module loader one after another.
+# Usage: python -m benchmarks.bench_project [files] [workers]
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from compiler.modules import ModuleLoader
+from compiler.project import build_project
+
+def make_project(root, files):
+    with open(os.path.join(root, "fountain.config"), "w") as f:
+        f.write('{"entry": "main.casc"}')
+    os.makedirs(os.path.join(root, "pools"))
+    for n in range(files):
+        with open(os.path.join(root, "pools", f"m{n}.pool"), "w") as f:
+            if n:
+                f.write(f"open channel pools.m{n - 1}\n")
+            for k in range(40):
+                f.write(f"pool p{n}_{k}(x:depth, y:depth):depth {{\n  pour x into r:depth\n  return y\n}}\n")
+    with open(os.path.join(root, "main.casc"), "w") as f:
+        f.write("".join(f"open channel pools.m{n}\n" for n in range(files)) + "pour 1 into done:depth\n")
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def load_all(root, files):
+    loader = ModuleLoader(root)
+    for n in range(files):
+        loader.load(f"pools.m{n}")
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as root:
+        make_project(root, files)
+        _, loaded = timed(load_all, root, files)
+        build, serial = timed(build_project, root)
+        assert not build.errors, build.errors[:3]
+        with ProcessPoolExecutor(workers) as executor:
+            # Start the workers before timing, as a build server would keep them.
+            list(executor.map(abs, range(workers)))
+            _, parallel = timed(build_project, root, executor)
+    print(f"{files} files: module loader {loaded*1000:8.1f} ms, build in-process {serial*1000:8.1f} ms, "
+          f"{workers} workers {parallel*1000:8.1f} ms ({serial / parallel:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Stream basin benchmark: peak memory and time of a filter -> map -> reduce
+# chain, eager lists vs fused lazy streams.
+# Usage: python -m benchmarks.bench_stream [size]
+
+import sys
+import time
+import tracemalloc
+import compiler.stdlib as stdlib
+
+def pipeline(source, lazy):
+    kept = stdlib.filter_basin(source, lambda x: x % 3 != 0, lazy=lazy)
+    scaled = stdlib.map_basin(kept, lambda x: x * 0.5, lazy=lazy)
+    return stdlib.reduce_basin(scaled, lambda acc, x: acc + x, 0)
+
+def measure_run(size, lazy):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = pipeline(range(size), lazy)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for lazy in (False, True):
+        result, elapsed, peak = measure_run(size, lazy)
+        print(f"{'lazy' if lazy else 'eager':5} n={size}: {elapsed*1000:8.1f} ms, "
+              f"peak {peak / 1024:10.1f} KiB, result {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Type checker benchmark: check_type over large literal tables, deeply nested
+# list literals and long expression chains, first run and re-check of the
+# same AST (closed subtrees keep their inferred type on the node).
+# Usage: python -m benchmarks.bench_types [rows]
+
+import sys
+import time
+from benchmarks.programs import deep_expression_program, nested_list_program, table_program
+from compiler.ast_nodes import from_dict
+from compiler.type_checker import TypeEnv, check_type
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def report(label, ast):
+    first = timed(lambda: check_type(ast, TypeEnv()))
+    again = min(timed(lambda: check_type(ast, TypeEnv())) for _ in range(5))
+    print(f"{label:32s} first {first*1000:9.2f} ms, re-check {again*1000:9.2f} ms")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sys.setrecursionlimit(10000)
+    report(f"table {rows}x50", from_dict(table_program(rows, 50)))
+    for depth in (12, 16):
+        report(f"nested list, depth {depth}", from_dict(nested_list_program(depth)))
+    report("expression chain, 1000 deep", from_dict(deep_expression_program(1000)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Workspace index benchmark: initial indexing of a generated project serially
+# and on worker processes, a no-change refresh, and cross-file definition
+# lookups against re-scanning the workspace per request.
+# Usage: python -m benchmarks.bench_workspace [files]
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from compiler.workspace import WorkspaceIndex
+
+def make_workspace(root, files):
+    with open(os.path.join(root, "fountain.config"), "w") as f:
+        f.write('{"channels": []}')
+    os.makedirs(os.path.join(root, "pools"))
+    for n in range(files):
+        with open(os.path.join(root, "pools", f"m{n}.pool"), "w") as f:
+            for k in range(40):
+                f.write(f"pool p{n}_{k}(x:depth, y:depth):depth {{\n  pour x into r\n  pour y into s\n}}\n")
+    with open(os.path.join(root, "main.casc"), "w") as f:
+        f.write("".join(f"open channel pools.m{n}\n" for n in range(files)))
+    return os.path.join(root, "main.casc")
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def rescan_definition(root, path, name):
+    index = WorkspaceIndex(root)
+    index.refresh()
+    return index.definition(path, name)
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    with tempfile.TemporaryDirectory() as root:
+        main_path = make_workspace(root, files)
+        _, serial = timed(WorkspaceIndex(root).refresh)
+        index = WorkspaceIndex(root)
+        with ProcessPoolExecutor() as executor:
+            _, pooled = timed(index.refresh, executor)
+        print(f"{files} files: index serially {serial*1000:8.1f} ms, on {os.cpu_count()} worker(s) {pooled*1000:8.1f} ms")
+        _, unchanged = timed(index.refresh)
+        print(f"refresh with no changes {unchanged*1000:8.1f} ms")
+        name = f"p{files - 1}_39"
+        _, indexed = timed(lambda: [index.definition(main_path, name) for _ in range(100)])
+        _, rescan = timed(rescan_definition, root, main_path, name)
+        print(f"definition lookup {indexed*10:8.4f} ms indexed, {rescan*1000:8.1f} ms re-scanning the workspace")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Synthetic Cascade programs for benchmarks.
+# The hand-written parser only covers a subset of the grammar, so loop-heavy
+# programs are built directly as AST dicts in the shape cascade.pegjs produces;
+# every consumer accepts them through ast_nodes.from_dict.
+
+def num(value):
+    return {'type': 'NumberLiteral', 'value': float(value)}
+
+def ident(name):
+    return {'type': 'Identifier', 'value': name}
+
+def binop(op, left, right):
+    return {'type': 'BinaryExpr', 'operator': op, 'left': left, 'right': right}
+
+def call(name, *args):
+    return {'type': 'FunctionCall', 'name': name, 'args': list(args)}
+
+def pour(name, value, declared_type=None):
+    return {'type': 'VariableDeclaration', 'name': name, 'value': value, 'declaredType': declared_type}
+
+def fill(name, value):
+    return {'type': 'Assignment', 'name': name, 'value': value}
+
+def ret(value):
+    return {'type': 'ReturnStatement', 'value': value}
+
+def cycle(collection, element, body, parallel=False):
+    return {'type': 'CycleStatement', 'collection': collection, 'element': element, 'body': body,
+            'parallel': parallel}
+
+def when(condition, body, otherwise=None):
+    return {'type': 'IfStatement', 'whens': [{'condition': condition, 'body': body}],
+            'otherwise': {'body': otherwise} if otherwise is not None else None}
+
+def pool(name, params, return_type, body):
+    return {'type': 'FunctionDeclaration', 'name': name,
+            'params': [{'name': p, 'type': t} for p, t in params],
+            'returnType': return_type, 'body': body}
+
+def depth_list(n):
+    return {'type': 'ListLiteral', 'elements': [num(i % 97) for i in range(n)]}
+
+def program(*stmts):
+    return {'type': 'Program', 'body': list(stmts)}
+
+def loop_program(n):
+    """A `cycle through` over n samples doing arithmetic and a branch per element."""
+    return program(
+        pour('samples', depth_list(n), '[depth]'),
+        cycle(ident('samples'), 's', [
+            pour('scaled', binop('*', binop('+', ident('s'), num(1)), num(2)), 'depth'),
+            when(binop('>', ident('scaled'), num(100)),
+                 [pour('flag', {'type': 'BooleanLiteral', 'value': True}, 'drop')],
+                 [pour('flag', {'type': 'BooleanLiteral', 'value': False}, 'drop')]),
+        ]),
+    )
+
+def call_program(n):
+    """A loop calling a small user pool once per element."""
+    return program(
+        pool('clamp', [('x', 'depth'), ('hi', 'depth')], 'depth', [
+            when(binop('>', ident('x'), ident('hi')), [ret(ident('hi'))]),
+            ret(ident('x')),
+        ]),
+        pour('samples', depth_list(n), '[depth]'),
+        cycle(ident('samples'), 's', [
+            pour('c', call('clamp', ident('s'), num(50)), 'depth'),
+        ]),
+    )
+
+def nested_program(n, depth=3):
+    """Cycles nested depth deep, the innermost reading variables from every level."""
+    outer = max(2, round(n ** (1.0 / depth)))
+    body = [pour('acc', binop('+', ident('base'), ident(f'x{depth - 1}')))]
+    for level in reversed(range(depth)):
+        body = [cycle(ident('xs'), f'x{level}', body)]
+    return program(
+        pour('base', num(1), 'depth'),
+        pour('xs', depth_list(outer), '[depth]'),
+        *body,
+    )
+
+def early_return_program(n):
+    """Pool calls that return from inside a try block nested in a cycle."""
+    return program(
+        pool('first_above', [('limit', 'depth')], 'depth', [
+            {'type': 'TryCatchStatement',
+             'tryBlock': [cycle(ident('probe'), 'p', [when(binop('>', ident('p'), ident('limit')), [ret(ident('p'))])])],
+             'errVar': 'e',
+             'catchBlock': [ret(num(-1))]},
+            ret(num(0)),
+        ]),
+        pour('probe', depth_list(8), '[depth]'),
+        pour('samples', depth_list(n), '[depth]'),
+        cycle(ident('samples'), 's', [
+            pour('hit', call('first_above', num(3)), 'depth'),
+        ]),
+    )
+
+def wide_program(n):
+    """n straight-line declarations, each an expression over the previous two."""
+    stmts = [pour('v0', num(1), 'depth'), pour('v1', num(2), 'depth')]
+    for i in range(2, n):
+        value = binop('+', binop('*', ident(f'v{i - 1}'), num(0.5)), binop('-', ident(f'v{i - 2}'), num(i % 7)))
+        stmts.append(pour(f'v{i}', value, 'depth'))
+    return program(*stmts)
+
+def declaration_source(n):
+    """Cascade source the hand-written parser accepts: n lines of pours and pools."""
+    lines = []
+    for i in range(n):
+        if i % 10 == 9:
+            lines.append(f'pool f{i}(a:depth, b:depth):depth {{ pour {i} into t:depth }}')
+        else:
+            lines.append(f'pour {i}.5 into v{i}:depth' if i % 2 else f'pour "s{i}" into v{i}:rivulet')
+    return "\n".join(lines) + "\n"
+
+def table_program(rows, cols):
+    """A pour of a rows x cols literal table: a list of lists of depths."""
+    table = {'type': 'ListLiteral', 'elements': [
+        {'type': 'ListLiteral', 'elements': [num((r * cols + c) % 97) for c in range(cols)]} for r in range(rows)]}
+    return program(pour('table', table, '[[depth]]'))
+
+def nested_list_program(depth):
+    """A pour of a list nested depth deep, [[...[1]...]]."""
+    value = num(1)
+    for _ in range(depth):
+        value = {'type': 'ListLiteral', 'elements': [value, value]}
+    return program(pour('nested', value))
+
+def deep_expression_program(depth):
+    """A pour of a left-deep chain of depth additions over a variable."""
+    value = ident('x')
+    for i in range(depth):
+        value = binop('+', value, binop('*', num(i % 7), ident('x')))
+    return program(pour('x', num(1), 'depth'), pour('y', value, 'depth'))
+
+def literal_source(n, width=100):
+    """Cascade source pouring n depths as `[depth]` literals of width elements per line.
+
+    The lexer reads it; the hand-written parser has no list literals.
+    """
+    lines = []
+    for start in range(0, n, width):
+        values = ", ".join(f"{i % 1013}.25" for i in range(start, min(n, start + width)))
+        lines.append(f"pour [{values}] into samples{start // width}:[depth]")
+    return "\n".join(lines) + "\n"
+
+SAMPLE_FIELDS = {'timestamp': 'rivulet', 'location': 'rivulet', 'ph': 'depth', 'turbidity': 'depth',
+                 'temperature': 'depth'}
+
+def sample_records(n):
+    """n water-sample records with the SAMPLE_FIELDS fields."""
+    return [{'timestamp': f"t{i % 86400}", 'location': f"site{i % 7}", 'ph': 6.5 + i % 10 / 10,
+             'turbidity': float(i % 5), 'temperature': 12.0 + i % 9} for i in range(n)]
+
+def append_program(n):
+    """n top-level `fill acc with acc + [k]` statements, the bench_append idiom as a whole program.
+
+    They share one frame, so the list can grow in place; an assignment in a
+    cycle body would bind a new variable in the body's own scope instead.
+    """
+    one = lambda k: {'type': 'ListLiteral', 'elements': [num(k % 97)]}
+    return program(pour('acc', {'type': 'ListLiteral', 'elements': []}),
+                   *[fill('acc', binop('+', ident('acc'), one(k))) for k in range(n)])
@@ -0,0 +1,161 @@
+# Benchmark suite: times tokenize, parse, check_type, analyze_semantics,
+# run_program (on the interpreter and, as vm_run_program, on the bytecode VM)
+# and the stdlib basin functions separately, on generated programs whose
+# size scales with --scale, and writes the timings as JSON.
+# Every repeat gets a freshly built input, outside the timed region, so state
+# a run leaves on its input (remembered types, say) never speeds up the next.
+# With --compare, each case is checked against a stored result file and the
+# run exits 1 when any is slower than the baseline by more than --tolerance.
+# Usage: python -m benchmarks.suite [--scale S] [--repeat N] [--filter TEXT]
+#            [--output results.json] [--compare baseline.json] [--tolerance 0.25]
+
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import compiler.stdlib as stdlib
+from benchmarks.programs import (
+    SAMPLE_FIELDS, append_program, call_program, declaration_source, deep_expression_program, literal_source,
+    loop_program, nested_list_program, nested_program, sample_records, table_program, wide_program,
+)
+from compiler.ast_nodes import from_dict
+from compiler.basin import DepthBasin, ReservoirBasin
+from compiler.interpreter import run_program
+from compiler.lexer import tokenize
+from compiler.parser import parse_cascade
+from compiler.semantic_analyzer import analyze_semantics
+from compiler.type_checker import TypeEnv, check_type
+import compiler.vm as vm
+
+FORMAT = 1
+
+def cases(scale=1.0):
+    """(name, setup, run) for every benchmark; run(setup()) is what is timed."""
+    def size(n):
+        return max(1, round(n * scale))
+    # Each level doubles the list, so depth grows with the log of the scale.
+    depth = max(2, 12 + round(math.log2(scale)))
+    declarations = declaration_source(size(20000))
+    literals = literal_source(size(200000))
+    programs = [
+        ('wide', lambda: wide_program(size(5000))),
+        ('table', lambda: table_program(size(500), 50)),
+        ('nested_list', lambda: nested_list_program(depth)),
+        ('deep_expression', lambda: deep_expression_program(min(size(500), 2000))),
+        ('calls', lambda: call_program(size(5000))),
+    ]
+    result = [
+        ('tokenize.declarations', lambda: declarations, tokenize),
+        ('tokenize.depth_literals', lambda: literals, tokenize),
+        ('parse.declarations', lambda: declarations, parse_cascade),
+    ]
+    for name, build in programs:
+        result.append((f'check_type.{name}', lambda build=build: from_dict(build()),
+                       lambda ast: check_type(ast, TypeEnv())))
+    for name, build in programs:
+        result.append((f'analyze_semantics.{name}', lambda build=build: from_dict(build()), analyze_semantics))
+    runs = [
+        ('loop', lambda: loop_program(size(100000))),
+        ('calls', lambda: call_program(size(50000))),
+        ('nested', lambda: nested_program(size(100000))),
+        ('wide', lambda: wide_program(size(5000))),
+        # Quadratic unless `fill acc with acc + [x]` extends the list in place.
+        ('append', lambda: append_program(size(20000))),
+    ]
+    for engine, run in (('run_program', run_program), ('vm_run_program', vm.run_program)):
+        for name, build in runs:
+            result.append((f'{engine}.{name}', lambda build=build: from_dict(build()), run))
+    values = [float(i % 1013) for i in range(size(1000000))]
+    few = values[:size(100000)]
+    records = sample_records(size(100000))
+    for name, setup, run in (
+            ('sum_basin', lambda: DepthBasin(values), stdlib.sum_basin),
+            ('stats_basin', lambda: DepthBasin(values), stdlib.stats_basin),
+            ('median_basin', lambda: DepthBasin(values), stdlib.median_basin),
+            ('sort_basin', lambda: DepthBasin(values), stdlib.sort_basin),
+            ('map_basin', lambda: few, lambda basin: stdlib.map_basin(basin, lambda x: x * 2)),
+            ('filter_basin', lambda: few, lambda basin: stdlib.filter_basin(basin, lambda x: x > 500)),
+            ('reduce_basin', lambda: few, lambda basin: stdlib.reduce_basin(basin, lambda a, x: a + x, 0.0)),
+            ('from_records', lambda: records, lambda rows: ReservoirBasin.from_records(SAMPLE_FIELDS, rows)),
+            ('field_stats', lambda: ReservoirBasin.from_records(SAMPLE_FIELDS, records),
+             lambda rows: stdlib.stats_basin(stdlib.field_basin(rows, 'ph')))):
+        result.append((f'stdlib.{name}', setup, run))
+    return result
+
+def measure(setup, run, repeat):
+    """Seconds taken by run(setup()), for each of repeat fresh setups."""
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_suite(scale=1.0, repeat=5, pattern=None, log=None):
+    """The result document for the cases whose name contains pattern (all when None)."""
+    results = {}
+    for name, setup, run in cases(scale):
+        if pattern and pattern not in name:
+            continue
+        times = measure(setup, run, repeat)
+        results[name] = {'best': min(times), 'median': statistics.median(times)}
+        if log:
+            log(f"{name:34s} best {min(times) * 1000:10.3f} ms, median {statistics.median(times) * 1000:10.3f} ms")
+    return {'format': FORMAT, 'python': platform.python_version(), 'scale': scale, 'repeat': repeat,
+            'results': results}
+
+def compare(current, baseline, tolerance=0.25):
+    """(name, baseline seconds, current seconds, ratio) for each case slower than baseline by more than tolerance.
+
+    Best times are compared, being the least disturbed by other load.
+    """
+    regressions = []
+    for name, timing in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = timing['best'] / base['best'] if base['best'] else math.inf
+        if ratio > 1 + tolerance:
+            regressions.append((name, base['best'], timing['best'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cascade benchmark suite")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every generated input size")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case; the best is kept")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag cases slower than this results file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline, as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(10000)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != args.scale:
+            print(f"warning: baseline was taken at scale {baseline.get('scale')}, this run is at {args.scale}")
+    current = run_suite(args.scale, args.repeat, args.filter, log=print)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if baseline is None:
+        return 0
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing and not args.filter:
+        print(f"not in this run: {', '.join(missing)}")
+    regressions = compare(current, baseline, args.tolerance)
+    for name, base, now, ratio in regressions:
+        print(f"REGRESSION {name}: {base * 1000:.3f} ms -> {now * 1000:.3f} ms ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No case slower than the baseline by more than {args.tolerance:.0%}.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,38 +2,69 @@
 
 import sys
 from compiler.parser import parse_cascade
-from compiler.type_checker import check_type, TypeEnv, TypeError
-from compiler.semantic_analyzer import analyze_semantics, SemanticError
+from compiler.type_checker import TypeError
+from compiler.semantic_analyzer import SemanticError
 from compiler.interpreter import run_program, CascadeRuntimeError
+from compiler.cache import CompilationCache
+from compiler.modules import ModuleError, ModuleLoader, check_program, dependency_stamp
+from compiler.optimizer import optimize
 import compiler.diagnostics as diagnostics
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: cascade <source_file>")
+def open_channels(loader, ast):
+    """The channels ast opens, exiting with a diagnostic if one cannot be resolved."""
+    try:
+        return loader.channels(ast)
+    except ModuleError as e:
+        diagnostics.report_error(str(e))
         sys.exit(1)
-    source_file = sys.argv[1]
-    with open(source_file, "r") as f:
-        code = f.read()
 
+def check_source(code, loader):
+    """Parse, type-check and analyze code, exiting with a diagnostic on failure."""
     try:
         ast = parse_cascade(code)
     except Exception as e:
         diagnostics.syntax_error(str(e))
         sys.exit(1)
-    type_env = TypeEnv()
+    channels = open_channels(loader, ast)
     try:
-        check_type(ast, type_env)
+        check_program(ast, channels)
+    except ModuleError as e:
+        diagnostics.report_error(str(e))
+        sys.exit(1)
     except TypeError as e:
         diagnostics.type_error(str(e))
         sys.exit(1)
-    try:
-        analyze_semantics(ast)
     except SemanticError as e:
         diagnostics.semantic_error(str(e))
         sys.exit(1)
+    return ast, channels
 
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: cascade <source_file>")
+        sys.exit(1)
+    source_file = sys.argv[1]
+    with open(source_file, "r") as f:
+        code = f.read()
+
+    cache = CompilationCache()
+    loader = ModuleLoader.for_source(source_file, cache)
     try:
-        env, functions, types = run_program(ast)
+        ast = cache.load(source_file, code, lambda ast: dependency_stamp(loader.channels(ast)))
+        if ast is None:
+            ast, channels = check_source(code, loader)
+            cache.store(source_file, code, ast, dependency_stamp(channels))
+        else:
+            channels = open_channels(loader, ast)
+    except ModuleError as e:
+        diagnostics.report_error(str(e))
+        sys.exit(1)
+
+    try:
+        env, functions, types = run_program(optimize(ast), channels.functions())
+    except ModuleError as e:
+        diagnostics.report_error(str(e))
+        sys.exit(1)
     except CascadeRuntimeError as e:
         diagnostics.runtime_error(str(e))
         sys.exit(1)
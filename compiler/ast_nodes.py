@@ -0,0 +1,443 @@
+# Typed AST for Cascade.
+# Every node is a __slots__ object with an integer KIND tag and the same field
+# names the dict AST used (see cascade.pegjs). Nodes also answer read-only
+# mapping lookups (node['type'], node.get('name')) and convert to and from the
+# dict form with to_dict/from_dict, so dict-based consumers keep working.
+# Parsed nodes (and params) also carry a source span, (line, col, end_line,
+# end_col) with 1-based lines and 0-based columns; it is not an AST field, so
+# it takes no part in equality. Nor does `inferred`, where the type checker
+# remembers the type of an expression that does not depend on its scope; it
+# is None until then.
+
+class Node:
+    """Base class of all AST nodes."""
+    __slots__ = ('span', 'inferred')
+    KIND = -1
+    TYPE = 'Node'
+    FIELDS = ()
+    # Fields holding records (or lists of records) rather than nodes.
+    RECORDS = {}
+
+    @property
+    def type(self):
+        return self.TYPE
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.TYPE
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        value = self[key] if key in self else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key == 'type' or key in self.FIELDS
+
+    def keys(self):
+        return ('type',) + self.FIELDS
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Positional fields then span, as __init__ takes them; much smaller and
+        # faster to pickle than the generic slots state.
+        return (type(self), tuple([getattr(self, f) for f in self.FIELDS]) + (self.span,))
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.FIELDS)
+        return f"{self.TYPE}({fields})"
+
+class Record:
+    """Base class of the plain sub-structures of nodes (params, when blocks, ...)."""
+    __slots__ = ('span',)
+    FIELDS = ()
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in self.FIELDS else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.FIELDS
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (type(self), tuple([getattr(self, f) for f in self.FIELDS]) + (self.span,))
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+class Param(Record):
+    __slots__ = FIELDS = ('name', 'type')
+
+    def __init__(self, name=None, type=None, span=None):
+        self.name = name
+        self.type = type
+        self.span = span
+
+class Field(Record):
+    __slots__ = FIELDS = ('name', 'type')
+
+    def __init__(self, name=None, type=None, span=None):
+        self.name = name
+        self.type = type
+        self.span = span
+
+class MapPair(Record):
+    __slots__ = FIELDS = ('key', 'value')
+
+    def __init__(self, key=None, value=None, span=None):
+        self.key = key
+        self.value = value
+        self.span = span
+
+class When(Record):
+    __slots__ = FIELDS = ('condition', 'body')
+
+    def __init__(self, condition=None, body=None, span=None):
+        self.condition = condition
+        self.body = body
+        self.span = span
+
+class Otherwise(Record):
+    __slots__ = FIELDS = ('body',)
+
+    def __init__(self, body=None, span=None):
+        self.body = body
+        self.span = span
+
+# Node kinds, in the order of NODE_CLASSES.
+(PROGRAM, VARIABLE_DECLARATION, ASSIGNMENT, CONSTANT_DECLARATION, IF_STATEMENT, CYCLE_STATEMENT,
+    FUNCTION_DECLARATION, TYPE_DECLARATION, IMPORT_STATEMENT, TRY_CATCH_STATEMENT, THROW_STATEMENT,
+    RETURN_STATEMENT, EXPRESSION_STATEMENT, NUMBER_LITERAL, STRING_LITERAL, BOOLEAN_LITERAL, LIST_LITERAL,
+    MAP_LITERAL, IDENTIFIER, FUNCTION_CALL, BINARY_EXPR, PATTERN) = range(22)
+
+class Program(Node):
+    __slots__ = FIELDS = ('body',)
+    KIND = PROGRAM
+    TYPE = 'Program'
+
+    def __init__(self, body=None, span=None):
+        self.body = body
+        self.span = span
+        self.inferred = None
+
+class VariableDeclaration(Node):
+    __slots__ = FIELDS = ('name', 'value', 'declaredType')
+    KIND = VARIABLE_DECLARATION
+    TYPE = 'VariableDeclaration'
+
+    def __init__(self, name=None, value=None, declaredType=None, span=None):
+        self.name = name
+        self.value = value
+        self.declaredType = declaredType
+        self.span = span
+        self.inferred = None
+
+class Assignment(Node):
+    __slots__ = FIELDS = ('name', 'value')
+    KIND = ASSIGNMENT
+    TYPE = 'Assignment'
+
+    def __init__(self, name=None, value=None, span=None):
+        self.name = name
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class ConstantDeclaration(Node):
+    __slots__ = FIELDS = ('name', 'value')
+    KIND = CONSTANT_DECLARATION
+    TYPE = 'ConstantDeclaration'
+
+    def __init__(self, name=None, value=None, span=None):
+        self.name = name
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class IfStatement(Node):
+    __slots__ = FIELDS = ('whens', 'otherwise')
+    KIND = IF_STATEMENT
+    TYPE = 'IfStatement'
+    RECORDS = {'whens': When, 'otherwise': Otherwise}
+
+    def __init__(self, whens=None, otherwise=None, span=None):
+        self.whens = whens
+        self.otherwise = otherwise
+        self.span = span
+        self.inferred = None
+
+class CycleStatement(Node):
+    __slots__ = FIELDS = ('collection', 'element', 'body', 'parallel')
+    KIND = CYCLE_STATEMENT
+    TYPE = 'CycleStatement'
+
+    def __init__(self, collection=None, element=None, body=None, parallel=None, span=None):
+        self.collection = collection
+        self.element = element
+        self.body = body
+        self.parallel = parallel
+        self.span = span
+        self.inferred = None
+
+class FunctionDeclaration(Node):
+    __slots__ = FIELDS = ('name', 'params', 'returnType', 'body')
+    KIND = FUNCTION_DECLARATION
+    TYPE = 'FunctionDeclaration'
+    RECORDS = {'params': Param}
+
+    def __init__(self, name=None, params=None, returnType=None, body=None, span=None):
+        self.name = name
+        self.params = params
+        self.returnType = returnType
+        self.body = body
+        self.span = span
+        self.inferred = None
+
+class TypeDeclaration(Node):
+    __slots__ = FIELDS = ('name', 'fields')
+    KIND = TYPE_DECLARATION
+    TYPE = 'TypeDeclaration'
+    RECORDS = {'fields': Field}
+
+    def __init__(self, name=None, fields=None, span=None):
+        self.name = name
+        self.fields = fields
+        self.span = span
+        self.inferred = None
+
+class ImportStatement(Node):
+    __slots__ = FIELDS = ('path',)
+    KIND = IMPORT_STATEMENT
+    TYPE = 'ImportStatement'
+
+    def __init__(self, path=None, span=None):
+        self.path = path
+        self.span = span
+        self.inferred = None
+
+class TryCatchStatement(Node):
+    __slots__ = FIELDS = ('tryBlock', 'errVar', 'catchBlock')
+    KIND = TRY_CATCH_STATEMENT
+    TYPE = 'TryCatchStatement'
+
+    def __init__(self, tryBlock=None, errVar=None, catchBlock=None, span=None):
+        self.tryBlock = tryBlock
+        self.errVar = errVar
+        self.catchBlock = catchBlock
+        self.span = span
+        self.inferred = None
+
+class ThrowStatement(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = THROW_STATEMENT
+    TYPE = 'ThrowStatement'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class ReturnStatement(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = RETURN_STATEMENT
+    TYPE = 'ReturnStatement'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class ExpressionStatement(Node):
+    __slots__ = FIELDS = ('expression',)
+    KIND = EXPRESSION_STATEMENT
+    TYPE = 'ExpressionStatement'
+
+    def __init__(self, expression=None, span=None):
+        self.expression = expression
+        self.span = span
+        self.inferred = None
+
+class NumberLiteral(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = NUMBER_LITERAL
+    TYPE = 'NumberLiteral'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class StringLiteral(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = STRING_LITERAL
+    TYPE = 'StringLiteral'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class BooleanLiteral(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = BOOLEAN_LITERAL
+    TYPE = 'BooleanLiteral'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class ListLiteral(Node):
+    __slots__ = FIELDS = ('elements',)
+    KIND = LIST_LITERAL
+    TYPE = 'ListLiteral'
+
+    def __init__(self, elements=None, span=None):
+        self.elements = elements
+        self.span = span
+        self.inferred = None
+
+class MapLiteral(Node):
+    __slots__ = FIELDS = ('pairs',)
+    KIND = MAP_LITERAL
+    TYPE = 'MapLiteral'
+    RECORDS = {'pairs': MapPair}
+
+    def __init__(self, pairs=None, span=None):
+        self.pairs = pairs
+        self.span = span
+        self.inferred = None
+
+class Identifier(Node):
+    __slots__ = FIELDS = ('value',)
+    KIND = IDENTIFIER
+    TYPE = 'Identifier'
+
+    def __init__(self, value=None, span=None):
+        self.value = value
+        self.span = span
+        self.inferred = None
+
+class FunctionCall(Node):
+    __slots__ = FIELDS = ('name', 'args')
+    KIND = FUNCTION_CALL
+    TYPE = 'FunctionCall'
+
+    def __init__(self, name=None, args=None, span=None):
+        self.name = name
+        self.args = args
+        self.span = span
+        self.inferred = None
+
+class BinaryExpr(Node):
+    __slots__ = FIELDS = ('operator', 'left', 'right')
+    KIND = BINARY_EXPR
+    TYPE = 'BinaryExpr'
+
+    def __init__(self, operator=None, left=None, right=None, span=None):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.span = span
+        self.inferred = None
+
+class Pattern(Node):
+    __slots__ = FIELDS = ('variable', 'asType')
+    KIND = PATTERN
+    TYPE = 'Pattern'
+
+    def __init__(self, variable=None, asType=None, span=None):
+        self.variable = variable
+        self.asType = asType
+        self.span = span
+        self.inferred = None
+
+# Fields that default to an empty list when a dict AST omits them.
+LIST_FIELDS = {'body', 'elements', 'args', 'params', 'fields', 'pairs', 'whens', 'tryBlock', 'catchBlock'}
+
+NODE_CLASSES = {cls.TYPE: cls for cls in (Program, VariableDeclaration, Assignment, ConstantDeclaration,
+    IfStatement, CycleStatement, FunctionDeclaration, TypeDeclaration, ImportStatement, TryCatchStatement,
+    ThrowStatement, ReturnStatement, ExpressionStatement, NumberLiteral, StringLiteral, BooleanLiteral,
+    ListLiteral, MapLiteral, Identifier, FunctionCall, BinaryExpr, Pattern)}
+
+def to_dict(value):
+    """Convert a node tree (or any part of it) to the plain dict AST."""
+    if isinstance(value, Node):
+        d = {'type': value.TYPE}
+        for f in value.FIELDS:
+            d[f] = to_dict(getattr(value, f))
+        if value.span is not None:
+            d['span'] = value.span
+        return d
+    if isinstance(value, Record):
+        d = {f: to_dict(getattr(value, f)) for f in value.FIELDS}
+        if value.span is not None:
+            d['span'] = value.span
+        return d
+    if isinstance(value, list):
+        return [to_dict(v) for v in value]
+    return value
+
+def _from_value(value):
+    if isinstance(value, dict):
+        return from_dict(value)
+    if isinstance(value, list):
+        return [_from_value(v) for v in value]
+    return value
+
+def _span(d):
+    span = d.get('span')
+    return tuple(span) if span is not None else None
+
+def _record_from_dict(cls, d):
+    if d is None or isinstance(d, Record):
+        return d
+    return cls(*[_from_value(d.get(f, [] if f in LIST_FIELDS else None)) for f in cls.FIELDS],
+               span=_span(d))
+
+def from_dict(d):
+    """Convert a dict AST node (and its children) into typed nodes."""
+    if isinstance(d, (Node, Record)):
+        return d
+    cls = NODE_CLASSES.get(d.get('type'))
+    if cls is None:
+        raise ValueError(f"Unknown node type: {d.get('type')}")
+    args = []
+    for f in cls.FIELDS:
+        raw = d.get(f, [] if f in LIST_FIELDS else None)
+        record = cls.RECORDS.get(f)
+        if record is None:
+            args.append(_from_value(raw))
+        elif isinstance(raw, list):
+            args.append([_record_from_dict(record, r) for r in raw])
+        else:
+            args.append(_record_from_dict(record, raw))
+    return cls(*args, span=_span(d))
+
+def as_node(ast):
+    """Return ast as typed nodes, converting a dict AST if needed."""
+    return ast if isinstance(ast, Node) else from_dict(ast)
@@ -0,0 +1,396 @@
+# Packed numeric basins for Cascade.
+# A DepthBasin stores a homogeneous [depth] list unboxed: in a NumPy float64
+# array when NumPy is installed, otherwise in an array('d'). It behaves like
+# the list it replaces (iteration, indexing, equality, `+` concatenation) and
+# adds element-wise arithmetic against depths and equal-length basins.
+# A StreamBasin is a lazy pipeline of map/filter stages over any iterable,
+# run as one fused pass when a terminal operation consumes it.
+# A ReservoirBasin stores a homogeneous list of reservoir records column-wise:
+# one packed array per depth field, interned strings per rivulet field. Its
+# rows read as mappings, and a depth column projects to a DepthBasin sharing
+# the column's storage.
+
+import operator
+import sys
+from array import array
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; array('d') keeps the memory savings.
+    np = None
+
+def is_depth(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def pack(values):
+    """Return the packed storage for an iterable of depths."""
+    if np is not None:
+        return np.fromiter(values, dtype=np.float64)
+    return array('d', values)
+
+class DepthBasin:
+    """A [depth] list stored as a packed float64 buffer."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(pack(values))
+
+    @property
+    def vectorized(self):
+        """True when operations on this basin run as NumPy kernels."""
+        return np is not None and isinstance(self.data, np.ndarray)
+
+    def tolist(self):
+        return self.data.tolist()
+
+    def copy(self):
+        return DepthBasin(self.data.copy() if self.vectorized else array('d', self.data))
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return len(self.data) > 0
+
+    def __iter__(self):
+        if self.vectorized:
+            return map(float, self.data)
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DepthBasin(self.data[index].copy() if self.vectorized else self.data[index])
+        return float(self.data[index])
+
+    def __contains__(self, value):
+        return is_depth(value) and value in self.data
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, DepthBasin):
+            if len(other) != len(self):
+                return False
+            if self.vectorized and other.vectorized:
+                return bool(np.array_equal(self.data, other.data))
+            return self.tolist() == other.tolist()
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    # Ordering follows list semantics (lexicographic), not element-wise.
+    def _compare(self, other, op):
+        if isinstance(other, DepthBasin):
+            other = other.tolist()
+        elif not isinstance(other, list):
+            return NotImplemented
+        return op(self.tolist(), other)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    __hash__ = None
+
+    def concat(self, other, reverse=False):
+        """Concatenate with another basin or list, keeping packed storage when possible."""
+        if isinstance(other, DepthBasin):
+            other_data = other.data
+        elif all(is_depth(x) for x in other):
+            other_data = other
+        else:
+            items = list(other)
+            return items + self.tolist() if reverse else self.tolist() + items
+        parts = (other_data, self.data) if reverse else (self.data, other_data)
+        if self.vectorized:
+            return DepthBasin(np.concatenate([np.asarray(p, dtype=np.float64) for p in parts]))
+        result = array('d', parts[0])
+        result.extend(parts[1])
+        return DepthBasin(result)
+
+    def _elementwise(self, other, op, reverse=False):
+        paired = isinstance(other, DepthBasin)
+        if paired:
+            if len(other) != len(self):
+                raise ValueError(f"Basin length mismatch: {len(self)} and {len(other)}")
+            other = other.data
+        elif not is_depth(other):
+            return NotImplemented
+        elif op is operator.truediv and not reverse and other == 0:
+            raise ZeroDivisionError("float division by zero")
+        left, right = (other, self.data) if reverse else (self.data, other)
+        if self.vectorized:
+            return DepthBasin(np.asarray(op(left, right), dtype=np.float64))
+        if paired:
+            pairs = zip(left, right)
+        elif reverse:
+            pairs = ((left, x) for x in right)
+        else:
+            pairs = ((x, right) for x in left)
+        return DepthBasin(array('d', (op(a, b) for a, b in pairs)))
+
+    def __add__(self, other):
+        if isinstance(other, (DepthBasin, list)):
+            return self.concat(other)
+        return self._elementwise(other, operator.add)
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return self.concat(other, reverse=True)
+        return self._elementwise(other, operator.add, reverse=True)
+
+    def __sub__(self, other):
+        return self._elementwise(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self._elementwise(other, operator.sub, reverse=True)
+
+    def __mul__(self, other):
+        return self._elementwise(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self._elementwise(other, operator.mul, reverse=True)
+
+    def __truediv__(self, other):
+        return self._elementwise(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self._elementwise(other, operator.truediv, reverse=True)
+
+    # Reductions used by the stdlib basin functions.
+    def sum(self):
+        return float(self.data.sum()) if self.vectorized else sum(self.data)
+
+    def max(self):
+        return float(self.data.max()) if self.vectorized else max(self.data)
+
+    def min(self):
+        return float(self.data.min()) if self.vectorized else min(self.data)
+
+    def variance(self):
+        """Sample variance (ddof=1); NumPy-backed basins only."""
+        return float(self.data.var(ddof=1))
+
+    def quantile(self, q):
+        """Linearly interpolated q-quantile; NumPy-backed basins only."""
+        return float(np.quantile(self.data, q))
+
+    def sorted(self):
+        if self.vectorized:
+            return DepthBasin(np.sort(self.data))
+        return DepthBasin(array('d', sorted(self.data)))
+
+def _concat_packed(parts):
+    """One packed buffer holding each packed part in turn."""
+    if np is not None:
+        return np.concatenate([np.asarray(p, dtype=np.float64) for p in parts]) if parts else pack(())
+    result = array('d')
+    for part in parts:
+        result.extend(part)
+    return result
+
+def _slice(column, index):
+    part = column[index]
+    # NumPy slices are views; copy so the new basin owns its data, as DepthBasin slices do.
+    return part.copy() if np is not None and isinstance(part, np.ndarray) else part
+
+class ReservoirBasin:
+    """A [Reservoir] list stored as columns: packed depth fields, interned rivulet fields.
+
+    fields maps each field to its type, in declaration order. Fields of other
+    types are kept as plain lists. Rows are RecordViews; indexing, iteration,
+    equality and `+` behave as on the list of dicts it replaces.
+    """
+    __slots__ = ('fields', 'columns')
+
+    def __init__(self, fields, columns):
+        self.fields = fields
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, fields, records):
+        """Pack records (mappings holding every field); raises ValueError if they do not fit."""
+        return cls.from_chunks(fields, [records])
+
+    @classmethod
+    def from_chunks(cls, fields, chunks):
+        """Pack records arriving in chunks, each chunk's depth values packed as it arrives."""
+        parts = {name: [] for name in fields}
+        for chunk in chunks:
+            for name, ftype in fields.items():
+                try:
+                    values = [record[name] for record in chunk]
+                except (KeyError, TypeError):
+                    raise ValueError(f"Records do not all have field '{name}'")
+                if ftype == 'depth':
+                    if not all(is_depth(x) for x in values):
+                        raise ValueError(f"Field '{name}' holds a non-depth value")
+                    parts[name].append(pack(values))
+                elif ftype == 'rivulet':
+                    parts[name].append([sys.intern(x) if type(x) is str else x for x in values])
+                else:
+                    parts[name].append(values)
+        columns = {}
+        for name, ftype in fields.items():
+            if ftype == 'depth':
+                columns[name] = _concat_packed(parts[name])
+            else:
+                columns[name] = [x for part in parts[name] for x in part]
+        return cls(dict(fields), columns)
+
+    def column(self, name):
+        """Field name of every row: a DepthBasin sharing storage for depth fields, else a list."""
+        if self.fields[name] == 'depth':
+            return DepthBasin(self.columns[name])
+        return list(self.columns[name])
+
+    def tolist(self):
+        return [dict(row) for row in self]
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return (RecordView(self, ix) for ix in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ReservoirBasin(self.fields, {name: _slice(column, index)
+                                                for name, column in self.columns.items()})
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return RecordView(self, index)
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, (ReservoirBasin, list, tuple)):
+            return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if isinstance(other, ReservoirBasin) and other.fields == self.fields:
+            return ReservoirBasin(self.fields, {
+                name: _concat_packed([self.columns[name], other.columns[name]]) if ftype == 'depth'
+                else self.columns[name] + other.columns[name]
+                for name, ftype in self.fields.items()})
+        if isinstance(other, (ReservoirBasin, list)):
+            # Joining with an empty list (an accumulator's start) keeps the columns.
+            return self if not other else self.tolist() + list(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return self if not other else other + self.tolist()
+        return NotImplemented
+
+class RecordView(Mapping):
+    """One row of a ReservoirBasin, read from its columns on access."""
+    __slots__ = ('basin', 'index')
+
+    def __init__(self, basin, index):
+        self.basin = basin
+        self.index = index
+
+    def __getitem__(self, name):
+        basin = self.basin
+        value = basin.columns[name][self.index]
+        return float(value) if basin.fields[name] == 'depth' else value
+
+    def __iter__(self):
+        return iter(self.basin.fields)
+
+    def __len__(self):
+        return len(self.basin.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+MAP = 'map'
+FILTER = 'filter'
+
+class _OneShotSource:
+    """A one-shot iterator shared by a stream and every stream derived from it."""
+    __slots__ = ('iterator', 'consumed')
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.consumed = False
+
+    def __iter__(self):
+        if self.consumed:
+            raise ValueError("Stream basin over a one-shot source was already consumed")
+        self.consumed = True
+        return self.iterator
+
+class StreamBasin:
+    """A lazy basin: a source iterable plus map/filter stages applied on iteration.
+
+    Adding a stage returns a new StreamBasin and never touches the data, so a
+    filter -> map -> reduce chain reads each element once and allocates no
+    intermediate lists. A one-shot iterator can be consumed once, through any
+    one of the streams over it.
+    """
+    __slots__ = ('source', 'stages')
+
+    def __init__(self, source, stages=()):
+        if not isinstance(source, _OneShotSource) and iter(source) is source:
+            source = _OneShotSource(source)
+        self.source = source
+        self.stages = stages
+
+    @property
+    def consumed(self):
+        return isinstance(self.source, _OneShotSource) and self.source.consumed
+
+    def map(self, func):
+        return StreamBasin(self.source, self.stages + ((MAP, func),))
+
+    def filter(self, predicate):
+        return StreamBasin(self.source, self.stages + ((FILTER, predicate),))
+
+    def __iter__(self):
+        it = iter(self.source)
+        for kind, fn in self.stages:
+            it = map(fn, it) if kind is MAP else filter(fn, it)
+        return it
+
+    def __repr__(self):
+        stages = " -> ".join(kind for kind, _ in self.stages) or "source"
+        return f"<stream basin: {stages}>"
+
+def is_lazy(value):
+    """True for values that should stay lazy: stream basins and bare iterators."""
+    return isinstance(value, StreamBasin) or iter(value) is value
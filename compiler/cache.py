@@ -0,0 +1,100 @@
+# Persistent compilation cache for Cascade sources.
+# Stores the AST of every source that parsed, type-checked and passed
+# semantic analysis, keyed by a hash of the source text and the compiler
+# itself, so unchanged files skip the front end on the next run. Checking a
+# file also reads the signatures of the channels it opens, so each entry
+# records a stamp of their sources (modules.dependency_stamp) and only counts
+# as a hit while the stamp is unchanged. Entries are the marshalled stamp and
+# dict form of the AST (see ast_nodes.to_dict).
+
+import glob
+import hashlib
+import marshal
+import os
+import sys
+from compiler.ast_nodes import from_dict, to_dict
+
+CACHE_DIR_NAME = "__cascade_cache__"
+CACHE_SUFFIX = ".ast"
+
+_compiler_fingerprint = None
+
+def compiler_fingerprint():
+    """Hash of the compiler sources and Python version; changes invalidate every entry."""
+    global _compiler_fingerprint
+    if _compiler_fingerprint is None:
+        digest = hashlib.sha256(sys.implementation.cache_tag.encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(here, "*.py"))):
+            with open(path, "rb") as f:
+                digest.update(os.path.basename(path).encode())
+                digest.update(f.read())
+        _compiler_fingerprint = digest.hexdigest()
+    return _compiler_fingerprint
+
+class CompilationCache:
+    """Content-addressed store of checked ASTs.
+
+    Entries live in cache_dir when given (or $CASCADE_CACHE_DIR), otherwise in
+    a __cascade_cache__ directory beside each source file.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get("CASCADE_CACHE_DIR")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, code):
+        digest = hashlib.sha256(compiler_fingerprint().encode())
+        digest.update(code.encode())
+        return digest.hexdigest()
+
+    def entry_path(self, source_path, code):
+        directory = self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(source_path)), CACHE_DIR_NAME)
+        return os.path.join(directory, self.key(code) + CACHE_SUFFIX)
+
+    def peek(self, source_path, code):
+        """(stamp, AST) stored for code, or None; not counted."""
+        try:
+            with open(self.entry_path(source_path, code), "rb") as f:
+                stamp, ast = marshal.load(f)
+            return stamp, from_dict(ast)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError):
+            return None
+
+    def load(self, source_path, code, stamp=None):
+        """Return the cached AST for code, or None (counted as a miss).
+
+        stamp, when given, computes the current dependency stamp for the
+        cached AST; an entry stored under a different stamp is a miss.
+        """
+        entry = self.peek(source_path, code)
+        ast = entry and entry[1]
+        if entry is not None and stamp is not None and entry[0] != stamp(ast):
+            ast = None
+        self.record(ast is not None)
+        return ast
+
+    def record(self, hit):
+        """Count a hit or a miss decided by the caller (see project.build_project)."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def store(self, source_path, code, ast, stamp=None):
+        """Persist ast for code, checked under stamp. Failures (e.g. a read-only tree) are ignored."""
+        path = self.entry_path(source_path, code)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                marshal.dump((stamp, to_dict(ast)), f)
+            os.replace(tmp, path)
+        except (OSError, ValueError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def summary(self):
+        return f"Compilation cache: {self.hits} hit(s), {self.misses} miss(es)"
@@ -2,7 +2,11 @@
 # This parser turns Cascade source code into an AST.
 # For production, replace with a PEG-generated parser for improved coverage and correctness.
 
-from compiler.lexer import tokenize
+from compiler.ast_nodes import (
+    FunctionDeclaration, Identifier, ImportStatement, NumberLiteral, Param, Program, ReturnStatement,
+    StringLiteral, VariableDeclaration,
+)
+from compiler.lexer import IDENT, KIND_NAMES, NUMBER, OP, STRING, TokenBuffer
 
 class ParseError(Exception):
     """Raised when parsing fails due to invalid Cascade syntax."""
@@ -14,101 +18,128 @@ class ParseError(Exception):
 class Parser:
     """Parser for the Cascade language source code."""
     def __init__(self, code):
-        self.tokens = tokenize(code)
+        self.tokens = TokenBuffer(code)
         self.pos = 0
 
     def peek(self):
         """Return the next token or None if at end."""
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
-        return None
+        return self.tokens.token(self.pos)
+
+    def at_end(self):
+        return not self.tokens.fill(self.pos)
+
+    def check(self, kind, value=None):
+        """True if the next token has kind (and value if provided)."""
+        return self.tokens.matches(self.pos, kind, value)
 
     def advance(self):
         """Move to the next token."""
-        if self.pos < len(self.tokens):
+        if self.tokens.fill(self.pos):
             self.pos += 1
 
-    def expect(self, typ, value=None):
-        """Consume a token of type 'typ' (and value if provided), or raise error."""
-        tok = self.peek()
-        if not tok or tok['type'] != typ or (value is not None and tok['value'] != value):
-            raise ParseError(f"Expected {typ} {value if value else ''}", tok['line'] if tok else -1, tok['col'] if tok else -1)
-        self.advance()
-        return tok
+    def span_from(self, first):
+        """Source span from token first through the last consumed token."""
+        return self.tokens.span(first, self.pos - 1)
+
+    def error(self, message):
+        line, col = self.tokens.position(self.pos)
+        return ParseError(message, line, col)
+
+    def expect(self, kind, value=None):
+        """Consume a token of kind (and value if provided) and return its text, or raise error."""
+        if not self.tokens.matches(self.pos, kind, value):
+            raise self.error(f"Expected {KIND_NAMES[kind]} {value if value else ''}")
+        text = self.tokens.value(self.pos)
+        self.pos += 1
+        return text
 
     def parse(self):
         """Parse the entire input into an AST program node."""
         stmts = []
-        while self.peek():
+        while not self.at_end():
             stmts.append(self.parse_statement())
-        return {'type': 'Program', 'body': stmts}
+        return Program(stmts)
 
     def parse_statement(self):
         """Parse a top-level statement."""
-        tok = self.peek()
-        if tok and tok['type'] == 'IDENT' and tok['value'] == 'pour':
+        if self.check(IDENT, 'pour'):
             return self.parse_var_decl()
-        if tok and tok['type'] == 'IDENT' and tok['value'] == 'pool':
+        if self.check(IDENT, 'pool'):
             return self.parse_func_decl()
+        if self.check(IDENT, 'open'):
+            return self.parse_import()
+        if self.check(IDENT, 'return'):
+            first = self.pos
+            self.advance()
+            value = self.parse_expression()
+            return ReturnStatement(value, span=self.span_from(first))
         # Extend for other statement types: assignment, const, if, etc.
-        raise ParseError("Unknown or unsupported statement", tok['line'], tok['col'])
+        raise self.error("Unknown or unsupported statement")
 
     def parse_var_decl(self):
         """Parse a variable declaration statement."""
-        self.expect('IDENT', 'pour')
+        first = self.pos
+        self.expect(IDENT, 'pour')
         value = self.parse_expression()
-        self.expect('IDENT', 'into')
-        name = self.expect('IDENT')['value']
+        self.expect(IDENT, 'into')
+        name = self.expect(IDENT)
         typ = None
-        if self.peek() and self.peek()['type'] == 'OP' and self.peek()['value'] == ':':
-            self.expect('OP', ':')
-            typ = self.expect('IDENT')['value']
-        return {'type': 'VariableDeclaration', 'name': name, 'value': value, 'declaredType': typ}
+        if self.check(OP, ':'):
+            self.advance()
+            typ = self.expect(IDENT)
+        return VariableDeclaration(name, value, typ, span=self.span_from(first))
+
+    def parse_import(self):
+        """Parse `open channel a.b.c`."""
+        first = self.pos
+        self.expect(IDENT, 'open')
+        self.expect(IDENT, 'channel')
+        parts = [self.expect(IDENT)]
+        while self.check(OP, '.'):
+            self.advance()
+            parts.append(self.expect(IDENT))
+        return ImportStatement('.'.join(parts), span=self.span_from(first))
 
     def parse_func_decl(self):
         """Parse a function declaration."""
-        self.expect('IDENT', 'pool')
-        name = self.expect('IDENT')['value']
-        self.expect('OP', '(')
+        first = self.pos
+        self.expect(IDENT, 'pool')
+        name = self.expect(IDENT)
+        self.expect(OP, '(')
         params = []
-        while True:
-            if self.peek() and self.peek()['type'] == 'OP' and self.peek()['value'] == ')':
-                break
-            pname = self.expect('IDENT')['value']
-            self.expect('OP', ':')
-            ptype = self.expect('IDENT')['value']
-            params.append({'name': pname, 'type': ptype})
-            if self.peek() and self.peek()['type'] == 'OP' and self.peek()['value'] == ',':
-                self.advance()
-                continue
-            else:
+        while not self.check(OP, ')'):
+            pfirst = self.pos
+            pname = self.expect(IDENT)
+            self.expect(OP, ':')
+            ptype = self.expect(IDENT)
+            params.append(Param(pname, ptype, span=self.span_from(pfirst)))
+            if not self.check(OP, ','):
                 break
-        self.expect('OP', ')')
-        self.expect('OP', ':')
-        return_type = self.expect('IDENT')['value']
-        self.expect('OP', '{')
+            self.advance()
+        self.expect(OP, ')')
+        self.expect(OP, ':')
+        return_type = self.expect(IDENT)
+        self.expect(OP, '{')
         # Parse function body as block (currently expects only var decls for brevity)
         body = []
-        while self.peek() and not (self.peek()['type'] == 'OP' and self.peek()['value'] == '}'):
+        while not self.at_end() and not self.check(OP, '}'):
             body.append(self.parse_statement())
-        self.expect('OP', '}')
-        return {'type': 'FunctionDeclaration', 'name': name, 'params': params, 'returnType': return_type, 'body': body}
+        self.expect(OP, '}')
+        return FunctionDeclaration(name, params, return_type, body, span=self.span_from(first))
 
     def parse_expression(self):
         """Parse an expression (number, string, or identifier)."""
-        tok = self.peek()
-        if not tok:
+        kind = self.tokens.kind(self.pos)
+        if kind is None:
             raise ParseError("Expected expression but got end of input", -1, -1)
-        if tok['type'] == 'NUMBER':
-            self.advance()
-            return {'type': 'NumberLiteral', 'value': float(tok['value'])}
-        if tok['type'] == 'STRING':
-            self.advance()
-            return {'type': 'StringLiteral', 'value': tok['value'][1:-1]}
-        if tok['type'] == 'IDENT':
-            self.advance()
-            return {'type': 'Identifier', 'value': tok['value']}
-        raise ParseError("Expected expression", tok['line'], tok['col'])
+        first = self.pos
+        if kind == NUMBER:
+            return NumberLiteral(float(self.expect(NUMBER)), span=self.span_from(first))
+        if kind == STRING:
+            return StringLiteral(self.expect(STRING)[1:-1], span=self.span_from(first))
+        if kind == IDENT:
+            return Identifier(self.expect(IDENT), span=self.span_from(first))
+        raise self.error("Expected expression")
 
 def parse(code):
     """Parse Cascade code into AST."""
@@ -1,48 +1,138 @@
 # CLI for Cascade language.
-# Supports --compile-only, --debug, --verbose, --output.
+# Supports --compile-only, --debug, --verbose, --output, --engine, --opt-level, --cache-dir, --no-cache,
+# --jobs, --profile.
+# Given a project directory (or its fountain.config) instead of a source file,
+# it compiles every source of the project in parallel (see project.py) and
+# runs the project's entry.
 
 import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from compiler.parser import parse_cascade
-from compiler.type_checker import check_type, TypeEnv
-from compiler.semantic_analyzer import analyze_semantics
-from compiler.interpreter import run_program
+from compiler.interpreter import run_program, set_profiler
+from compiler.cache import CompilationCache
+from compiler.modules import CONFIG_NAME, ModuleLoader, check_program, dependency_stamp
+from compiler.profiler import Profiler
+from compiler.project import build_project, project_root
+from compiler.optimizer import DEFAULT_LEVEL, MAX_LEVEL, count_nodes, optimize, user_vars
+import compiler.vm as vm
 import compiler.diagnostics as diagnostics
 
+def load_file(args, cache):
+    """(AST, channels) of the source file args.file, checked unless cached."""
+    with open(args.file) as f:
+        code = f.read()
+    loader = ModuleLoader.for_source(args.file, cache)
+    ast = cache.load(args.file, code, lambda ast: dependency_stamp(loader.channels(ast))) if cache else None
+    if ast is None:
+        ast = parse_cascade(code)
+        if args.debug:
+            print("AST:", ast)
+        channels = loader.channels(ast)
+        check_program(ast, channels)
+        if cache:
+            cache.store(args.file, code, ast, dependency_stamp(channels))
+    else:
+        channels = loader.channels(ast)
+        if args.debug:
+            print("AST (cached):", ast)
+    return ast, channels
+
+def load_project(args, cache):
+    """(AST, channels) of the entry of the project at args.file, after compiling every project source.
+
+    Exits with every file's diagnostics if any source fails to compile.
+    """
+    root = project_root(args.file)
+    jobs = args.jobs or os.cpu_count() or 1
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            build = build_project(root, executor, cache)
+    else:
+        build = build_project(root, cache=cache)
+    for path, message in build.errors:
+        diagnostics.report_error(f"{os.path.relpath(path, build.loader.root)}: {message}")
+    if build.errors:
+        sys.exit(1)
+    if args.verbose:
+        print(f"Compiled {len(build.loader.modules)} modules with {jobs} worker(s)")
+    entry = build.entry()
+    if entry is None:
+        if args.compile_only:
+            return None, None
+        raise ValueError(f"No runnable entry in {os.path.join(root, CONFIG_NAME)}")
+    if args.debug:
+        print("AST:", entry.ast)
+    return entry.ast, build.loader.channels(entry.ast)
+
 def main():
     parser = argparse.ArgumentParser(description="Cascade CLI")
-    parser.add_argument("file", help="Path to Cascade source file")
+    parser.add_argument("file", help="Path to a Cascade source file, or a project directory or its fountain.config")
     parser.add_argument("--compile-only", action="store_true", help="Only typecheck and compile, do not run")
     parser.add_argument("--debug", action="store_true", help="Print AST and internal state")
     parser.add_argument("--verbose", action="store_true", help="More output")
     parser.add_argument("--output", help="Output file")
+    parser.add_argument("--engine", choices=["interpreter", "vm"], default="interpreter",
+                        help="Execution engine: closure-compiling interpreter or bytecode VM")
+    parser.add_argument("--opt-level", type=int, choices=range(MAX_LEVEL + 1), default=DEFAULT_LEVEL,
+                        help="0: no optimization, 1: fold constants and prune constant branches, "
+                             "2: also propagate constants and hoist loop invariants")
+    parser.add_argument("--cache-dir", help="Compilation cache directory (default: __cascade_cache__ beside the source)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the compilation cache")
+    parser.add_argument("--jobs", type=int, help="Worker processes compiling a project (default: one per CPU)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="PREFIX",
+                        help="Profile pools, builtins and lines; write PREFIX.txt and PREFIX.folded "
+                             "(default PREFIX: <source name>.profile)")
     args = parser.parse_args()
+    if args.profile is not None and args.engine != "interpreter":
+        parser.error("--profile requires the interpreter engine")
 
-    with open(args.file) as f:
-        code = f.read()
-
+    cache = None if args.no_cache else CompilationCache(args.cache_dir)
+    project = os.path.isdir(args.file) or os.path.basename(args.file) == CONFIG_NAME
     try:
-        ast = parse_cascade(code)
-        if args.debug:
-            print("AST:", ast)
-        type_env = TypeEnv()
-        check_type(ast, type_env)
-        analyze_semantics(ast)
+        ast, channels = load_project(args, cache) if project else load_file(args, cache)
     except Exception as e:
         diagnostics.report_error(str(e), exc=e)
         sys.exit(1)
+    if args.verbose and cache:
+        print(cache.summary())
 
     if args.compile_only:
         print("Compilation successful.")
         sys.exit(0)
 
+    optimized = optimize(ast, args.opt_level)
+    if args.debug:
+        print(f"Optimizer (level {args.opt_level}): {count_nodes(ast)} nodes -> {count_nodes(optimized)} nodes")
+    ast = optimized
+
+    profiler = None
+    if args.profile is not None:
+        name = os.path.splitext(os.path.basename(os.path.normpath(args.file)))[0]
+        profiler = Profiler(name)
+        set_profiler(profiler)
     try:
-        env, functions, types = run_program(ast)
+        if args.engine == "vm":
+            if args.debug:
+                print(vm.disassemble(vm.compile_program(ast)))
+            env, functions, types = vm.run_program(ast, channels.functions())
+        elif profiler is not None:
+            profiler.start()
+            try:
+                env, functions, types = run_program(ast, channels.functions(),
+                                                    source=None if project else args.file)
+            finally:
+                profiler.stop()
+                paths = profiler.write(args.profile or profiler.root + ".profile")
+                print(f"Profile written to {paths[0]} and {paths[1]}")
+        else:
+            env, functions, types = run_program(ast, channels.functions())
         if args.output:
             with open(args.output, "w") as outf:
-                outf.write(str(env.vars))
+                outf.write(str(user_vars(env.vars)))
         elif args.verbose:
-            print("Final environment:", env.vars)
+            print("Final environment:", user_vars(env.vars))
     except Exception as e:
         diagnostics.report_error(str(e), exc=e)
         sys.exit(1)
@@ -0,0 +1,121 @@
+# Streaming CSV reader for reservoir records.
+# Rows are parsed by the csv module from a buffered text file, or from an
+# mmap of the file, and converted to records (dicts) typed by a reservoir's
+# fields. Records are produced a chunk of rows at a time, so a file of any
+# size is read in constant memory, or packed into a columnar ReservoirBasin
+# chunk by chunk. A malformed row is reported with its
+# line number and either stops the read or is skipped.
+
+import csv
+import mmap
+import os
+from compiler.basin import ReservoirBasin
+
+# Rows per chunk yielded by read_chunks.
+CHUNK_ROWS = 4096
+
+def _to_drop(text):
+    value = text.strip().lower()
+    if value in ("true", "yes", "1"):
+        return True
+    if value in ("false", "no", "0", ""):
+        return False
+    raise ValueError(f"not a drop: {text!r}")
+
+CONVERTERS = {
+    'depth': float,
+    'rivulet': str,
+    'drop': _to_drop,
+}
+
+class CsvRowError(ValueError):
+    """A CSV row that cannot be read as a record, with the line it ends on."""
+    def __init__(self, path, line, message):
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+def _lines(path, use_mmap, encoding):
+    """Text lines of the file at path, read through a buffer or an mmap."""
+    if not use_mmap:
+        with open(path, newline='', encoding=encoding) as f:
+            yield from f
+        return
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b''):
+                yield raw.decode(encoding)
+
+def _plan(path, header, fields):
+    """(field, column index, converter) for each reservoir field, by header name."""
+    columns = [name.strip() for name in header]
+    missing = [name for name in fields if name not in columns]
+    if missing:
+        raise CsvRowError(path, 1, f"missing column(s) {', '.join(missing)}")
+    plan = []
+    for name, ftype in fields.items():
+        convert = CONVERTERS.get(ftype)
+        if convert is None:
+            raise CsvRowError(path, 1, f"field '{name}' has type {ftype}, which CSV cannot hold")
+        plan.append((name, columns.index(name), convert))
+    return plan, len(columns)
+
+def _bad_field(row, plan, fields):
+    """Describe the first field of row that fails to convert, or None."""
+    for name, ix, convert in plan:
+        try:
+            convert(row[ix])
+        except ValueError:
+            return f"bad {fields[name]} value {row[ix]!r} for '{name}'"
+    return None
+
+def read_chunks(path, fields, chunk_rows=CHUNK_ROWS, errors='raise', on_error=None, use_mmap=False,
+                encoding='utf-8'):
+    """Yield lists of up to chunk_rows records read from the CSV file at path.
+
+    fields maps each record field to its type (depth, rivulet or drop) and is
+    matched against the header row; other columns are ignored and blank
+    lines skipped. A malformed row raises CsvRowError when errors is 'raise';
+    with 'skip' it is passed to on_error, if given, and left out.
+    """
+    reader = csv.reader(_lines(path, use_mmap, encoding))
+    try:
+        header = next(reader, None)
+        if header is None:
+            return
+        plan, width = _plan(path, header, fields)
+        chunk = []
+        for row in reader:
+            if not row or (len(row) == 1 and not row[0].strip()):
+                continue
+            try:
+                if len(row) != width:
+                    raise ValueError(f"expected {width} fields, got {len(row)}")
+                record = {name: convert(row[ix]) for name, ix, convert in plan}
+            except ValueError as e:
+                problem = _bad_field(row, plan, fields) if len(row) == width else None
+                error = CsvRowError(path, reader.line_num, problem or str(e))
+                if errors == 'raise':
+                    raise error
+                if on_error is not None:
+                    on_error(error)
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    except csv.Error as e:
+        raise CsvRowError(path, reader.line_num, str(e))
+
+def read_records(path, fields, **options):
+    """The records of the CSV file at path one at a time; options are those of read_chunks."""
+    for chunk in read_chunks(path, fields, **options):
+        yield from chunk
+
+def read_columns(path, fields, **options):
+    """All records of the CSV file at path as a columnar ReservoirBasin; options are those of read_chunks."""
+    return ReservoirBasin.from_chunks(fields, read_chunks(path, fields, **options))
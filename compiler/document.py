@@ -0,0 +1,418 @@
+# Incremental document model for the Cascade language server.
+# A document is split into top-level chunks: runs of lines starting at brace
+# depth 0 and ending when the braces balance again. An edit re-lexes and
+# re-parses only the chunks it touches. Each chunk is type-checked and
+# analyzed on its own, against a view of the declarations made by the chunks
+# before it, and records what it declares and what it looks up; a chunk is
+# re-checked only when it changed or something it looked up was redeclared.
+# Symbol queries find the chunk under a position by binary search and then
+# use that chunk's interval-tree SymbolTable; top-level names map to the
+# chunks declaring them. Chunk spans count lines from 1 at the chunk start.
+
+import heapq
+from compiler.cascade_parser import ParseError
+from compiler.lexer import OP, scan
+from compiler.parser import parse_cascade
+from compiler.frontend import check_node
+from compiler.semantic_analyzer import SemanticError
+from compiler.symbols import Reference, SymbolTable
+from compiler.type_checker import TypeEnv, TypeError
+
+VAR = 'var'
+FUNC = 'func'
+TYPE = 'type'
+
+MISSING = object()
+
+class Issue:
+    """A diagnostic for one document position (0-based line and column)."""
+    __slots__ = ('line', 'col', 'message', 'kind')
+
+    def __init__(self, line, col, message, kind):
+        self.line = line
+        self.col = col
+        self.message = message
+        self.kind = kind
+
+    def __eq__(self, other):
+        if not isinstance(other, Issue):
+            return NotImplemented
+        return (self.line, self.col, self.message, self.kind) == (other.line, other.col, other.message, other.kind)
+
+    def __repr__(self):
+        return f"Issue({self.line}:{self.col}, {self.kind}: {self.message})"
+
+class Chunk:
+    """One top-level statement group: lines [start, end) and its analysis results.
+
+    The issue's line is relative to start, so shifting a chunk never invalidates it.
+    """
+    __slots__ = ('start', 'end', 'text', 'nodes', 'symbols', 'parse_issue', 'issue', 'exports', 'reads')
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.nodes = None          # parsed lazily, once: a chunk's text never changes
+        self.symbols = None
+        self.parse_issue = None
+        self.issue = None
+        self.exports = {}
+        self.reads = set()
+
+    def __repr__(self):
+        return f"Chunk({self.start}-{self.end})"
+
+def line_shape(line):
+    """(brace depth change, has tokens) for one line of source."""
+    delta = 0
+    has_tokens = False
+    try:
+        for kind, start, end, _, _ in scan(line):
+            has_tokens = True
+            if kind == OP:
+                ch = line[start]
+                if ch == '{':
+                    delta += 1
+                elif ch == '}':
+                    delta -= 1
+    except RuntimeError:
+        has_tokens = True
+    return delta, has_tokens
+
+def split_chunks(lines, lo, hi, carry=None):
+    """Chunk line ranges in lines[lo:hi], plus the (start, depth) of a trailing unclosed chunk (or None).
+
+    carry is such a pair left by scanning the lines just before lo, to continue from.
+    """
+    ranges = []
+    start, depth = carry or (None, 0)
+    for ix in range(lo, hi):
+        delta, has_tokens = line_shape(lines[ix])
+        if start is None:
+            if not has_tokens:
+                continue
+            start, depth = ix, 0
+        depth += delta
+        if depth <= 0:
+            ranges.append((start, ix + 1))
+            start = None
+    return ranges, None if start is None else (start, depth)
+
+class PrefixTypeEnv(TypeEnv):
+    """Type environment for one chunk: its own bindings over the document's earlier declarations."""
+    def __init__(self, document, chunk):
+        super().__init__()
+        self.document = document
+        self.chunk = chunk
+
+    def _lookup(self, namespace, name, local, message):
+        if name in local:
+            return local[name]
+        found = self.document.lookup(namespace, name, self.chunk)
+        if found is MISSING:
+            raise TypeError(message)
+        return found
+
+    def get_var(self, name):
+        return self._lookup(VAR, name, self.vars, f"Undefined variable '{name}'")
+
+    def has_var(self, name):
+        return name in self.vars or self.document.lookup(VAR, name, self.chunk) is not MISSING
+
+    def get_type(self, name):
+        return self._lookup(TYPE, name, self.types, f"Undefined type '{name}'")
+
+    def get_func(self, name):
+        return self._lookup(FUNC, name, self.funcs, f"Undefined function '{name}'")
+
+class PrefixNames:
+    """Set-like view of the function or type names declared before a chunk, for the semantic analyzer."""
+    def __init__(self, document, chunk, namespace):
+        self.document = document
+        self.chunk = chunk
+        self.namespace = namespace
+        self.local = set()
+
+    def __contains__(self, name):
+        return name in self.local or self.document.lookup(self.namespace, name, self.chunk) is not MISSING
+
+    def add(self, name):
+        self.local.add(name)
+
+class Document:
+    """Source text of one open file with incrementally maintained parse and check results."""
+    def __init__(self, text=''):
+        self.lines = ['']
+        self.chunks = []
+        self.defs = {}       # (namespace, name) -> chunks declaring it
+        self.readers = {}    # (namespace, name) -> chunks that looked it up
+        self.dirty = set()
+        self.changed = set()
+        self.flagged = set()  # chunks with an issue
+        self.names = {}      # name -> chunks declaring it at top level
+        self.apply_change(text)
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def apply_change(self, text, span=None):
+        """Apply an LSP content change; span is ((line, char), (line, char)), or None for the whole text."""
+        if span is None:
+            (sl, sc), (el, ec) = (0, 0), (len(self.lines) - 1, len(self.lines[-1]))
+        else:
+            (sl, sc), (el, ec) = span
+            el = min(el, len(self.lines) - 1)
+        new_lines = (self.lines[sl][:sc] + text + self.lines[el][ec:]).split('\n')
+        delta = len(new_lines) - (el - sl + 1)
+        chunks = self.chunks
+        i0 = self._first_ending_after(sl)
+        i1 = self._first_starting_after(el)
+        lo = min(sl, chunks[i0].start) if i0 < len(chunks) else sl
+        self.lines[sl:el + 1] = new_lines
+        if delta:
+            for ix in range(i1, len(chunks)):
+                chunks[ix].start += delta
+                chunks[ix].end += delta
+        ranges = []
+        unclosed = None
+        while True:
+            hi = chunks[i1].start if i1 < len(chunks) else len(self.lines)
+            found, unclosed = split_chunks(self.lines, lo, hi, unclosed)
+            ranges += found
+            if unclosed is None or i1 >= len(chunks):
+                break
+            # An opened brace swallows the following chunk; scan on through it.
+            lo = hi
+            i1 += 1
+        if unclosed is not None:
+            ranges.append((unclosed[0], len(self.lines)))
+        self._replace(i0, i1, ranges)
+
+    def _first_ending_after(self, line):
+        lo, hi = 0, len(self.chunks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.chunks[mid].end <= line:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _first_starting_after(self, line):
+        lo, hi = 0, len(self.chunks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.chunks[mid].start <= line:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _replace(self, i0, i1, ranges):
+        """Replace chunks[i0:i1] with chunks for ranges, reusing the parse of any unchanged text.
+
+        Reused chunks are still re-checked: they may now sit in a different
+        order relative to their neighbours.
+        """
+        old = {}
+        for chunk in self.chunks[i0:i1]:
+            old.setdefault(chunk.text, []).append(chunk)
+        new = []
+        for start, end in ranges:
+            text = '\n'.join(self.lines[start:end])
+            reusable = old.get(text)
+            if reusable:
+                chunk = reusable.pop(0)
+                chunk.start, chunk.end = start, end
+            else:
+                chunk = Chunk(start, end, text)
+            self.dirty.add(chunk)
+            new.append(chunk)
+        for leftovers in old.values():
+            for chunk in leftovers:
+                self._forget(chunk)
+        self.chunks[i0:i1] = new
+
+    def _forget(self, chunk):
+        """Drop a removed chunk from the indexes; whatever it declared has changed."""
+        self.dirty.discard(chunk)
+        self.flagged.discard(chunk)
+        for key in chunk.exports:
+            self.defs[key].remove(chunk)
+            self.changed.add(key)
+        for key in chunk.reads:
+            self.readers[key].discard(chunk)
+        for name in chunk.symbols.top if chunk.symbols is not None else ():
+            self.names[name].discard(chunk)
+        chunk.start = chunk.end = None
+
+    def lookup(self, namespace, name, chunk):
+        """What the nearest chunk before chunk declared for name, or MISSING. Records the read."""
+        key = (namespace, name)
+        chunk.reads.add(key)
+        self.readers.setdefault(key, set()).add(chunk)
+        best = None
+        for candidate in self.defs.get(key, ()):
+            if candidate.start < chunk.start and (best is None or candidate.start > best.start):
+                best = candidate
+        return MISSING if best is None else best.exports[key]
+
+    def analyze(self):
+        """Re-check every chunk whose result may have changed; returns the number re-checked."""
+        queued = set()
+        heap = []
+        def schedule(chunk):
+            if chunk.start is not None and chunk not in queued:
+                queued.add(chunk)
+                heapq.heappush(heap, (chunk.start, id(chunk), chunk))
+        for chunk in self.dirty:
+            schedule(chunk)
+        for key in self.changed:
+            for chunk in self.readers.get(key, ()):
+                schedule(chunk)
+        self.dirty.clear()
+        self.changed.clear()
+        checked = 0
+        while heap:
+            _, _, chunk = heapq.heappop(heap)
+            before = chunk.exports
+            self._check(chunk)
+            checked += 1
+            after = chunk.exports
+            for key in before.keys() | after.keys():
+                if before.get(key, MISSING) != after.get(key, MISSING):
+                    for reader in self.readers.get(key, ()):
+                        if reader.start > chunk.start:
+                            schedule(reader)
+        return checked
+
+    def _check(self, chunk):
+        for key in chunk.reads:
+            self.readers[key].discard(chunk)
+        for key in chunk.exports:
+            self.defs[key].remove(chunk)
+        chunk.reads = set()
+        chunk.exports = {}
+        if chunk.nodes is None:
+            chunk.nodes = self._parse(chunk)
+            chunk.symbols = SymbolTable(chunk.nodes)
+            for name in chunk.symbols.top:
+                self.names.setdefault(name, set()).add(chunk)
+        chunk.issue = chunk.parse_issue
+        self.flagged.discard(chunk)
+        if chunk.issue is not None:
+            self.flagged.add(chunk)
+            return
+        env = PrefixTypeEnv(self, chunk)
+        functions = PrefixNames(self, chunk, FUNC)
+        types = PrefixNames(self, chunk, TYPE)
+        try:
+            for node in chunk.nodes:
+                check_node(node, env, functions, types)
+        except TypeError as e:
+            chunk.issue = Issue(0, 0, str(e), 'type')
+        except SemanticError as e:
+            chunk.issue = Issue(0, 0, str(e), 'semantic')
+        if chunk.issue is not None:
+            self.flagged.add(chunk)
+        exports = {(VAR, name): typ for name, typ in env.vars.items()}
+        exports.update(((FUNC, name), sig) for name, sig in env.funcs.items())
+        exports.update(((TYPE, name), fields) for name, fields in env.types.items())
+        chunk.exports = exports
+        for key in exports:
+            self.defs.setdefault(key, []).append(chunk)
+
+    def _parse(self, chunk):
+        try:
+            return parse_cascade(chunk.text).body
+        except ParseError as e:
+            chunk.parse_issue = Issue(max(e.line - 1, 0), max(e.col, 0), str(e), 'syntax')
+        except RuntimeError as e:
+            chunk.parse_issue = Issue(0, 0, str(e), 'syntax')
+        return []
+
+    def diagnostics(self):
+        """Analyze pending changes and return every Issue in document order."""
+        self.analyze()
+        return [Issue(chunk.start + chunk.issue.line, chunk.issue.col, chunk.issue.message, chunk.issue.kind)
+                for chunk in sorted(self.flagged, key=lambda c: c.start)]
+
+    def statements(self):
+        """(line, node) for every parsed top-level statement, in document order."""
+        for chunk in self.chunks:
+            for node in chunk.nodes or ():
+                yield chunk.start, node
+
+    def chunk_at(self, line):
+        """The chunk containing document line (0-based), or None."""
+        ix = self._first_starting_after(line) - 1
+        if ix >= 0 and line < self.chunks[ix].end:
+            return self.chunks[ix]
+        return None
+
+    def _relative(self, chunk, line, col):
+        return (line - chunk.start + 1, col)
+
+    def location(self, chunk, span):
+        """Document (line, col, end_line, end_col), 0-based lines, of a span in chunk."""
+        return (chunk.start + span[0] - 1, span[1], chunk.start + span[2] - 1, span[3])
+
+    def symbol_at(self, line, col):
+        """(chunk, declaration or reference) under a document position, or (None, None)."""
+        self.analyze()
+        chunk = self.chunk_at(line)
+        if chunk is None or chunk.symbols is None:
+            return None, None
+        return chunk, chunk.symbols.at(self._relative(chunk, line, col))
+
+    def definition(self, name, line, col):
+        """(chunk, Symbol) that name refers to at a document position, or (None, None).
+
+        Names in enclosing pool, cycle and catch scopes win; otherwise the
+        nearest top-level declaration above the position (or the first below).
+        """
+        self.analyze()
+        chunk = self.chunk_at(line)
+        if chunk is not None and chunk.symbols is not None:
+            symbol = chunk.symbols.resolve(name, self._relative(chunk, line, col))
+            if symbol is not None:
+                return chunk, symbol
+        candidates = self.names.get(name)
+        if not candidates:
+            return None, None
+        above = [c for c in candidates if c.start <= line]
+        best = max(above, key=lambda c: c.start) if above else min(candidates, key=lambda c: c.start)
+        return best, best.symbols.top[name][-1]
+
+    def definition_at(self, line, col):
+        """(chunk, Symbol) for the name under a document position, or (None, None)."""
+        chunk, entry = self.symbol_at(line, col)
+        if entry is None:
+            return None, None
+        if isinstance(entry, Reference):
+            return self.definition(entry.name, line, col)
+        return chunk, entry
+
+    def completions(self, line, col):
+        """Symbols visible at a document position, by name."""
+        self.analyze()
+        visible = {}
+        for name, chunks in self.names.items():
+            if chunks:
+                chunk = min(chunks, key=lambda c: c.start)
+                visible[name] = chunk.symbols.top[name][-1]
+        chunk = self.chunk_at(line)
+        if chunk is not None and chunk.symbols is not None:
+            visible.update(chunk.symbols.visible(self._relative(chunk, line, col)))
+        return visible
+
+    def outline(self):
+        """(chunk, Symbol) for every top-level declaration, in document order."""
+        self.analyze()
+        for chunk in self.chunks:
+            if chunk.symbols is not None:
+                for symbols in chunk.symbols.top.values():
+                    for symbol in symbols:
+                        yield chunk, symbol
@@ -0,0 +1,112 @@
+# Fused front end: type checking and semantic analysis in one traversal.
+# The type environment doubles as the semantic scope. A pool, cycle, catch
+# or branch body checks in a child TypeEnv, so entering a block is O(1) and
+# a name is defined exactly where the type checker binds it. Errors come out
+# in source order, as TypeError or SemanticError, whichever is met first.
+# check_type and analyze_semantics remain for callers wanting just one pass.
+
+from compiler.ast_nodes import (
+    ASSIGNMENT, CONSTANT_DECLARATION, CYCLE_STATEMENT, EXPRESSION_STATEMENT, FUNCTION_DECLARATION,
+    IF_STATEMENT, IMPORT_STATEMENT, PROGRAM, RETURN_STATEMENT, THROW_STATEMENT, TRY_CATCH_STATEMENT,
+    TYPE_DECLARATION, VARIABLE_DECLARATION, Node, from_dict,
+)
+from compiler.semantic_analyzer import SemanticError, parallel_reductions
+from compiler.type_checker import DROP, RIVULET, TURBULENCE, TypeEnv, TypeError, infer_type, intern_type
+
+def check_program(ast, env, functions=None, types=None):
+    """Type-check and analyze ast in env; functions and types collect declared names as in analyze_semantics."""
+    check_node(ast, env, set() if functions is None else functions, set() if types is None else types)
+
+def check_node(node, env, functions, types):
+    """Check one statement (or a whole Program), binding what it declares in env."""
+    if not isinstance(node, Node):
+        node = from_dict(node)
+    k = node.KIND
+    if k == PROGRAM:
+        _block(node.body, env, functions, types)
+    elif k in (VARIABLE_DECLARATION, CONSTANT_DECLARATION):
+        if env.has_var(node.name):
+            raise SemanticError(f"Variable '{node.name}' already defined in scope")
+        val_type = infer_type(node.value, env)
+        declared = k == VARIABLE_DECLARATION and node.declaredType and intern_type(node.declaredType)
+        if declared and declared is not val_type:
+            raise TypeError(f"Type mismatch for {node.name}: declared {declared}, assigned {val_type}")
+        env.set_var(node.name, declared or val_type)
+    elif k == ASSIGNMENT:
+        try:
+            var_type = intern_type(env.get_var(node.name))
+        except TypeError:
+            raise SemanticError(f"Assignment to undefined variable '{node.name}'")
+        val_type = infer_type(node.value, env)
+        if var_type is not val_type:
+            raise TypeError(f"Cannot assign {val_type} to {node.name} of type {var_type}")
+    elif k == FUNCTION_DECLARATION:
+        if node.name in functions:
+            raise SemanticError(f"Function '{node.name}' already defined")
+        functions.add(node.name)
+        env.set_func(node.name, ([p.type for p in node.params], node.returnType))
+        local_env = TypeEnv(env)
+        for param in node.params:
+            if param.name in local_env.vars:
+                raise SemanticError(f"Duplicate parameter: {param.name}")
+            local_env.set_var(param.name, param.type)
+        _block(node.body, local_env, functions, types)
+    elif k == TYPE_DECLARATION:
+        if node.name in types:
+            raise SemanticError(f"Type '{node.name}' already defined")
+        types.add(node.name)
+        fields = {}
+        for f in node.fields:
+            if f.name in fields:
+                raise SemanticError(f"Duplicate field {f.name} in type {node.name}")
+            fields[f.name] = f.type
+        env.set_type(node.name, fields)
+    elif k == IF_STATEMENT:
+        # Each branch binds in its own layer, so alternatives may pour the same
+        # name; what they bind is visible after the if, as at run time.
+        branches = []
+        for when in node.whens:
+            cond_type = infer_type(when.condition, env)
+            if cond_type is not DROP:
+                raise TypeError("If condition must be drop (boolean), got " + cond_type)
+            branches.append(_branch(when.body, env, functions, types))
+        if node.otherwise:
+            branches.append(_branch(node.otherwise.body, env, functions, types))
+        for branch in branches:
+            env.vars.update(branch.vars)
+            env.funcs.update(branch.funcs)
+            env.types.update(branch.types)
+    elif k == CYCLE_STATEMENT:
+        if node.parallel:
+            parallel_reductions(node)
+        coll_type = infer_type(node.collection, env)
+        if coll_type.element is None:
+            raise TypeError("Can only cycle through lists, got " + coll_type)
+        local_env = TypeEnv(env)
+        local_env.set_var(node.element, coll_type.element)
+        _block(node.body, local_env, functions, types)
+    elif k == TRY_CATCH_STATEMENT:
+        _block(node.tryBlock, TypeEnv(env), functions, types)
+        catch_env = TypeEnv(env)
+        catch_env.set_var(node.errVar, TURBULENCE)
+        _block(node.catchBlock, catch_env, functions, types)
+    elif k == THROW_STATEMENT:
+        if infer_type(node.value, env) is not RIVULET:
+            raise TypeError("Turbulence/error must be rivulet (string)")
+    elif k == RETURN_STATEMENT:
+        infer_type(node.value, env)
+    elif k == EXPRESSION_STATEMENT:
+        infer_type(node.expression, env)
+    elif k == IMPORT_STATEMENT:
+        pass
+    else:
+        raise TypeError(f"Unknown node type: {node.TYPE}")
+
+def _block(stmts, env, functions, types):
+    for stmt in stmts:
+        check_node(stmt, env, functions, types)
+
+def _branch(stmts, env, functions, types):
+    branch_env = TypeEnv(env)
+    _block(stmts, branch_env, functions, types)
+    return branch_env
@@ -0,0 +1,59 @@
+# Host-provided channels.
+# Channels such as current.file are implemented by the runtime rather than
+# loaded from project sources. Each entry of HOST_CHANNELS builds the pools a
+# channel exports, as name -> ((param types, return type), callable), given
+# a function resolving reservoir names to their fields.
+
+from compiler.basin import StreamBasin
+from compiler.csv_records import CsvRowError, read_columns, read_records
+from compiler.interpreter import CascadeRuntimeError
+
+def _warn(error):
+    # Same format as the [WARN] lines of a project's logging channel.
+    print(f"[WARN] {error}")
+
+def file_channel(find_type):
+    """current.file: whole-file reads, streaming CSV records and columnar CSV loads."""
+    def read(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError as e:
+            raise CascadeRuntimeError(f"Cannot read {path}: {e}")
+
+    def fields_of(reservoir):
+        fields = find_type(reservoir)
+        if fields is None:
+            raise CascadeRuntimeError(f"Undefined type '{reservoir}'")
+        return fields
+
+    def read_csv(path, reservoir):
+        records = read_records(path, fields_of(reservoir), errors='skip', on_error=_warn)
+        return StreamBasin(_checked(records, path))
+
+    def load_csv(path, reservoir):
+        fields = fields_of(reservoir)
+        try:
+            return read_columns(path, fields, errors='skip', on_error=_warn)
+        except (OSError, CsvRowError) as e:
+            raise _runtime_error(path, e)
+
+    return {
+        'read': ((['rivulet'], 'rivulet'), read),
+        'read_csv': ((['rivulet', 'rivulet'], '[Any]'), read_csv),
+        'load_csv': ((['rivulet', 'rivulet'], '[Any]'), load_csv),
+    }
+
+def _checked(records, path):
+    """records, with I/O and header errors surfaced as Cascade runtime errors."""
+    try:
+        yield from records
+    except (OSError, CsvRowError) as e:
+        raise _runtime_error(path, e)
+
+def _runtime_error(path, error):
+    return CascadeRuntimeError(f"Cannot read {path}: {error}" if isinstance(error, OSError) else str(error))
+
+HOST_CHANNELS = {
+    'current.file': file_channel,
+}
@@ -1,5 +1,31 @@
 # Interpreter for Cascade language
 # Executes the AST generated by the parser, with robust error handling.
+# eval_expr/exec_stmt are the reference tree-walker; run_program compiles the
+# AST once into a tree of Python closures and runs that instead, with every
+# variable resolved ahead of time to a (depth, slot) pair in a list-backed Frame.
+# Compiled statements report `return` as a status value rather than raising.
+# A `cycle ... in parallel` runs its elements in fixed-size partitions on a
+# process pool; each worker is sent, once, what the body reads of the cycle's
+# frame chain, the pools it reaches as ASTs and the function table, and each
+# partition returns its reductions for an in-order merge.
+# With a profiler installed (set_profiler), call sites and statements compile
+# to instrumented closures; see profiler.py.
+
+import hashlib
+import operator
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from compiler.ast_nodes import (
+    ASSIGNMENT, BINARY_EXPR, BOOLEAN_LITERAL, CONSTANT_DECLARATION, CYCLE_STATEMENT, EXPRESSION_STATEMENT,
+    FUNCTION_CALL, FUNCTION_DECLARATION, IDENTIFIER, IF_STATEMENT, IMPORT_STATEMENT, LIST_LITERAL,
+    MAP_LITERAL, NUMBER_LITERAL, RETURN_STATEMENT, STRING_LITERAL, THROW_STATEMENT, TRY_CATCH_STATEMENT,
+    TYPE_DECLARATION, VARIABLE_DECLARATION, CycleStatement, ExpressionStatement, FunctionCall, IfStatement,
+    Node, Otherwise, TryCatchStatement, When, as_node, from_dict,
+)
+from compiler.basin import DepthBasin, is_depth
+from compiler.semantic_analyzer import SemanticError, names_read, parallel_reductions
 
 class CascadeRuntimeError(Exception):
     """Raised for runtime errors in Cascade programs."""
@@ -26,27 +52,31 @@ class Env:
 
 def eval_expr(expr, env, functions):
     """Evaluate an expression node."""
-    t = expr['type']
-    if t == 'NumberLiteral':
-        return expr['value']
-    if t == 'StringLiteral':
-        return expr['value']
-    if t == 'BooleanLiteral':
-        return expr['value']
-    if t == 'ListLiteral':
-        return [eval_expr(el, env, functions) for el in expr['elements']]
-    if t == 'MapLiteral':
-        return {pair['key']: eval_expr(pair['value'], env, functions) for pair in expr['pairs']}
-    if t == 'Identifier':
-        return env.get(expr['value'])
-    if t == 'FunctionCall':
-        f = functions[expr['name']]
-        args = [eval_expr(arg, env, functions) for arg in expr.get('args',[])]
+    if not isinstance(expr, Node):
+        expr = from_dict(expr)
+    k = expr.KIND
+    if k == NUMBER_LITERAL:
+        return expr.value
+    if k == STRING_LITERAL:
+        return expr.value
+    if k == BOOLEAN_LITERAL:
+        return expr.value
+    if k == LIST_LITERAL:
+        return [eval_expr(el, env, functions) for el in expr.elements]
+    if k == MAP_LITERAL:
+        return {pair.key: eval_expr(pair.value, env, functions) for pair in expr.pairs}
+    if k == IDENTIFIER:
+        return env.get(expr.value)
+    if k == FUNCTION_CALL:
+        f = functions[expr.name]
+        args = [eval_expr(arg, env, functions) for arg in (expr.args or [])]
         return f(*args)
-    if t == 'BinaryExpr':
-        l = eval_expr(expr['left'], env, functions)
-        r = eval_expr(expr['right'], env, functions)
-        op = expr['operator']
+    if k == BINARY_EXPR:
+        l = eval_expr(expr.left, env, functions)
+        r = eval_expr(expr.right, env, functions)
+        op = expr.operator
+        if op in ARITHMETIC_OPS and (type(l) is list or type(r) is list):
+            return list_arithmetic(op, l, r)
         if op == '+': return l + r
         if op == '-': return l - r
         if op == '*': return l * r
@@ -60,7 +90,7 @@ def eval_expr(expr, env, functions):
         if op == '&&': return l and r
         if op == '||': return l or r
         raise CascadeRuntimeError(f"Unknown operator {op}")
-    raise CascadeRuntimeError(f"Unknown expression type: {t}")
+    raise CascadeRuntimeError(f"Unknown expression type: {expr.TYPE}")
 
 class ReturnSignal(Exception):
     """Special exception for returning from a function."""
@@ -69,74 +99,832 @@ class ReturnSignal(Exception):
 
 def exec_stmt(stmt, env, functions, types):
     """Execute a statement node."""
-    t = stmt['type']
-    if t == 'VariableDeclaration':
-        val = eval_expr(stmt['value'], env, functions)
-        env.set(stmt['name'], val)
-    elif t == 'Assignment':
-        val = eval_expr(stmt['value'], env, functions)
-        env.set(stmt['name'], val)
-    elif t == 'ConstantDeclaration':
-        val = eval_expr(stmt['value'], env, functions)
-        env.set(stmt['name'], val)
-    elif t == 'FunctionDeclaration':
+    if not isinstance(stmt, Node):
+        stmt = from_dict(stmt)
+    k = stmt.KIND
+    if k == VARIABLE_DECLARATION:
+        val = eval_expr(stmt.value, env, functions)
+        env.set(stmt.name, val)
+    elif k == ASSIGNMENT:
+        val = eval_expr(stmt.value, env, functions)
+        env.set(stmt.name, val)
+    elif k == CONSTANT_DECLARATION:
+        val = eval_expr(stmt.value, env, functions)
+        env.set(stmt.name, val)
+    elif k == FUNCTION_DECLARATION:
         def user_fn(*args):
             local_env = Env(env)
-            for ix, param in enumerate(stmt['params']):
-                local_env.set(param['name'], args[ix])
+            for ix, param in enumerate(stmt.params):
+                local_env.set(param.name, args[ix])
             try:
-                for s in stmt['body']:
+                for s in stmt.body:
                     exec_stmt(s, local_env, functions, types)
             except ReturnSignal as ret:
                 return ret.value
-        functions[stmt['name']] = user_fn
-    elif t == 'TypeDeclaration':
-        types[stmt['name']] = {f['name']:f['type'] for f in stmt['fields']}
-    elif t == 'IfStatement':
-        for when in stmt['whens']:
-            cond = eval_expr(when['condition'], env, functions)
+        functions[stmt.name] = user_fn
+    elif k == TYPE_DECLARATION:
+        types[stmt.name] = {f.name: f.type for f in stmt.fields}
+    elif k == IF_STATEMENT:
+        for when in stmt.whens:
+            cond = eval_expr(when.condition, env, functions)
             if cond:
-                for s in when['body']:
+                for s in when.body:
                     exec_stmt(s, env, functions, types)
                 return
-        if stmt['otherwise']:
-            for s in stmt['otherwise']['body']:
+        if stmt.otherwise:
+            for s in stmt.otherwise.body:
                 exec_stmt(s, env, functions, types)
-    elif t == 'CycleStatement':
-        coll = eval_expr(stmt['collection'], env, functions)
+    elif k == CYCLE_STATEMENT and stmt.parallel:
+        # The reference semantics of a parallel cycle: one partition, run in order.
+        try:
+            targets = parallel_reductions(stmt)
+        except SemanticError as e:
+            raise CascadeRuntimeError(str(e))
+        body = reduction_body(stmt.body, targets)
+        table = _ReductionTable(functions, targets)
+        for el in eval_expr(stmt.collection, env, functions):
+            local_env = Env(env)
+            local_env.set(stmt.element, el)
+            for s in body:
+                exec_stmt(s, local_env, table, types)
+        for name, value in table.partials.items():
+            target = env
+            while target is not None and name not in target.vars:
+                target = target.parent
+            if target is None:
+                raise CascadeRuntimeError(f"Variable '{name}' not found")
+            target.vars[name] = combine(target.vars[name], [value])
+    elif k == CYCLE_STATEMENT:
+        coll = eval_expr(stmt.collection, env, functions)
         for el in coll:
             local_env = Env(env)
-            local_env.set(stmt['element'], el)
-            for s in stmt['body']:
+            local_env.set(stmt.element, el)
+            for s in stmt.body:
                 exec_stmt(s, local_env, functions, types)
-    elif t == 'TryCatchStatement':
+    elif k == TRY_CATCH_STATEMENT:
         try:
-            for s in stmt['tryBlock']:
+            for s in stmt.tryBlock:
                 exec_stmt(s, env, functions, types)
         except CascadeRuntimeError as e:
             catch_env = Env(env)
-            catch_env.set(stmt['errVar'], str(e))
-            for s in stmt['catchBlock']:
+            catch_env.set(stmt.errVar, str(e))
+            for s in stmt.catchBlock:
                 exec_stmt(s, catch_env, functions, types)
-    elif t == 'ThrowStatement':
-        val = eval_expr(stmt['value'], env, functions)
+    elif k == THROW_STATEMENT:
+        val = eval_expr(stmt.value, env, functions)
         raise CascadeRuntimeError(str(val))
-    elif t == 'ReturnStatement':
-        val = eval_expr(stmt['value'], env, functions)
+    elif k == RETURN_STATEMENT:
+        val = eval_expr(stmt.value, env, functions)
         raise ReturnSignal(val)
-    elif t == 'ExpressionStatement':
-        eval_expr(stmt['expression'], env, functions)
-    elif t == 'ImportStatement':
-        # Imports are no-ops in the interpreter but could load modules in the future.
+    elif k == EXPRESSION_STATEMENT:
+        eval_expr(stmt.expression, env, functions)
+    elif k == IMPORT_STATEMENT:
+        # Channels are opened before the program runs and called through functions (see modules.py).
         pass
     else:
-        raise CascadeRuntimeError(f"Unknown statement type: {t}")
+        raise CascadeRuntimeError(f"Unknown statement type: {stmt.TYPE}")
+
+def _logical_and(l, r):
+    return l and r
+
+def _logical_or(l, r):
+    return l or r
+
+BINARY_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    # Both operands are evaluated before combining, exactly as eval_expr does.
+    '&&': _logical_and,
+    '||': _logical_or,
+}
+
+ARITHMETIC_OPS = ('+', '-', '*', '/')
+
+def list_arithmetic(op, left, right):
+    """left op right where one side is a plain list, with the [depth] semantics DepthBasins have.
+
+    Only long homogeneous literals are packed, so [depth] values also reach
+    arithmetic as plain lists: `+` joins them to anything but a depth (other
+    lists, DepthBasins, ReservoirBasins), and otherwise a list of depths takes
+    part element-wise as a DepthBasin would.
+    """
+    if op == '+' and not is_depth(left) and not is_depth(right):
+        try:
+            return left + right
+        except TypeError:
+            raise CascadeRuntimeError(f"Operator + cannot join {left!r} and {right!r}")
+    operands = []
+    for value in (left, right):
+        if type(value) is list:
+            if not all(is_depth(x) for x in value):
+                raise CascadeRuntimeError(f"Operator {op} expects depth elements, got {value!r}")
+            value = DepthBasin.from_values(value)
+        elif not isinstance(value, DepthBasin) and not is_depth(value):
+            raise CascadeRuntimeError(f"Operator {op} expects depth or [depth], got {value!r}")
+        operands.append(value)
+    try:
+        return BINARY_OPS[op](*operands)
+    except ValueError as e:
+        raise CascadeRuntimeError(str(e))
+
+class _Unset:
+    """Marker for a frame slot whose variable has not been bound yet."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return '<unset>'
+
+    def __reduce__(self):
+        # Frames shipped to parallel cycle workers keep UNSET a singleton.
+        return 'UNSET'
+
+UNSET = _Unset()
+
+# The installed profiler.Profiler, consulted only while compiling.
+PROFILER = None
+
+def set_profiler(profiler):
+    """Compile programs run from now on with profiler's instruments (None: without)."""
+    global PROFILER
+    PROFILER = profiler
+
+# Only list literals at least this long are packed into DepthBasins; a
+# one-element `[x]` is the append idiom and stays a plain list.
+PACKED_LITERAL_MIN = 2
+
+class Return:
+    """Completion status of a statement closure that executed `return`.
+
+    Statement closures return None on normal completion; any other value is a
+    control-flow status that enclosing blocks pass outward unchanged.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+class Scope:
+    """Static description of one lexical scope: the slot assigned to each name."""
+    __slots__ = ('names', 'slots', 'parent')
+
+    def __init__(self, names, parent=None):
+        self.names = tuple(names)
+        self.slots = {name: ix for ix, name in enumerate(self.names)}
+        self.parent = parent
+
+    def resolve(self, name):
+        """Return every (depth, slot) that may hold name, innermost first.
+
+        A scope binds a name only once a statement in it has run, so a read
+        falls back to outer candidates while the inner slot is still UNSET.
+        """
+        candidates = []
+        scope, depth = self, 0
+        while scope is not None:
+            if name in scope.slots:
+                candidates.append((depth, scope.slots[name]))
+            scope, depth = scope.parent, depth + 1
+        return tuple(candidates)
+
+def scope_bindings(stmts, names=None):
+    """Collect, in first-binding order, the names stmts bind in their own scope.
+
+    If/when branches and try blocks run in the enclosing scope; cycle bodies,
+    catch blocks and pool bodies open scopes of their own.
+    """
+    if names is None:
+        names = {}
+    for stmt in stmts:
+        k = stmt.KIND
+        if k in (VARIABLE_DECLARATION, ASSIGNMENT, CONSTANT_DECLARATION):
+            names.setdefault(stmt.name, None)
+        elif k == IF_STATEMENT:
+            for when in stmt.whens:
+                scope_bindings(when.body, names)
+            if stmt.otherwise:
+                scope_bindings(stmt.otherwise.body, names)
+        elif k == TRY_CATCH_STATEMENT:
+            scope_bindings(stmt.tryBlock, names)
+    return list(names)
+
+def child_scope(first_names, stmts, parent):
+    """Build the Scope for a block whose leading slots are bound on entry."""
+    names = dict.fromkeys(first_names)
+    return Scope(scope_bindings(stmts, names), parent)
+
+class Frame:
+    """List-backed activation record for one Scope."""
+    __slots__ = ('values', 'parent', 'scope')
+
+    def __init__(self, scope, values, parent=None):
+        self.scope = scope
+        self.values = values
+        self.parent = parent
+
+    @property
+    def vars(self):
+        """The bound variables of this frame as a dict (for output and debugging)."""
+        return {name: value for name, value in zip(self.scope.names, self.values) if value is not UNSET}
+
+    def get(self, name):
+        """Get variable value from current or parent frame by name."""
+        slot = self.scope.slots.get(name)
+        if slot is not None and self.values[slot] is not UNSET:
+            return self.values[slot]
+        if self.parent is not None:
+            return self.parent.get(name)
+        raise CascadeRuntimeError(f"Variable '{name}' not found")
+
+def _compile_error(message):
+    """Compile a node the tree-walker would reject into a closure raising the same error."""
+    def fail(frame):
+        raise CascadeRuntimeError(message)
+    return fail
+
+def _compile_lookup(name, scope):
+    """Compile a variable read into indexed frame accesses."""
+    candidates = scope.resolve(name)
+    if len(candidates) == 1:
+        depth, slot = candidates[0]
+        if depth == 0:
+            def local(frame):
+                value = frame.values[slot]
+                if value is UNSET:
+                    raise CascadeRuntimeError(f"Variable '{name}' not found")
+                return value
+            return local
+        if depth == 1:
+            def enclosing(frame):
+                value = frame.parent.values[slot]
+                if value is UNSET:
+                    raise CascadeRuntimeError(f"Variable '{name}' not found")
+                return value
+            return enclosing
+    def lookup(frame):
+        for depth, slot in candidates:
+            target = frame
+            for _ in range(depth):
+                target = target.parent
+            value = target.values[slot]
+            if value is not UNSET:
+                return value
+        raise CascadeRuntimeError(f"Variable '{name}' not found")
+    return lookup
+
+def compile_expr(expr, functions, scope):
+    """Compile an expression node into a closure taking the current Frame."""
+    if not isinstance(expr, Node):
+        expr = from_dict(expr)
+    k = expr.KIND
+    if k in (NUMBER_LITERAL, STRING_LITERAL, BOOLEAN_LITERAL):
+        value = expr.value
+        return lambda frame: value
+    if k == LIST_LITERAL:
+        if len(expr.elements) >= PACKED_LITERAL_MIN and all(el.KIND == NUMBER_LITERAL for el in expr.elements):
+            # Homogeneous [depth] literals become packed basins; each evaluation gets its own copy.
+            packed = DepthBasin.from_values(el.value for el in expr.elements)
+            return lambda frame: packed.copy()
+        elements = tuple(compile_expr(el, functions, scope) for el in expr.elements)
+        return lambda frame: [el(frame) for el in elements]
+    if k == MAP_LITERAL:
+        pairs = tuple((pair.key, compile_expr(pair.value, functions, scope)) for pair in expr.pairs)
+        return lambda frame: {key: value(frame) for key, value in pairs}
+    if k == IDENTIFIER:
+        return _compile_lookup(expr.value, scope)
+    if k == FUNCTION_CALL:
+        name = expr.name
+        args = tuple(compile_expr(arg, functions, scope) for arg in (expr.args or []))
+        if PROFILER is not None:
+            return PROFILER.call_site(name, functions, args)
+        # Functions are looked up per call: pools may be declared after the call site.
+        if not args:
+            return lambda frame: functions[name]()
+        if len(args) == 1:
+            arg0, = args
+            return lambda frame: functions[name](arg0(frame))
+        return lambda frame: functions[name](*[arg(frame) for arg in args])
+    if k == BINARY_EXPR:
+        op = expr.operator
+        fn = BINARY_OPS.get(op)
+        if fn is None:
+            return _compile_error(f"Unknown operator {op}")
+        left = compile_expr(expr.left, functions, scope)
+        right = compile_expr(expr.right, functions, scope)
+        if op in ARITHMETIC_OPS:
+            def arithmetic(frame):
+                l = left(frame)
+                r = right(frame)
+                if type(l) is list or type(r) is list:
+                    return list_arithmetic(op, l, r)
+                return fn(l, r)
+            return arithmetic
+        return lambda frame: fn(left(frame), right(frame))
+    return _compile_error(f"Unknown expression type: {expr.TYPE}")
+
+# References to a list held only by its frame slot, as seen by
+# sys.getrefcount from inside _compile_self_append: the slot, the local
+# variable and the call argument. None where refcounts are unavailable.
+_UNALIASED_REFS = 3 if hasattr(sys, 'getrefcount') else None
+
+def _is_self_append(stmt):
+    """True for `fill xs with xs + <expr>` on a local variable."""
+    value = stmt.value
+    return (stmt.KIND == ASSIGNMENT and value.KIND == BINARY_EXPR and value.operator == '+'
+            and value.left.KIND == IDENTIFIER and value.left.value == stmt.name)
+
+def _compile_self_append(slot, left, right):
+    """Compile `xs = xs + ys` to extend xs in place when no one else can observe it.
+
+    The fast path needs two plain lists, the left one bound in this very frame
+    (a read that falls back to an outer scope must not mutate the outer list)
+    and referenced only by that slot; everything else goes through
+    list_arithmetic exactly as any other `+` on a list does.
+    """
+    getrefcount = sys.getrefcount
+    def append(frame):
+        values = frame.values
+        current = values[slot]
+        if type(current) is list:
+            extra = right(frame)
+            if type(extra) is list and getrefcount(current) <= _UNALIASED_REFS:
+                current += extra
+            else:
+                values[slot] = list_arithmetic('+', current, extra)
+        else:
+            current = left(frame)
+            extra = right(frame)
+            if type(current) is list or type(extra) is list:
+                values[slot] = list_arithmetic('+', current, extra)
+            else:
+                values[slot] = current + extra
+    return append
+
+def compile_block(stmts, functions, types, scope):
+    """Compile a list of statements into a single closure running them in order."""
+    compiled = tuple(compile_stmt(s, functions, types, scope) for s in stmts)
+    if PROFILER is not None:
+        compiled = tuple(PROFILER.statement(c, as_node(s)) for c, s in zip(compiled, stmts))
+    if len(compiled) == 1:
+        return compiled[0]
+    def block(frame):
+        for s in compiled:
+            status = s(frame)
+            if status is not None:
+                return status
+    return block
+
+def compile_stmt(stmt, functions, types, scope):
+    """Compile a statement node into a closure taking the current Frame."""
+    if not isinstance(stmt, Node):
+        stmt = from_dict(stmt)
+    k = stmt.KIND
+    if k in (VARIABLE_DECLARATION, ASSIGNMENT, CONSTANT_DECLARATION):
+        # Bindings always land in the current scope, which reserved a slot for them.
+        slot = scope.slots[stmt.name]
+        if _UNALIASED_REFS is not None and _is_self_append(stmt):
+            return _compile_self_append(slot, compile_expr(stmt.value.left, functions, scope),
+                                        compile_expr(stmt.value.right, functions, scope))
+        value = compile_expr(stmt.value, functions, scope)
+        def assign(frame):
+            frame.values[slot] = value(frame)
+        return assign
+    if k == FUNCTION_DECLARATION:
+        name = stmt.name
+        param_count = len(stmt.params)
+        local_scope = child_scope([param.name for param in stmt.params], stmt.body, scope)
+        unbound = [UNSET] * (len(local_scope.names) - param_count)
+        body = compile_block(stmt.body, functions, types, local_scope)
+        def declare(frame):
+            def user_fn(*args):
+                if len(args) < param_count:
+                    raise IndexError("tuple index out of range")
+                values = list(args[:param_count])
+                values += unbound
+                status = body(Frame(local_scope, values, frame))
+                if status is not None:
+                    return status.value
+            # Kept so parallel cycles and ship_pool can redeclare the pool in worker processes.
+            user_fn.declaration = stmt
+            user_fn.frame = frame
+            user_fn.table = functions
+            functions[name] = user_fn
+        return declare
+    if k == TYPE_DECLARATION:
+        name = stmt.name
+        fields = {f.name: f.type for f in stmt.fields}
+        def declare_type(frame):
+            types[name] = dict(fields)
+        return declare_type
+    if k == IF_STATEMENT:
+        whens = tuple((compile_expr(when.condition, functions, scope),
+                       compile_block(when.body, functions, types, scope))
+                      for when in stmt.whens)
+        otherwise = compile_block(stmt.otherwise.body, functions, types, scope) if stmt.otherwise else None
+        def branch(frame):
+            for cond, body in whens:
+                if cond(frame):
+                    return body(frame)
+            if otherwise is not None:
+                return otherwise(frame)
+        return branch
+    if k == CYCLE_STATEMENT and stmt.parallel:
+        return _compile_parallel_cycle(stmt, functions, types, scope)
+    if k == CYCLE_STATEMENT:
+        collection = compile_expr(stmt.collection, functions, scope)
+        local_scope = child_scope([stmt.element], stmt.body, scope)
+        unbound = [UNSET] * (len(local_scope.names) - 1)
+        body = compile_block(stmt.body, functions, types, local_scope)
+        def cycle(frame):
+            for el in collection(frame):
+                values = [el]
+                values += unbound
+                status = body(Frame(local_scope, values, frame))
+                if status is not None:
+                    return status
+        return cycle
+    if k == TRY_CATCH_STATEMENT:
+        try_block = compile_block(stmt.tryBlock, functions, types, scope)
+        catch_scope = child_scope([stmt.errVar], stmt.catchBlock, scope)
+        unbound = [UNSET] * (len(catch_scope.names) - 1)
+        catch_block = compile_block(stmt.catchBlock, functions, types, catch_scope)
+        def try_catch(frame):
+            try:
+                return try_block(frame)
+            except CascadeRuntimeError as e:
+                values = [str(e)]
+                values += unbound
+                return catch_block(Frame(catch_scope, values, frame))
+        return try_catch
+    if k == THROW_STATEMENT:
+        value = compile_expr(stmt.value, functions, scope)
+        def throw(frame):
+            raise CascadeRuntimeError(str(value(frame)))
+        return throw
+    if k == RETURN_STATEMENT:
+        value = compile_expr(stmt.value, functions, scope)
+        def ret(frame):
+            return Return(value(frame))
+        return ret
+    if k == EXPRESSION_STATEMENT:
+        expression = compile_expr(stmt.expression, functions, scope)
+        def evaluate(frame):
+            expression(frame)
+        return evaluate
+    if k == IMPORT_STATEMENT:
+        # Channels are opened before the program runs and called through functions (see modules.py).
+        return lambda frame: None
+    return _compile_error(f"Unknown statement type: {stmt.TYPE}")
+
+# Prefix of the function names reductions are rewritten to call; it cannot
+# start an identifier, so it never collides with a pool.
+REDUCE_PREFIX = 'reduce:'
 
-def run_program(ast):
-    """Run a Cascade program AST. Returns the final environment, functions, and types."""
-    env = Env()
-    functions = {}
+# A parallel cycle splits its collection into at most PARALLEL_PARTITIONS
+# partitions of at least PARALLEL_MIN_CHUNK elements. Partitioning depends
+# only on the length, never on the worker count, so results are the same
+# however many workers run them.
+PARALLEL_PARTITIONS = 32
+PARALLEL_MIN_CHUNK = 64
+
+# Worker processes for parallel cycles (None: one per CPU); see set_parallel_workers.
+PARALLEL_WORKERS = None
+
+_executor = None
+_in_worker = False
+
+def set_parallel_workers(count):
+    """Use count worker processes for parallel cycles (None: one per CPU, 1: run in-process)."""
+    global PARALLEL_WORKERS, _executor
+    PARALLEL_WORKERS = count
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+def _mark_worker():
+    global _in_worker, PROFILER
+    _in_worker = True
+    # A forked worker must not record into its copy of the parent's profiler.
+    PROFILER = None
+
+def _worker_count():
+    return PARALLEL_WORKERS or os.cpu_count() or 1
+
+def _parallel_executor():
+    """The shared worker pool, or None when partitions should run in this process."""
+    global _executor
+    workers = _worker_count()
+    # A parallel cycle inside a worker's partition runs there rather than forking again.
+    if workers <= 1 or _in_worker:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers, initializer=_mark_worker)
+    return _executor
+
+def combine(current, values):
+    """current + values[0] + values[1] + ..., extending a list built here in place."""
+    fresh = False
+    for value in values:
+        if fresh and type(current) is list and type(value) is list:
+            current += value
+        else:
+            current = current + value
+            fresh = True
+    return current
+
+class _ReductionTable(dict):
+    """Function table of a parallel cycle body.
+
+    `reduce:<name>` calls add to the running partition's partial for name;
+    every other name comes from the cycle's own function table.
+    """
+    def __init__(self, base, targets):
+        super().__init__()
+        self.base = base
+        self.partials = {}
+        for name in targets:
+            self[REDUCE_PREFIX + name] = self._adder(name)
+
+    def _adder(self, name):
+        def add(value):
+            partials = self.partials
+            if name in partials:
+                partials[name] = combine(partials[name], [value])
+            else:
+                partials[name] = list(value) if type(value) is list else value
+        return add
+
+    def __missing__(self, name):
+        return self.base[name]
+
+def _rewrite_reductions(stmt, targets):
+    k = stmt.KIND
+    if k == ASSIGNMENT and stmt.name in targets:
+        return ExpressionStatement(FunctionCall(REDUCE_PREFIX + stmt.name, [stmt.value.right]), span=stmt.span)
+    if k == IF_STATEMENT:
+        whens = [When(when.condition, reduction_body(when.body, targets), span=when.span) for when in stmt.whens]
+        otherwise = stmt.otherwise and Otherwise(reduction_body(stmt.otherwise.body, targets), span=stmt.otherwise.span)
+        return IfStatement(whens, otherwise, span=stmt.span)
+    if k == CYCLE_STATEMENT:
+        return CycleStatement(stmt.collection, stmt.element, reduction_body(stmt.body, targets), stmt.parallel,
+                              span=stmt.span)
+    if k == TRY_CATCH_STATEMENT:
+        return TryCatchStatement(reduction_body(stmt.tryBlock, targets), stmt.errVar,
+                                 reduction_body(stmt.catchBlock, targets), span=stmt.span)
+    return stmt
+
+def reduction_body(stmts, targets):
+    """stmts with each `fill t with t + e` on a reduction target t rewritten to a `reduce:t(e)` call."""
+    return [_rewrite_reductions(from_dict(stmt), targets) for stmt in stmts]
+
+def _run_partition(frame, table, body, local_scope, unbound, items):
+    """Run body for each of items in frame's scope; returns the partition's partials."""
+    saved, table.partials = table.partials, {}
+    try:
+        for el in items:
+            values = [el]
+            values += unbound
+            body(Frame(local_scope, values, frame))
+        return table.partials
+    finally:
+        table.partials = saved
+
+def _redeclare(frame, functions, plain, pools, types):
+    """Fill a shipped function table: plain callables, then each pool declared at its depth in frame's chain."""
+    functions.update(plain)
+    for declaration, depth in pools:
+        owner = frame
+        for _ in range(depth):
+            owner = owner.parent
+        compile_stmt(declaration, functions, types, owner.scope)(owner)
+
+class _ShippedCycle:
+    """The picklable part of a parallel cycle, compiled where it is unpickled (see _prepare_cycle)."""
+    __slots__ = ('parts',)
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __reduce__(self):
+        return (_prepare_cycle, self.parts)
+
+def _prepare_cycle(frame, functions, plain, pools, types, body, element, targets):
+    """Rebuild a shipped cycle: the _run_partition arguments for its partitions."""
+    _redeclare(frame, functions, plain, pools, types)
+    table = _ReductionTable(functions, targets)
+    local_scope = child_scope([element], body, frame.scope)
+    unbound = [UNSET] * (len(local_scope.names) - 1)
+    return frame, table, compile_block(body, table, types, local_scope), local_scope, unbound
+
+def _run_prepared_partition(prepared, items):
+    return _run_partition(*prepared, items)
+
+def _portable_functions(functions, frame):
+    """Split functions for shipping: an empty picklable table, other callables, and pools.
+
+    Pools declared in frame's chain are returned as (declaration, depth).
+
+    Pools are shipped as ASTs and redeclared against the shipped frame at the
+    same depth. Tables other than plain dicts pickle themselves (see
+    modules.ChannelFunctions); pools from elsewhere are looked up through them.
+    """
+    depths = {}
+    depth = 0
+    while frame is not None:
+        depths[id(frame)] = depth
+        frame, depth = frame.parent, depth + 1
+    table = {} if type(functions) is dict else functions
+    plain, pools = {}, []
+    for name, fn in dict.items(functions):
+        if getattr(fn, 'declaration', None) is None:
+            plain[name] = fn
+        elif id(fn.frame) in depths:
+            pools.append((fn.declaration, depths[id(fn.frame)]))
+    return table, plain, pools
+
+def _shipped_reads(stmts, pools):
+    """names_read(stmts) plus those of every pool in pools that can be reached through them."""
+    names = names_read(stmts)
+    pending = list(pools)
+    while True:
+        reached = [pool for pool in pending if pool[0].name in names]
+        if not reached:
+            return names
+        pending = [pool for pool in pending if pool not in reached]
+        names |= names_read(declaration for declaration, _ in reached)
+
+def _trimmed_chain(frame, names):
+    """A copy of frame's chain holding only the values of names; every other slot is UNSET.
+
+    The scopes are kept, so code compiled against the chain finds its slots.
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.parent
+    for original in reversed(frames):
+        values = [value if name in names else UNSET for name, value in zip(original.scope.names, original.values)]
+        frame = Frame(original.scope, values, frame)
+    return frame
+
+class _ShippedPool:
+    """Picklable wrapper of a compiled pool, redeclared from its AST where it is unpickled.
+
+    It carries the pools of its frame chain that it can reach and, of the
+    chain's variables, only the ones those pools read.
+    """
+    __slots__ = ('fn', 'job')
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.job = None
+
+    def __call__(self, *args):
+        return self.fn(*args)
+
+    def __reduce__(self):
+        if self.job is None:
+            fn = self.fn
+            functions, plain, pools = _portable_functions(fn.table, fn.frame)
+            names = _shipped_reads([fn.declaration], pools)
+            pools = [pool for pool in pools if pool[0].name in names]
+            pools.append((fn.declaration, 0))
+            self.job = pickle.dumps((_trimmed_chain(fn.frame, names), functions, plain, pools, fn.declaration.name))
+        return (_unship_pool, (self.job,))
+
+def _unship_pool(job):
+    frame, functions, plain, pools, name = pickle.loads(job)
+    _redeclare(frame, functions, plain, pools, {})
+    return functions[name]
+
+def ship_pool(fn):
+    """A picklable stand-in for fn if it is a compiled pool, else fn itself.
+
+    The pool travels as its declaration plus what it reads of the frame chain
+    it closes over (as parallel cycles ship theirs), so it can run in a
+    worker process.
+    """
+    if getattr(fn, 'declaration', None) is None:
+        return fn
+    return _ShippedPool(fn)
+
+class _NotShipped(Exception):
+    """Raised by a worker given a task for a job it has not received yet."""
+
+# The job most recently received in this worker process, as (key, unpickled job).
+_received = None
+
+def _run_shipped(run, key, job, items):
+    """Worker entry point: run(the job for key, items), unpickling job when it is new to this worker."""
+    global _received
+    if _received is None or _received[0] != key:
+        if job is None:
+            raise _NotShipped(key)
+        _received = key, pickle.loads(job)
+    return run(_received[1], items)
+
+def map_shipped(executor, workers, run, shipped, chunks):
+    """[run(shipped, chunk) for each chunk], with the chunks run on executor's worker processes.
+
+    shipped is pickled once, and each worker unpickles it once: only the
+    first `workers` tasks carry it, and the rest name it by a key. A worker
+    that takes a task before it has the job rejects it, and the task is
+    sent again with the job.
+    """
+    job = pickle.dumps(shipped)
+    key = hashlib.sha1(job).digest()
+    futures = [executor.submit(_run_shipped, run, key, job if ix < workers else None, chunk)
+               for ix, chunk in enumerate(chunks)]
+    results = []
+    for future, chunk in zip(futures, chunks):
+        try:
+            results.append(future.result())
+        except _NotShipped:
+            results.append(executor.submit(_run_shipped, run, key, job, chunk).result())
+    return results
+
+def _compile_reduce_into(name, scope):
+    """Compile the merge of partials into the nearest bound variable name."""
+    candidates = scope.resolve(name)
+    def reduce_into(frame, values):
+        for depth, slot in candidates:
+            target = frame
+            for _ in range(depth):
+                target = target.parent
+            if target.values[slot] is not UNSET:
+                target.values[slot] = combine(target.values[slot], values)
+                return
+        raise CascadeRuntimeError(f"Variable '{name}' not found")
+    return reduce_into
+
+def _compile_parallel_cycle(stmt, functions, types, scope):
+    """Compile `cycle through ... in parallel`.
+
+    The body's only writes to outer variables are reductions `fill t with
+    t + e` (checked by parallel_reductions); each partition sums its e values
+    and the partition sums are added to t in element order after the loop,
+    so + must be associative for the result to match a sequential cycle.
+    """
+    try:
+        targets = parallel_reductions(stmt)
+    except SemanticError as e:
+        return _compile_error(str(e))
+    body = reduction_body(stmt.body, targets)
+    collection = compile_expr(stmt.collection, functions, scope)
+    table = _ReductionTable(functions, targets)
+    local_scope = child_scope([stmt.element], body, scope)
+    unbound = [UNSET] * (len(local_scope.names) - 1)
+    compiled = compile_block(body, table, types, local_scope)
+    merges = tuple((name, _compile_reduce_into(name, scope)) for name in targets)
+    def parallel_cycle(frame):
+        items = list(collection(frame))
+        size = max(PARALLEL_MIN_CHUNK, -(-len(items) // PARALLEL_PARTITIONS))
+        chunks = [items[ix:ix + size] for ix in range(0, len(items), size)]
+        executor = _parallel_executor() if len(chunks) > 1 else None
+        if executor is None:
+            partials = [_run_partition(frame, table, compiled, local_scope, unbound, chunk) for chunk in chunks]
+        else:
+            # Of the frame chain, only what the body and the pools it reaches read is shipped.
+            base, plain, pools = _portable_functions(functions, frame)
+            names = _shipped_reads(body, pools)
+            pools = [pool for pool in pools if pool[0].name in names]
+            shipped = _ShippedCycle(_trimmed_chain(frame, names), base, plain, pools, dict(types), body,
+                                    stmt.element, targets)
+            partials = map_shipped(executor, _worker_count(), _run_prepared_partition, shipped, chunks)
+        for name, reduce_into in merges:
+            values = [partial[name] for partial in partials if name in partial]
+            if values:
+                reduce_into(frame, values)
+    return parallel_cycle
+
+def run_program(ast, functions=None, source=None):
+    """Run a Cascade program AST. Returns the final environment, functions, and types.
+
+    functions is the table pools are declared into and called from; pass a
+    modules.Channels.functions() table to make opened channels callable.
+    source names the file ast came from in profiles.
+    """
+    ast = as_node(ast)
+    functions = {} if functions is None else functions
     types = {}
-    for stmt in ast['body']:
-        exec_stmt(stmt, env, functions, types)
-    return env, functions, types
\ No newline at end of file
+    scope = Scope(scope_bindings(ast.body))
+    profiler = PROFILER
+    if profiler is not None and source is not None:
+        outer, profiler.source = profiler.source, source
+        program = compile_block(ast.body, functions, types, scope)
+        profiler.source = outer
+    else:
+        program = compile_block(ast.body, functions, types, scope)
+    env = Frame(scope, [UNSET] * len(scope.names))
+    status = program(env)
+    if status is not None:
+        # A top-level `return` escapes the program, as with the tree-walker.
+        raise ReturnSignal(status.value)
+    return env, functions, types
@@ -1,12 +1,17 @@
 # Lexer for Cascade language.
 # Splits source text into tokens with line/col info for error reporting.
+# Tokens are produced lazily, as they are consumed: scan() and iter_tokens()
+# are generators, and the parser reads through a TokenBuffer of parallel
+# arrays (kind codes, offsets, positions) that is filled in chunks as it looks
+# ahead, with token text sliced from the source on demand.
 import re
+from array import array
 
 TOKEN_SPEC = [
     ('NUMBER',   r'\d+(\.\d+)?'),
     ('STRING',   r'"([^"\\]|\\.)*"'),
     ('IDENT',    r'[a-zA-Z_][a-zA-Z0-9_]*'),
-    ('OP',       r'==|!=|<=|>=|&&|\|\||[+\-*/<>=,:\[\]{}()]'),
+    ('OP',       r'==|!=|<=|>=|&&|\|\||[+\-*/<>=,:.\[\]{}()]'),
     ('NEWLINE',  r'\n'),
     ('SKIP',     r'[ \t]+'),
     ('COMMENT',  r'\#.*'),
@@ -15,22 +20,169 @@ TOKEN_SPEC = [
 
 TOKEN_RE = re.compile('|'.join(f'(?P<{name}>{regex})' for name, regex in TOKEN_SPEC))
 
-def tokenize(code):
-    """Tokenizes Cascade source code into a list of tokens with line/col."""
+# Kind codes of the tokens that reach the parser.
+KIND_NAMES = ('NUMBER', 'STRING', 'IDENT', 'OP')
+NUMBER, STRING, IDENT, OP = range(len(KIND_NAMES))
+KIND_CODES = {name: code for code, name in enumerate(KIND_NAMES)}
+
+class Token:
+    """A lexed token: kind name, source text and 1-based line / 0-based column.
+
+    Like AST nodes, a token also answers read-only mapping lookups
+    (tok['type'], tok.get('value')), as the dict tokens it replaced did.
+    """
+    __slots__ = FIELDS = ('type', 'value', 'line', 'col')
+
+    def __init__(self, type, value, line, col):
+        self.type = type
+        self.value = value
+        self.line = line
+        self.col = col
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.FIELDS
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.value!r}, {self.line}:{self.col})"
+
+def scan(code):
+    """Lazily yield (kind code, start, end, line, col) for each token in code."""
     line_num = 1
     line_start = 0
-    tokens = []
+    kind_codes = KIND_CODES
     for mo in TOKEN_RE.finditer(code):
         kind = mo.lastgroup
-        value = mo.group()
-        if kind == 'NEWLINE':
+        kind_code = kind_codes.get(kind)
+        if kind_code is not None:
+            start = mo.start()
+            yield kind_code, start, mo.end(), line_num, start - line_start
+        elif kind == 'NEWLINE':
             line_num += 1
             line_start = mo.end()
-        elif kind == 'SKIP' or kind == 'COMMENT':
-            continue
         elif kind == 'MISMATCH':
-            raise RuntimeError(f'Unexpected {value!r} at line {line_num}')
+            raise RuntimeError(f'Unexpected {mo.group()!r} at line {line_num}')
+
+def iter_tokens(code):
+    """Lazily yield Token objects for code."""
+    for kind, start, end, line, col in scan(code):
+        yield Token(KIND_NAMES[kind], code[start:end], line, col)
+
+def tokenize(code):
+    """Tokenizes Cascade source code into a list of tokens with line/col."""
+    return list(iter_tokens(code))
+
+# Tokens scanned per refill of a TokenBuffer; lookahead stays lazy but the
+# per-token overhead of resuming the scan is amortized.
+FILL_CHUNK = 256
+
+class TokenBuffer:
+    """Structure-of-arrays token store filled from the source as the parser looks ahead.
+
+    Only kind codes and integer positions are kept; token text is sliced from
+    the source when asked for, and matches() compares against the source in
+    place without slicing at all.
+    """
+    __slots__ = ('code', 'kinds', 'starts', 'ends', 'lines', 'cols', '_matches', '_line', '_line_start', '_error')
+
+    def __init__(self, code):
+        self.code = code
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+        self.cols = array('I')
+        self._matches = TOKEN_RE.finditer(code)
+        self._line = 1
+        self._line_start = 0
+        self._error = None
+
+    def fill(self, index):
+        """Scan ahead until token index exists; False if the source ends first.
+
+        A lexing error is raised only when index reaches it, so tokens before
+        the offending character stay readable.
+        """
+        kinds = self.kinds
+        if index < len(kinds):
+            return True
+        if self._matches is None:
+            if self._error is not None:
+                raise RuntimeError(self._error)
+            return False
+        target = index + FILL_CHUNK
+        starts, ends, lines, cols = self.starts, self.ends, self.lines, self.cols
+        line, line_start = self._line, self._line_start
+        kind_codes = KIND_CODES
+        for mo in self._matches:
+            kind = mo.lastgroup
+            kind_code = kind_codes.get(kind)
+            if kind_code is not None:
+                start, end = mo.span()
+                kinds.append(kind_code)
+                starts.append(start)
+                ends.append(end)
+                lines.append(line)
+                cols.append(start - line_start)
+                if len(kinds) > target:
+                    break
+            elif kind == 'NEWLINE':
+                line += 1
+                line_start = mo.end()
+            elif kind == 'MISMATCH':
+                self._error = f'Unexpected {mo.group()!r} at line {line}'
+                self._matches = None
+                break
         else:
-            col = mo.start() - line_start
-            tokens.append({'type': kind, 'value': value, 'line': line_num, 'col': col})
-    return tokens
\ No newline at end of file
+            self._matches = None
+        self._line, self._line_start = line, line_start
+        if index < len(kinds):
+            return True
+        if self._error is not None:
+            raise RuntimeError(self._error)
+        return False
+
+    def kind(self, index):
+        """Kind code of token index, or None past the end of the source."""
+        return self.kinds[index] if self.fill(index) else None
+
+    def value(self, index):
+        return self.code[self.starts[index]:self.ends[index]]
+
+    def matches(self, index, kind, value=None):
+        """True if token index has the given kind (and text, when value is given)."""
+        if index >= len(self.kinds) and not self.fill(index):
+            return False
+        if self.kinds[index] != kind:
+            return False
+        if value is None:
+            return True
+        start = self.starts[index]
+        return self.ends[index] - start == len(value) and self.code.startswith(value, start)
+
+    def position(self, index):
+        """(line, col) of token index, or (-1, -1) past the end of the source."""
+        if not self.fill(index):
+            return -1, -1
+        return self.lines[index], self.cols[index]
+
+    def span(self, first, last):
+        """(line, col, end_line, end_col) covering tokens first..last inclusive."""
+        return (self.lines[first], self.cols[first],
+                self.lines[last], self.cols[last] + self.ends[last] - self.starts[last])
+
+    def token(self, index):
+        """Token object for index (or None past the end), for diagnostics and tools."""
+        if not self.fill(index):
+            return None
+        return Token(KIND_NAMES[self.kinds[index]], self.value(index), self.lines[index], self.cols[index])
@@ -1,22 +1,111 @@
 # Robust Cascade LSP Server using pygls
 # Supports: diagnostics, hover/type info, go-to-definition, completion, document symbols
+# Documents sync incrementally (see document.py); diagnostics are debounced.
+# Symbol requests are answered from position indexes (see symbols.py).
+# Names from other files come from a workspace index built in the background
+# by worker processes and kept current from file-change events (see workspace.py).
 
+from concurrent.futures import ProcessPoolExecutor
 from pygls.server import LanguageServer
 from pygls.lsp.types import (
     InitializeResult, TextDocumentSyncKind, Hover, HoverParams,
     Position, Range, MarkupContent, MarkupKind,
     CompletionParams, CompletionItem, CompletionItemKind,
     TextDocumentPositionParams, Location, Diagnostic, DiagnosticSeverity,
-    SymbolInformation, SymbolKind
+    SymbolInformation, SymbolKind, FileChangeType, Registration, RegistrationParams,
+    DidChangeWatchedFilesRegistrationOptions, FileSystemWatcher
 )
-from pygls.lsp.types.basic_structures import MessageType
-import compiler
-import traceback
+from pygls.uris import from_fs_path, to_fs_path
+from compiler.document import Document
+from compiler.workspace import INDEX_CHUNKSIZE, WorkspaceIndex, index_files, qualified_name_at
+
+# Seconds of typing quiet before diagnostics are re-published.
+DIAGNOSTIC_DELAY = 0.15
+
+# Worker processes scanning workspace files (None: one per CPU).
+INDEX_WORKERS = None
+WATCH_GLOB = "**/{*.casc,*.pool,*.filter,*.res,fountain.config}"
+
+SYMBOL_KINDS = {'pool': SymbolKind.Function, 'constant': SymbolKind.Constant, 'type': SymbolKind.Class}
+COMPLETION_KINDS = {'pool': CompletionItemKind.Function, 'constant': CompletionItemKind.Constant,
+                    'type': CompletionItemKind.Class}
 
 class CascadeLanguageServer(LanguageServer):
     """pygls-based Language Server for Cascade."""
     CMD_SHOW_AST = 'cascade.showAST'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.documents = {}
+        self.pending = {}
+        self.index = None
+        self.executor = None
+        self.scanning = {}
+
+    def schedule_diagnostics(self, uri):
+        """Publish diagnostics for uri once edits pause, replacing any pending publication."""
+        handle = self.pending.pop(uri, None)
+        if handle is not None:
+            handle.cancel()
+        self.pending[uri] = self.loop.call_later(DIAGNOSTIC_DELAY, self.publish, uri)
+
+    def publish(self, uri):
+        """Re-check what changed in uri and publish its diagnostics now."""
+        self.pending.pop(uri, None)
+        document = self.documents.get(uri)
+        if document is None:
+            return
+        self.publish_diagnostics(uri, [Diagnostic(
+            range=Range(
+                start=Position(line=issue.line, character=issue.col),
+                end=Position(line=issue.line, character=issue.col + 1)
+            ),
+            message=issue.message,
+            severity=DiagnosticSeverity.Error
+        ) for issue in document.diagnostics()])
+
+    def start_indexing(self, root):
+        """Index the workspace under root in the background, scanning files in worker processes."""
+        self.index = WorkspaceIndex(root)
+        self.executor = ProcessPoolExecutor(max_workers=INDEX_WORKERS)
+        self.loop.create_task(self.reindex())
+
+    async def reindex(self, paths=None):
+        """Scan paths (every stale file when None) in the workers and fold the results into the index."""
+        index = self.index
+        if paths is None:
+            present = await self.loop.run_in_executor(None, lambda: list(index.discover()))
+            paths = index.prepare(present)
+        # A file changed again while scanning is re-scanned; only the latest scan is kept.
+        ticket = object()
+        for path in paths:
+            self.scanning[path] = ticket
+        batches = [paths[i:i + INDEX_CHUNKSIZE] for i in range(0, len(paths), INDEX_CHUNKSIZE)]
+        futures = [self.loop.run_in_executor(self.executor, index_files, batch) for batch in batches]
+        for batch, future in zip(batches, futures):
+            for path, entry in zip(batch, await future):
+                if self.scanning.get(path) is ticket:
+                    del self.scanning[path]
+                    index.update(path, entry)
+
+    def file_changed(self, uri, deleted=False):
+        """Re-index one file after it changed on disk."""
+        if self.index is None:
+            return
+        path = to_fs_path(uri)
+        if self.index.changed(path, deleted):
+            self.loop.create_task(self.reindex([path]))
+
+    def workspace_symbol(self, uri, line, col):
+        """(path, Symbol) from another workspace file for the name at a position, or (None, None)."""
+        document = self.documents.get(uri)
+        if self.index is None or document is None or line >= len(document.lines):
+            return None, None
+        qualifier, name = qualified_name_at(document.lines[line], col)
+        if not name:
+            return None, None
+        return self.index.definition(to_fs_path(uri), name, qualifier)
+
 cascade_server = CascadeLanguageServer('cascade-lsp', 'v0.2')
 
 @cascade_server.feature('initialize')
@@ -24,7 +113,7 @@ def on_initialize(ls, params):
     """Initialize LSP server with all supported capabilities."""
     return InitializeResult(
         capabilities={
-            "textDocumentSync": TextDocumentSyncKind.Full,
+            "textDocumentSync": TextDocumentSyncKind.Incremental,
             "hoverProvider": True,
             "definitionProvider": True,
             "completionProvider": {"resolveProvider": False, "triggerCharacters": [" "]},
@@ -32,107 +121,142 @@ def on_initialize(ls, params):
         }
     )
 
+@cascade_server.feature('initialized')
+def on_initialized(ls, params):
+    """Start indexing the workspace and ask the client for file-change events."""
+    root = ls.workspace.root_path
+    if root:
+        ls.start_indexing(root)
+        ls.register_capability(RegistrationParams(registrations=[Registration(
+            id='cascade-workspace-files',
+            method='workspace/didChangeWatchedFiles',
+            register_options=DidChangeWatchedFilesRegistrationOptions(
+                watchers=[FileSystemWatcher(glob_pattern=WATCH_GLOB)])
+        )]))
+
+@cascade_server.feature('workspace/didChangeWatchedFiles')
+def did_change_watched_files(ls, params):
+    """Keep the workspace index current as files are created, changed or deleted."""
+    for change in params.changes:
+        ls.file_changed(change.uri, deleted=change.type == FileChangeType.Deleted)
+
+@cascade_server.feature('textDocument/didSave')
+def did_save(ls, params):
+    """Re-index a saved file (clients without file watching still keep the index current)."""
+    ls.file_changed(params.text_document.uri)
+
+@cascade_server.feature('shutdown')
+def on_shutdown(ls, params):
+    """Stop the indexing workers."""
+    if ls.executor is not None:
+        ls.executor.shutdown(wait=False, cancel_futures=True)
+
 @cascade_server.feature('textDocument/didOpen')
 def did_open(ls, params):
     """On file open: parse, type-check, and publish diagnostics."""
     uri = params.text_document.uri
-    code = params.text_document.text
-    diagnostics = []
-    try:
-        ast = compiler.parse(code)
-        try:
-            type_env = compiler.type_checker.TypeEnv()
-            compiler.type_checker.check_type(ast, type_env)
-            compiler.semantic_analyzer.analyze_semantics(ast)
-        except Exception as e:
-            diagnostics.append(Diagnostic(
-                range=Range(
-                    start=Position(line=0, character=0),
-                    end=Position(line=0, character=1)
-                ),
-                message=str(e),
-                severity=DiagnosticSeverity.Error
-            ))
-        ls.publish_diagnostics(uri, diagnostics)
-        ls.workspace._docs[uri] = (code, ast)
-    except Exception as e:
-        ls.show_message_log("Parse error: " + str(e), msg_type=MessageType.Error)
-        ls.publish_diagnostics(uri, [Diagnostic(
-            range=Range(
-                start=Position(line=0, character=0),
-                end=Position(line=0, character=1)
-            ),
-            message="Parse error: " + str(e),
-            severity=DiagnosticSeverity.Error
-        )])
-        ls.workspace._docs[uri] = (code, None)
+    ls.documents[uri] = Document(params.text_document.text)
+    ls.publish(uri)
+
+@cascade_server.feature('textDocument/didChange')
+def did_change(ls, params):
+    """Apply incremental edits; only the touched statements are re-parsed and re-checked."""
+    uri = params.text_document.uri
+    document = ls.documents.get(uri)
+    if document is None:
+        return
+    for change in params.content_changes:
+        change_range = getattr(change, 'range', None)
+        if change_range is None:
+            document.apply_change(change.text)
+        else:
+            document.apply_change(change.text, (
+                (change_range.start.line, change_range.start.character),
+                (change_range.end.line, change_range.end.character)))
+    ls.schedule_diagnostics(uri)
+
+@cascade_server.feature('textDocument/didClose')
+def did_close(ls, params):
+    """Forget a closed document."""
+    uri = params.text_document.uri
+    ls.documents.pop(uri, None)
+    handle = ls.pending.pop(uri, None)
+    if handle is not None:
+        handle.cancel()
+
+def symbol_range(document, chunk, symbol):
+    """LSP Range of a symbol's declaration (its scope or chunk when it has no span of its own)."""
+    span = symbol.span or (symbol.scope.span if symbol.scope is not None else None)
+    if span is None:
+        return Range(start=Position(line=chunk.start, character=0), end=Position(line=chunk.start, character=0))
+    return span_range(document.location(chunk, span))
+
+def span_range(location):
+    """LSP Range for (line, col, end_line, end_col) with 0-based lines."""
+    line, col, end_line, end_col = location
+    return Range(start=Position(line=line, character=col), end=Position(line=end_line, character=end_col))
+
+def file_location(path, symbol):
+    """LSP Location of a declaration in another workspace file (its span has 1-based lines)."""
+    line, col, end_line, end_col = symbol.span
+    return Location(uri=from_fs_path(path), range=span_range((line - 1, col, end_line - 1, end_col)))
 
 @cascade_server.feature('textDocument/hover')
 def hover(ls, params: HoverParams):
     """Show type information on hover."""
-    doc = ls.workspace.get_document(params.text_document.uri)
-    code, ast = ls.workspace._docs.get(params.text_document.uri, (None, None))
-    word = doc.word_at_position(params.position)
-    info = ""
-    if ast:
-        for stmt in ast['body']:
-            if stmt['type'] in ('VariableDeclaration', 'ConstantDeclaration') and stmt['name'] == word:
-                t = stmt.get('declaredType') or 'inferred'
-                info = f"**{word}**: `{t}`"
-    if not info:
-        info = f"Identifier: {word}"
+    document = ls.documents.get(params.text_document.uri)
+    position = params.position
+    symbol = None
+    if document is not None:
+        _, symbol = document.definition_at(position.line, position.character)
+    if symbol is None:
+        _, symbol = ls.workspace_symbol(params.text_document.uri, position.line, position.character)
+    if symbol is not None:
+        info = f"**{symbol.name}** ({symbol.kind}): `{symbol.detail or 'inferred'}`"
+    else:
+        doc = ls.workspace.get_document(params.text_document.uri)
+        info = f"Identifier: {doc.word_at_position(position)}"
     return Hover(contents=MarkupContent(kind=MarkupKind.Markdown, value=info))
 
 @cascade_server.feature('textDocument/definition')
 def definition(ls, params: TextDocumentPositionParams):
     """Go to definition for variables/functions."""
-    doc = ls.workspace.get_document(params.text_document.uri)
-    code, ast = ls.workspace._docs.get(params.text_document.uri, (None, None))
-    word = doc.word_at_position(params.position)
-    if ast:
-        for i, stmt in enumerate(ast['body']):
-            if stmt.get('name') == word:
-                return [Location(uri=params.text_document.uri,
-                    range=Range(
-                        start=Position(line=i, character=0),
-                        end=Position(line=i, character=10)
-                    ))]
-    return None
+    document = ls.documents.get(params.text_document.uri)
+    if document is None:
+        return None
+    chunk, symbol = document.definition_at(params.position.line, params.position.character)
+    if symbol is None:
+        path, symbol = ls.workspace_symbol(params.text_document.uri, params.position.line, params.position.character)
+        return [file_location(path, symbol)] if symbol is not None else None
+    return [Location(uri=params.text_document.uri, range=symbol_range(document, chunk, symbol))]
 
 @cascade_server.feature('textDocument/completion')
 def completion(ls, params: CompletionParams):
     """Provide code completion for variables and functions."""
-    doc = ls.workspace.get_document(params.text_document.uri)
-    code, ast = ls.workspace._docs.get(params.text_document.uri, (None, None))
-    items = []
-    if ast:
-        for stmt in ast['body']:
-            if 'name' in stmt:
-                kind = CompletionItemKind.Variable if stmt['type'] in ('VariableDeclaration', 'ConstantDeclaration') else CompletionItemKind.Function
-                items.append(CompletionItem(
-                    label=stmt['name'],
-                    kind=kind
-                ))
-    return items
+    document = ls.documents.get(params.text_document.uri)
+    if document is None:
+        return []
+    visible = {}
+    if ls.index is not None:
+        # Names from opened channels; the document's own declarations shadow them.
+        for name, (_, symbol) in ls.index.completions(to_fs_path(params.text_document.uri)).items():
+            visible[name] = symbol
+    visible.update(document.completions(params.position.line, params.position.character))
+    return [CompletionItem(label=name, kind=COMPLETION_KINDS.get(symbol.kind, CompletionItemKind.Variable),
+                           detail=symbol.detail)
+            for name, symbol in visible.items()]
 
 @cascade_server.feature('textDocument/documentSymbol')
 def document_symbols(ls, params):
     """Provide outline view of all symbols in the document."""
-    doc = ls.workspace.get_document(params.text_document.uri)
-    code, ast = ls.workspace._docs.get(params.text_document.uri, (None, None))
-    symbols = []
-    if ast:
-        for i, stmt in enumerate(ast['body']):
-            if 'name' in stmt:
-                kind = SymbolKind.Variable if stmt['type'] in ('VariableDeclaration', 'ConstantDeclaration') else SymbolKind.Function
-                symbols.append(SymbolInformation(
-                    name=stmt['name'],
-                    kind=kind,
-                    location=Location(uri=params.text_document.uri, range=Range(
-                        start=Position(line=i, character=0), end=Position(line=i, character=10)
-                    ))
-                ))
-    return symbols
+    document = ls.documents.get(params.text_document.uri)
+    if document is None:
+        return []
+    return [SymbolInformation(
+        name=symbol.name,
+        kind=SYMBOL_KINDS.get(symbol.kind, SymbolKind.Variable),
+        location=Location(uri=params.text_document.uri, range=symbol_range(document, chunk, symbol))
+    ) for chunk, symbol in document.outline()]
 
 def main():
     """Run the LSP server as a process."""
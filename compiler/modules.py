@@ -0,0 +1,358 @@
+# Module system for `open channel`.
+# A channel name like pools.statistics resolves against the project root (the
+# nearest directory holding a fountain.config) to pools/statistics.pool (or
+# .filter, .res, .casc). A module is compiled (parsed, type-checked and
+# analyzed) at most once per process, and only when a lookup in a module that
+# opened it misses locally; its top-level statements run only when one of its
+# pools is first called. A channel exports its pools and reservoirs; its
+# top-level variables stay private to it.
+# Besides the channels a module opens, every module in a project sees the
+# channels listed under "channels" in fountain.config, and the project's .res
+# reservoirs for type lookups. Names listed under "dependencies" are external
+# packages provided by the host and are not loaded from the project; those the
+# runtime implements (see host.py) export their pools after the project's,
+# and the stdlib's builtin pools (stdlib.BUILTIN_POOLS) come last of all.
+# A module read from the compilation cache skips checking only while the
+# sources of everything it can look up are those it was checked against
+# (dependency_stamp); that reads those sources but compiles none of them.
+
+import hashlib
+import json
+import os
+from compiler.ast_nodes import FUNCTION_DECLARATION, IMPORT_STATEMENT, TYPE_DECLARATION, as_node
+from compiler.host import HOST_CHANNELS
+from compiler.interpreter import CascadeRuntimeError, run_program
+from compiler.parser import parse_cascade
+from compiler.stdlib import BUILTIN_POOLS, builtin
+import compiler.frontend as frontend
+from compiler.type_checker import TypeEnv, TypeError
+
+CONFIG_NAME = "fountain.config"
+SOURCE_SUFFIXES = ('.pool', '.filter', '.res', '.casc')
+
+FUNCS = 'funcs'
+TYPES = 'types'
+
+class ModuleError(Exception):
+    """Raised when a channel cannot be resolved or fails to compile."""
+    pass
+
+def read_config(path):
+    """Parsed fountain.config, or {} when it is missing or not valid JSON."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return config if isinstance(config, dict) else {}
+
+def module_name(project, path):
+    """Channel name of a source path within a project root: pools/logging.pool -> pools.logging."""
+    relative = os.path.splitext(os.path.relpath(path, project))[0]
+    return relative.replace(os.sep, '.')
+
+def find_project_root(path):
+    """Nearest directory at or above path's directory holding a fountain.config, else path's directory."""
+    start = directory = os.path.dirname(os.path.abspath(path))
+    while not os.path.isfile(os.path.join(directory, CONFIG_NAME)):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return start
+        directory = parent
+    return directory
+
+def exports(ast):
+    """(pool signatures, reservoir fields) declared at the top level of a module's AST."""
+    funcs = {}
+    types = {}
+    for node in ast.body:
+        if node.KIND == FUNCTION_DECLARATION:
+            funcs[node.name] = ([p.type for p in node.params], node.returnType)
+        elif node.KIND == TYPE_DECLARATION:
+            types[node.name] = {f.name: f.type for f in node.fields}
+    return funcs, types
+
+def dependency_stamp(channels):
+    """Hash of the sources of everything a program checked against channels can look up.
+
+    A module's exports depend on its own source alone, so hashing the
+    sources covers every signature the program was checked against without
+    compiling any of them.
+    """
+    loader = channels.loader
+    digest = hashlib.sha256(repr(channels.hosts).encode())
+    names = channels.names + [name for name in loader.reservoirs()
+                              if name not in channels.names and name != channels.owner]
+    for name in names:
+        digest.update(repr((name, loader.source_digest(name))).encode())
+    return digest.hexdigest()
+
+class Module:
+    """A compiled channel: its AST, exported signatures and, once run, its functions.
+
+    A module known only by its signatures (see project.py) has no AST or channels.
+    """
+    __slots__ = ('name', 'path', 'ast', 'channels', 'funcs', 'types', 'functions')
+
+    def __init__(self, name, path, ast, channels, signatures=None):
+        self.name = name
+        self.path = path
+        self.ast = ast
+        self.channels = channels
+        self.funcs, self.types = signatures or exports(ast)
+        self.functions = None
+
+    def __repr__(self):
+        return f"Module({self.name} from {self.path})"
+
+class ModuleLoader:
+    """Resolves and compiles the channels of one project, caching each module for the process."""
+    def __init__(self, root, cache=None):
+        self.root = os.path.abspath(root)
+        self.config = read_config(os.path.join(self.root, CONFIG_NAME))
+        self.cache = cache
+        self.modules = {}
+        self.running = set()
+        self._reservoirs = None
+        self._digests = {}
+
+    @classmethod
+    def for_source(cls, path, cache=None):
+        """Loader for the project containing the source file at path."""
+        return cls(find_project_root(path), cache)
+
+    def external(self, name):
+        """True if name is an external dependency declared in fountain.config."""
+        return any(name == dep or name.startswith(dep + '.') for dep in self.config.get('dependencies', ()))
+
+    def resolve(self, name):
+        """Path of the source for channel name, or None."""
+        base = os.path.join(self.root, *name.split('.'))
+        for suffix in SOURCE_SUFFIXES:
+            if os.path.isfile(base + suffix):
+                return base + suffix
+        return None
+
+    def source_digest(self, name):
+        """(path, sha256 of the source) of channel name, read once."""
+        digest = self._digests.get(name)
+        if digest is None:
+            path = self.resolve(name)
+            if path is None:
+                raise ModuleError(f"Cannot open channel '{name}': no such module under {self.root}")
+            try:
+                with open(path, "rb") as f:
+                    digest = self._digests[name] = (path, hashlib.sha256(f.read()).hexdigest())
+            except OSError as e:
+                raise ModuleError(f"Cannot open channel '{name}': {e}")
+        return digest
+
+    def configured(self):
+        """Channel names listed under "channels" in fountain.config."""
+        return [module_name(self.root, os.path.join(self.root, path))
+                for path in self.config.get('channels', ()) if isinstance(path, str)]
+
+    def reservoirs(self):
+        """Channel names of the project's .res files, found once."""
+        if self._reservoirs is None:
+            found = []
+            for directory, dirs, names in os.walk(self.root):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__cascade_cache__')
+                found.extend(module_name(self.root, os.path.join(directory, name))
+                             for name in sorted(names) if name.endswith('.res'))
+            self._reservoirs = found
+        return self._reservoirs
+
+    def channels(self, ast=None, owner=None):
+        """Channels for a program of this project (the module owner, if any), with its `open channel`s opened."""
+        channels = Channels(self, owner)
+        for name in self.configured():
+            channels.open(name)
+        if ast is not None:
+            channels.open_program(ast)
+        return channels
+
+    def load(self, name):
+        """The compiled Module for channel name, compiling it on first use."""
+        module = self.modules.get(name)
+        if module is not None:
+            return module
+        path = self.resolve(name)
+        if path is None:
+            raise ModuleError(f"Cannot open channel '{name}': no such module under {self.root}")
+        try:
+            with open(path, encoding="utf-8") as f:
+                code = f.read()
+        except OSError as e:
+            raise ModuleError(f"Cannot open channel '{name}': {e}")
+        cached = self.cache.peek(path, code) if self.cache else None
+        try:
+            ast = cached[1] if cached else as_node(parse_cascade(code))
+            module = self.modules[name] = Module(name, path, ast, self.channels(ast, name))
+            # Registered before checking, so channels that open each other see its exports.
+            if self.cache:
+                stamp = dependency_stamp(module.channels)
+                fresh = cached is None or cached[0] != stamp
+                self.cache.record(not fresh)
+                if fresh:
+                    check_program(ast, module.channels)
+                    self.cache.store(path, code, ast, stamp)
+            else:
+                check_program(ast, module.channels)
+        except (ModuleError, CascadeRuntimeError):
+            self.modules.pop(name, None)
+            raise
+        except Exception as e:
+            self.modules.pop(name, None)
+            raise ModuleError(f"In channel '{name}' ({path}): {e}")
+        return module
+
+    def run(self, module):
+        """The functions of module, running its top-level statements on first use."""
+        if module.functions is None:
+            if module.name in self.running:
+                raise CascadeRuntimeError(f"Channel '{module.name}' used while it is being initialized")
+            self.running.add(module.name)
+            try:
+                _, functions, _ = run_program(module.ast, functions=module.channels.functions(),
+                                              source=module.path)
+            finally:
+                self.running.discard(module.name)
+            module.functions = functions
+        return module.functions
+
+class Channels:
+    """The channels one program or module (owner) has opened, in lookup order."""
+    def __init__(self, loader, owner=None):
+        self.loader = loader
+        self.owner = owner
+        self.names = []
+        self.hosts = []
+        self._host_pools = None
+
+    def open(self, name):
+        """Open channel name; it is compiled only when a lookup reaches it."""
+        if name in HOST_CHANNELS:
+            if name not in self.hosts:
+                self.hosts.append(name)
+                self._host_pools = None
+            return
+        if name in self.names or name == self.owner or self.loader.external(name):
+            return
+        if self.loader.resolve(name) is None:
+            raise ModuleError(f"Cannot open channel '{name}': no such module under {self.loader.root}")
+        self.names.append(name)
+
+    def open_program(self, ast):
+        for node in as_node(ast).body:
+            if node.KIND == IMPORT_STATEMENT:
+                self.open(node.path)
+
+    def modules(self, namespace):
+        """Opened modules in lookup order, compiling each as it is reached."""
+        for name in self.names:
+            yield self.loader.load(name)
+        if namespace == TYPES:
+            for name in self.loader.reservoirs():
+                if name not in self.names and name != self.owner:
+                    yield self.loader.load(name)
+
+    def host_pools(self):
+        """Pools of the opened host channels, as name -> (signature, callable)."""
+        if self._host_pools is None:
+            pools = {}
+            for name in self.hosts:
+                for pool, entry in HOST_CHANNELS[name](lambda type_name: self.find(TYPES, type_name)).items():
+                    pools.setdefault(pool, entry)
+            self._host_pools = pools
+        return self._host_pools
+
+    def find(self, namespace, name):
+        """The exported signature (funcs) or fields (types) of name, or None."""
+        for module in self.modules(namespace):
+            table = module.funcs if namespace == FUNCS else module.types
+            if name in table:
+                return table[name]
+        if namespace == FUNCS and self.hosts and name in self.host_pools():
+            return self.host_pools()[name][0]
+        if namespace == FUNCS and name in BUILTIN_POOLS:
+            return BUILTIN_POOLS[name][0]
+        return None
+
+    def function(self, name):
+        """The callable for an exported pool, running its module on first use, or None."""
+        for module in self.modules(FUNCS):
+            if name in module.funcs:
+                return self.loader.run(module)[name]
+        if self.hosts and name in self.host_pools():
+            return self.host_pools()[name][1]
+        return None
+
+    def functions(self):
+        """A function table for run_program that falls back to these channels."""
+        return ChannelFunctions(self)
+
+class ChannelTypeEnv(TypeEnv):
+    """Root type environment whose unresolved function and type names come from opened channels."""
+    def __init__(self, channels):
+        super().__init__()
+        self.channels = channels
+
+    def _lookup(self, namespace, name, local, message):
+        if name in local:
+            return local[name]
+        found = self.channels.find(namespace, name)
+        if found is None:
+            raise TypeError(message)
+        return found
+
+    def get_type(self, name):
+        return self._lookup(TYPES, name, self.types, f"Undefined type '{name}'")
+
+    def get_func(self, name):
+        return self._lookup(FUNCS, name, self.funcs, f"Undefined function '{name}'")
+
+class ChannelNames:
+    """Set-like view of declared function or type names plus those exported by opened channels."""
+    def __init__(self, channels, namespace):
+        self.channels = channels
+        self.namespace = namespace
+        self.local = set()
+
+    def __contains__(self, name):
+        return name in self.local or self.channels.find(self.namespace, name) is not None
+
+    def add(self, name):
+        self.local.add(name)
+
+class ChannelFunctions(dict):
+    """Function table whose missing names are looked up in opened channels (and then kept)."""
+    def __init__(self, channels):
+        super().__init__()
+        self.channels = channels
+
+    def __missing__(self, name):
+        function = self.channels.function(name)
+        if function is None:
+            function = builtin(name, self)
+        if function is None:
+            raise KeyError(name)
+        self[name] = function
+        return function
+
+    def __reduce__(self):
+        # Shipped to parallel cycle workers as a fresh table over the same channels.
+        channels = self.channels
+        return (_channel_functions, (channels.loader.root, list(channels.names), list(channels.hosts),
+                                     channels.owner))
+
+def _channel_functions(root, names, hosts, owner):
+    channels = Channels(ModuleLoader(root), owner)
+    channels.names.extend(names)
+    channels.hosts.extend(hosts)
+    return channels.functions()
+
+def check_program(ast, channels):
+    """Type-check and analyze ast with names from channels; raises TypeError or SemanticError."""
+    frontend.check_program(ast, ChannelTypeEnv(channels), ChannelNames(channels, FUNCS),
+                           ChannelNames(channels, TYPES))
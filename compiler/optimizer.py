@@ -0,0 +1,226 @@
+# AST optimizer, run between semantic analysis and execution.
+# Level 1 folds BinaryExpr subtrees whose operands are literals and prunes
+# `when` branches whose condition is a literal. Level 2 also propagates
+# variables poured once from a literal into the reads that follow the pour,
+# and hoists loop-invariant expressions out of cycle bodies into temporaries
+# declared just before the cycle. The input AST is left untouched, so the
+# compilation cache keeps storing checked, unoptimized ASTs.
+
+from compiler.ast_nodes import (
+    ASSIGNMENT, BINARY_EXPR, BOOLEAN_LITERAL, CONSTANT_DECLARATION, CYCLE_STATEMENT, FUNCTION_CALL,
+    FUNCTION_DECLARATION, IDENTIFIER, IF_STATEMENT, LIST_LITERAL, MAP_LITERAL, NUMBER_LITERAL, PATTERN,
+    STRING_LITERAL, TRY_CATCH_STATEMENT, VARIABLE_DECLARATION, BinaryExpr, BooleanLiteral, CycleStatement,
+    Identifier, IfStatement, MapPair, Node, NumberLiteral, Otherwise, Program, Record, StringLiteral,
+    VariableDeclaration, When, as_node,
+)
+from compiler.interpreter import BINARY_OPS
+
+DEFAULT_LEVEL = 1
+MAX_LEVEL = 2
+
+# Temporaries get names no Cascade identifier can have.
+TEMP_PREFIX = '%'
+
+LITERAL_KINDS = frozenset((NUMBER_LITERAL, STRING_LITERAL, BOOLEAN_LITERAL))
+EXPRESSION_KINDS = LITERAL_KINDS | {LIST_LITERAL, MAP_LITERAL, IDENTIFIER, FUNCTION_CALL, BINARY_EXPR, PATTERN}
+BINDING_KINDS = frozenset((VARIABLE_DECLARATION, ASSIGNMENT, CONSTANT_DECLARATION))
+
+def count_nodes(ast):
+    """Number of nodes in ast, records' children included."""
+    def count(value):
+        if isinstance(value, list):
+            return sum(count(v) for v in value)
+        if isinstance(value, (Node, Record)):
+            return (isinstance(value, Node)) + sum(count(getattr(value, f)) for f in value.FIELDS)
+        return 0
+    return count(as_node(ast))
+
+def user_vars(variables):
+    """variables without the optimizer's temporaries."""
+    return {name: value for name, value in variables.items() if not name.startswith(TEMP_PREFIX)}
+
+def optimize(ast, level=DEFAULT_LEVEL):
+    """An optimized copy of a checked program AST (level 0 returns it as is)."""
+    ast = as_node(ast)
+    if level <= 0:
+        return ast
+    counts = {}
+    _count_bindings(ast, counts)
+    optimizer = _Optimizer(level, counts)
+    return Program(optimizer.block(ast.body, {}, frozenset()), span=ast.span)
+
+def _count_bindings(value, counts):
+    """Count, by name, every place a name is bound: pours, fills, params, cycle elements, catches."""
+    if isinstance(value, list):
+        for v in value:
+            _count_bindings(v, counts)
+        return
+    if not isinstance(value, (Node, Record)):
+        return
+    k = value.KIND if isinstance(value, Node) else None
+    names = []
+    if k in BINDING_KINDS:
+        names.append(value.name)
+    elif k == FUNCTION_DECLARATION:
+        names.extend(param.name for param in value.params)
+    elif k == CYCLE_STATEMENT:
+        names.append(value.element)
+    elif k == TRY_CATCH_STATEMENT:
+        names.append(value.errVar)
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    for f in value.FIELDS:
+        _count_bindings(getattr(value, f), counts)
+
+def _literal(value, span):
+    """The literal node for a folded value, or None if it has none."""
+    if isinstance(value, bool):
+        return BooleanLiteral(value, span=span)
+    if isinstance(value, (int, float)):
+        return NumberLiteral(value, span=span)
+    if isinstance(value, str):
+        return StringLiteral(value, span=span)
+    return None
+
+def _rebuild(node, stmt, expr):
+    """A copy of node with its statements mapped through stmt and its expressions through expr."""
+    def field(value):
+        if isinstance(value, list):
+            return [field(v) for v in value]
+        if isinstance(value, Node):
+            return expr(value) if value.KIND in EXPRESSION_KINDS else stmt(value)
+        if isinstance(value, (When, Otherwise, MapPair)):
+            return type(value)(*[field(getattr(value, f)) for f in value.FIELDS], span=value.span)
+        return value
+    return type(node)(*[field(getattr(node, f)) for f in node.FIELDS], span=node.span)
+
+def _bound_names(stmts):
+    """Every name bound anywhere in stmts, nested pools included."""
+    counts = {}
+    _count_bindings(stmts, counts)
+    return set(counts)
+
+class _Optimizer:
+    def __init__(self, level, counts):
+        self.level = level
+        self.counts = counts
+        self.temps = 0
+
+    def block(self, stmts, consts, bound):
+        """Optimize a statement list; consts maps propagated names to literals, bound holds names set on entry."""
+        consts = dict(consts)
+        bound = set(bound)
+        out = []
+        for stmt in stmts:
+            for new in self.statement(as_node(stmt), consts, bound):
+                out.append(new)
+                if new.KIND in BINDING_KINDS:
+                    bound.add(new.name)
+                    if (self.level >= 2 and new.KIND != ASSIGNMENT and new.value.KIND in LITERAL_KINDS
+                            and self.counts.get(new.name) == 1):
+                        consts[new.name] = new.value
+        return out
+
+    def statement(self, stmt, consts, bound):
+        """The statements replacing stmt: none for a pruned branch, several for an inlined or hoisting one."""
+        k = stmt.KIND
+        expr = lambda e: self.expr(e, consts)
+        if k == IF_STATEMENT:
+            whens = []
+            for when in stmt.whens:
+                condition = expr(when.condition)
+                if condition.KIND in LITERAL_KINDS:
+                    if not condition.value:
+                        continue
+                    body = self.block(when.body, consts, bound)
+                    if not whens:
+                        # If bodies run in the enclosing scope, so a branch always taken inlines.
+                        return body
+                    return [IfStatement(whens, Otherwise(body, span=when.span), span=stmt.span)]
+                whens.append(When(condition, self.block(when.body, consts, bound), span=when.span))
+            otherwise = stmt.otherwise and self.block(stmt.otherwise.body, consts, bound)
+            if not whens:
+                return otherwise or []
+            otherwise = Otherwise(otherwise, span=stmt.otherwise.span) if stmt.otherwise else None
+            return [IfStatement(whens, otherwise, span=stmt.span)]
+        if k == CYCLE_STATEMENT:
+            cycle = CycleStatement(expr(stmt.collection), stmt.element,
+                                   self.block(stmt.body, consts, bound | {stmt.element}), stmt.parallel,
+                                   span=stmt.span)
+            if self.level >= 2:
+                return self.hoist(cycle, bound)
+            return [cycle]
+        if k == FUNCTION_DECLARATION:
+            params = {param.name for param in stmt.params}
+            body = self.block(stmt.body, consts, bound | params)
+            return [type(stmt)(stmt.name, stmt.params, stmt.returnType, body, span=stmt.span)]
+        if k == TRY_CATCH_STATEMENT:
+            return [type(stmt)(self.block(stmt.tryBlock, consts, bound), stmt.errVar,
+                               self.block(stmt.catchBlock, consts, bound | {stmt.errVar}), span=stmt.span)]
+        return [_rebuild(stmt, lambda s: s, expr)]
+
+    def expr(self, e, consts):
+        """Fold e's constant subtrees, substituting propagated names."""
+        k = e.KIND
+        if k == IDENTIFIER:
+            literal = consts.get(e.value)
+            return type(literal)(literal.value, span=e.span) if literal is not None else e
+        if k == BINARY_EXPR:
+            left = self.expr(e.left, consts)
+            right = self.expr(e.right, consts)
+            fn = BINARY_OPS.get(e.operator)
+            if fn is not None and left.KIND in LITERAL_KINDS and right.KIND in LITERAL_KINDS:
+                try:
+                    folded = _literal(fn(left.value, right.value), e.span)
+                except Exception:
+                    # Leave it to fail at run time, as it would unoptimized.
+                    folded = None
+                if folded is not None:
+                    return folded
+            return BinaryExpr(e.operator, left, right, span=e.span)
+        if k in (LIST_LITERAL, MAP_LITERAL, FUNCTION_CALL):
+            return _rebuild(e, lambda s: s, lambda sub: self.expr(sub, consts))
+        return e
+
+    def hoist(self, cycle, bound):
+        """Declarations of cycle's loop-invariant expressions, followed by the cycle reading them.
+
+        An expression is invariant when it is a BinaryExpr over literals and
+        names bound before the cycle and never bound in its body. It must not
+        be able to fail on well-typed operands, since it now runs even when
+        the loop runs zero times: division is hoisted only by a non-zero
+        literal. Pool bodies inside the cycle are left alone.
+        """
+        local = _bound_names(cycle.body) | {cycle.element}
+        hoisted = []
+
+        def invariant(e):
+            k = e.KIND
+            if k in LITERAL_KINDS:
+                return True
+            if k == IDENTIFIER:
+                return e.value in bound and e.value not in local
+            if k == BINARY_EXPR:
+                if e.operator == '/' and not (e.right.KIND == NUMBER_LITERAL and e.right.value):
+                    return False
+                return e.operator in BINARY_OPS and invariant(e.left) and invariant(e.right)
+            return False
+
+        def expr(e):
+            if e.KIND == BINARY_EXPR and invariant(e):
+                for declaration in hoisted:
+                    if declaration.value == e:
+                        return Identifier(declaration.name, span=e.span)
+                name = f"{TEMP_PREFIX}{self.temps}"
+                self.temps += 1
+                hoisted.append(VariableDeclaration(name, e, None, span=e.span))
+                return Identifier(name, span=e.span)
+            if e.KIND in (BINARY_EXPR, LIST_LITERAL, MAP_LITERAL, FUNCTION_CALL):
+                return _rebuild(e, lambda s: s, expr)
+            return e
+
+        def stmt(s):
+            return s if s.KIND == FUNCTION_DECLARATION else _rebuild(s, stmt, expr)
+
+        body = [stmt(s) for s in cycle.body]
+        return hoisted + [CycleStatement(cycle.collection, cycle.element, body, cycle.parallel, span=cycle.span)]
@@ -0,0 +1,139 @@
+# Profiler for `cascade --profile`.
+# While a Profiler is installed (interpreter.set_profiler), the closure
+# compiler wraps every call site and every statement it compiles in the
+# Profiler's instruments; with none installed it compiles exactly the closures
+# it always does, so profiling costs nothing when it is off. Calls are
+# recorded by the name called, pools and builtins alike: call counts, and
+# inclusive and exclusive (minus callees) time. Statements are recorded by
+# source line: hits and inclusive time. The report is a text table sorted by
+# time, and the call stacks are also written in the collapsed format
+# flamegraph tools read (`root;pool;callee <microseconds>` per line).
+# Cycles running on worker processes are not profiled inside the workers.
+
+import os
+import time
+
+POOL = 'pool'
+BUILTIN = 'builtin'
+
+class CallStats:
+    """Totals for one called name; times in seconds."""
+    __slots__ = ('kind', 'calls', 'inclusive', 'exclusive')
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+
+class LineStats:
+    """Totals for one source line; time in seconds, inclusive of nested statements and calls."""
+    __slots__ = ('hits', 'time')
+
+    def __init__(self):
+        self.hits = 0
+        self.time = 0.0
+
+class Profiler:
+    """Call and line statistics for one program run; see the module comment."""
+    def __init__(self, root='<program>', clock=time.perf_counter):
+        self.root = root
+        self.clock = clock
+        # Source label given to statements compiled next (see interpreter.run_program).
+        self.source = root
+        self.calls = {}
+        self.lines = {}
+        self.stacks = {}
+        self.total = 0.0
+        self._stack = [root]
+        self._children = [0.0]
+        self._started = None
+
+    def start(self):
+        self._started = self.clock()
+
+    def stop(self):
+        self.total += self.clock() - self._started
+        self._started = None
+        stack = (self.root,)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + self.total - self._children[0]
+
+    def call(self, name, fn, args):
+        """fn(*args), timed as a call of name."""
+        clock = self.clock
+        stack = self._stack
+        children = self._children
+        stack.append(name)
+        children.append(0.0)
+        start = clock()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = clock() - start
+            exclusive = elapsed - children.pop()
+            stats = self.calls.get(name)
+            if stats is None:
+                stats = self.calls[name] = CallStats(POOL if hasattr(fn, 'declaration') else BUILTIN)
+            stats.calls += 1
+            stats.exclusive += exclusive
+            # A recursive call's time is already inside its outermost call's.
+            if name not in stack[1:-1]:
+                stats.inclusive += elapsed
+            key = tuple(stack)
+            self.stacks[key] = self.stacks.get(key, 0.0) + exclusive
+            stack.pop()
+            children[-1] += elapsed
+
+    def call_site(self, name, functions, args):
+        """Instrumented form of a compiled call of name with compiled args."""
+        call = self.call
+        if not args:
+            return lambda frame: call(name, functions[name], ())
+        return lambda frame: call(name, functions[name], [arg(frame) for arg in args])
+
+    def statement(self, compiled, stmt):
+        """Instrumented form of a compiled statement, counted against its source line."""
+        if stmt.span is None:
+            return compiled
+        key = (self.source, stmt.span[0])
+        stats = self.lines.get(key)
+        if stats is None:
+            stats = self.lines[key] = LineStats()
+        clock = self.clock
+        def profiled(frame):
+            start = clock()
+            try:
+                return compiled(frame)
+            finally:
+                stats.hits += 1
+                stats.time += clock() - start
+        return profiled
+
+    def report(self):
+        """The text report: calls by exclusive time, then lines by time."""
+        out = [f"Profile of {self.root}: {self.total * 1000:.3f} ms", "",
+               f"{'calls':>10} {'incl ms':>12} {'excl ms':>12} {'kind':<8} name"]
+        for name, stats in sorted(self.calls.items(), key=lambda item: (-item[1].exclusive, item[0])):
+            out.append(f"{stats.calls:>10} {stats.inclusive * 1000:>12.3f} {stats.exclusive * 1000:>12.3f} "
+                       f"{stats.kind:<8} {name}")
+        out += ["", f"{'hits':>10} {'incl ms':>12} line"]
+        for (source, line), stats in sorted(self.lines.items(), key=lambda item: (-item[1].time, item[0])):
+            if stats.hits:
+                out.append(f"{stats.hits:>10} {stats.time * 1000:>12.3f} {source}:{line}")
+        return "\n".join(out) + "\n"
+
+    def collapsed(self):
+        """Collapsed stacks, one `frame;frame;... <exclusive microseconds>` line each."""
+        return "".join(f"{';'.join(stack)} {round(seconds * 1e6)}\n"
+                       for stack, seconds in sorted(self.stacks.items()) if round(seconds * 1e6) > 0)
+
+    def write(self, prefix):
+        """Write prefix.txt (the report) and prefix.folded (collapsed stacks); returns both paths."""
+        paths = (prefix + ".txt", prefix + ".folded")
+        for path, text in zip(paths, (self.report(), self.collapsed())):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return paths
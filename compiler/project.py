@@ -0,0 +1,164 @@
+# Whole-project front end: `cascade <project directory or fountain.config>`.
+# Every source under the project root is compiled in two phases that each fan
+# out over an executor's worker processes. First all files are lexed and
+# parsed. Then, with the exported signatures of every module collected, each
+# file is type-checked and analyzed on its own against those signatures, as
+# the module loader would check it, so files check independently of each
+# other. A file is the unit of work: its top-level statements check in order,
+# since a pool body reads the globals poured above it. Sources the
+# compilation cache already holds skip parsing, and skip checking too unless
+# a source they were checked against has changed. The resulting loader
+# holds every module compiled, ready to run the project's entry.
+
+import os
+import pickle
+from functools import partial
+from compiler.ast_nodes import as_node
+from compiler.modules import (
+    CONFIG_NAME, SOURCE_SUFFIXES, Module, ModuleError, ModuleLoader, check_program, dependency_stamp, exports,
+    module_name,
+)
+from compiler.parser import parse_cascade
+from compiler.workspace import SKIP_DIRS
+
+# Files parsed or checked per task sent to a worker process.
+BUILD_CHUNKSIZE = 4
+
+# (signatures, loader) last built by check_batch in this process.
+_signature_loader = (None, None)
+
+class ProjectBuild:
+    """The outcome of build_project: a loader holding every module that parsed, and errors as (path, message)."""
+    def __init__(self, loader, errors):
+        self.loader = loader
+        self.errors = errors
+
+    def entry(self):
+        """The module named by "entry" in fountain.config, or None."""
+        entry = self.loader.config.get('entry')
+        if not isinstance(entry, str):
+            return None
+        return self.loader.modules.get(module_name(self.loader.root, os.path.join(self.loader.root, entry)))
+
+def project_root(path):
+    """The project root for a directory or a fountain.config path."""
+    return os.path.dirname(os.path.abspath(path)) if os.path.basename(path) == CONFIG_NAME else path
+
+def project_sources(root):
+    """Every source file under root, in a stable order."""
+    sources = []
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS)
+        sources.extend(os.path.join(directory, name) for name in sorted(names) if name.endswith(SOURCE_SUFFIXES))
+    return sources
+
+def parse_batch(codes):
+    """(AST, None) or (None, error message) for each source text. Runs in worker processes."""
+    results = []
+    for code in codes:
+        try:
+            results.append((as_node(parse_cascade(code)), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+def check_batch(root, signatures, jobs):
+    """The error message, or None, from checking each (name, ast) of jobs. Runs in worker processes.
+
+    signatures is a pickled map from every module of the project to (path,
+    (funcs, types)), which is all a module's checking looks up in the
+    modules it opens. A worker unpickles it once per build, not per batch.
+    """
+    global _signature_loader
+    if _signature_loader[0] != signatures:
+        loader = ModuleLoader(root)
+        for name, (path, exported) in pickle.loads(signatures).items():
+            loader.modules[name] = Module(name, path, None, None, exported)
+        _signature_loader = (signatures, loader)
+    loader = _signature_loader[1]
+    results = []
+    for name, ast in jobs:
+        try:
+            check_program(ast, loader.channels(ast, name))
+            results.append(None)
+        except Exception as e:
+            results.append(str(e))
+    return results
+
+def _run(executor, fn, items):
+    """fn over batches of items, in an executor's workers when given; results flattened in order."""
+    batches = [items[ix:ix + BUILD_CHUNKSIZE] for ix in range(0, len(items), BUILD_CHUNKSIZE)]
+    results = executor.map(fn, batches) if executor is not None and len(batches) > 1 else map(fn, batches)
+    return [result for batch in results for result in batch]
+
+def build_project(root, executor=None, cache=None):
+    """Parse, type-check and analyze every source of the project at root; returns a ProjectBuild.
+
+    With an executor (e.g. a ProcessPoolExecutor) both phases run in its workers.
+    """
+    loader = ModuleLoader(root, cache)
+    errors = []
+    fresh = []
+    cached = []
+    for path in project_sources(loader.root):
+        try:
+            with open(path, encoding="utf-8") as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            errors.append((path, str(e)))
+            continue
+        name = module_name(loader.root, path)
+        entry = cache.peek(path, code) if cache else None
+        if entry is None:
+            if cache:
+                cache.record(False)
+            fresh.append((name, path, code))
+        elif _register(loader, name, path, entry[1], errors):
+            cached.append((name, path, code, entry[1], entry[0]))
+    # Largest first, so a big file does not start last and hold up the phase.
+    fresh.sort(key=lambda job: -len(job[2]))
+    parsed = []
+    for (name, path, code), (ast, error) in zip(fresh, _run(executor, parse_batch, [job[2] for job in fresh])):
+        if error is not None:
+            errors.append((path, error))
+        elif _register(loader, name, path, ast, errors):
+            parsed.append((name, path, code, ast))
+    # With every module registered, a cached file whose dependencies changed is checked again.
+    stamps = {}
+    for name, path, code, ast, stamp in cached:
+        stamps[name] = _stamp(loader, name, ast)
+        cache.record(stamps[name] == stamp)
+        if stamps[name] != stamp:
+            parsed.append((name, path, code, ast))
+    signatures = pickle.dumps({name: (module.path, (module.funcs, module.types))
+                               for name, module in loader.modules.items()})
+    checks = _run(executor, partial(check_batch, loader.root, signatures), [(job[0], job[3]) for job in parsed])
+    for (name, path, code, ast), error in zip(parsed, checks):
+        if error is not None:
+            errors.append((path, error))
+        elif cache:
+            cache.store(path, code, ast, stamps[name] if name in stamps else _stamp(loader, name, ast))
+    errors.sort()
+    return ProjectBuild(loader, errors)
+
+def _stamp(loader, name, ast):
+    """modules.dependency_stamp of a registered module; None if a dependency cannot be read."""
+    try:
+        return dependency_stamp(loader.channels(ast, name))
+    except ModuleError:
+        return None
+
+def _register(loader, name, path, ast, errors):
+    """Add a parsed module to loader, as load() would, so running the project reuses it.
+
+    A module opening a channel that does not exist is recorded as an error
+    and kept by its signatures alone, for the modules that open it.
+    """
+    try:
+        channels = loader.channels(ast, name)
+    except ModuleError as e:
+        errors.append((path, str(e)))
+        loader.modules.setdefault(name, Module(name, path, None, None, exports(ast)))
+        return False
+    loader.modules.setdefault(name, Module(name, path, ast, channels))
+    return True
@@ -1,82 +1,205 @@
 # Full Cascade Semantic Analyzer
 
+from compiler.ast_nodes import (
+    ASSIGNMENT, BINARY_EXPR, BOOLEAN_LITERAL, CONSTANT_DECLARATION, CYCLE_STATEMENT, EXPRESSION_STATEMENT,
+    FUNCTION_CALL, FUNCTION_DECLARATION, IDENTIFIER, IF_STATEMENT, IMPORT_STATEMENT, LIST_LITERAL,
+    MAP_LITERAL, NUMBER_LITERAL, PATTERN, RETURN_STATEMENT, STRING_LITERAL, THROW_STATEMENT,
+    TRY_CATCH_STATEMENT, TYPE_DECLARATION, VARIABLE_DECLARATION, Node, Record, as_node, from_dict,
+)
+
+LITERALS = frozenset((NUMBER_LITERAL, STRING_LITERAL, BOOLEAN_LITERAL, LIST_LITERAL, MAP_LITERAL))
+
 class SemanticError(Exception):
     pass
 
+class Scope:
+    """Variable names bound in a block, chained to the enclosing block's; a child scope is O(1)."""
+    __slots__ = ('names', 'parent')
+
+    def __init__(self, names=(), parent=None):
+        self.names = set(names)
+        self.parent = parent
+
+    def __contains__(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.names:
+                return True
+            scope = scope.parent
+        return False
+
+    def child(self, names=()):
+        return Scope(names, self)
+
 def analyze_semantics(ast, defined_functions=None, defined_types=None, in_scope=None):
     if defined_functions is None: defined_functions = set()
     if defined_types is None: defined_types = set()
-    if in_scope is None: in_scope = set()
-    for node in ast['body']:
-        check_semantics(node, defined_functions, defined_types, in_scope)
+    scope = Scope(in_scope or ())
+    for node in as_node(ast).body:
+        check_semantics(node, defined_functions, defined_types, scope)
 
 def check_semantics(node, functions, types, scope):
-    t = node.get('type')
-    if t == 'FunctionDeclaration':
-        if node['name'] in functions:
-            raise SemanticError(f"Function '{node['name']}' already defined")
-        functions.add(node['name'])
+    if not isinstance(node, Node):
+        node = from_dict(node)
+    if not isinstance(scope, Scope):
+        scope = Scope(scope)
+    k = node.KIND
+    if k == FUNCTION_DECLARATION:
+        if node.name in functions:
+            raise SemanticError(f"Function '{node.name}' already defined")
+        functions.add(node.name)
         param_names = set()
-        for param in node['params']:
-            if param['name'] in param_names:
-                raise SemanticError(f"Duplicate parameter: {param['name']}")
-            param_names.add(param['name'])
-        local_scope = scope | param_names
-        for stmt in node['body']:
+        for param in node.params:
+            if param.name in param_names:
+                raise SemanticError(f"Duplicate parameter: {param.name}")
+            param_names.add(param.name)
+        local_scope = scope.child(param_names)
+        for stmt in node.body:
             check_semantics(stmt, functions, types, local_scope)
-    elif t == 'TypeDeclaration':
-        if node['name'] in types:
-            raise SemanticError(f"Type '{node['name']}' already defined")
-        types.add(node['name'])
+    elif k == TYPE_DECLARATION:
+        if node.name in types:
+            raise SemanticError(f"Type '{node.name}' already defined")
+        types.add(node.name)
         field_names = set()
-        for f in node['fields']:
-            if f['name'] in field_names:
-                raise SemanticError(f"Duplicate field {f['name']} in type {node['name']}")
-            field_names.add(f['name'])
-    elif t == 'VariableDeclaration':
-        if node['name'] in scope:
-            raise SemanticError(f"Variable '{node['name']}' already defined in scope")
-        check_semantics(node['value'], functions, types, scope)
-    elif t == 'Assignment':
-        if node['name'] not in scope:
-            raise SemanticError(f"Assignment to undefined variable '{node['name']}'")
-        check_semantics(node['value'], functions, types, scope)
-    elif t == 'IfStatement':
-        for when in node['whens']:
-            check_semantics(when['condition'], functions, types, scope)
-            for stmt in when['body']:
-                check_semantics(stmt, functions, types, scope)
-        if node['otherwise']:
-            for stmt in node['otherwise']['body']:
-                check_semantics(stmt, functions, types, scope)
-    elif t == 'CycleStatement':
-        check_semantics(node['collection'], functions, types, scope)
-        local_scope = scope | {node['element']}
-        for stmt in node['body']:
+        for f in node.fields:
+            if f.name in field_names:
+                raise SemanticError(f"Duplicate field {f.name} in type {node.name}")
+            field_names.add(f.name)
+    elif k in (VARIABLE_DECLARATION, CONSTANT_DECLARATION):
+        if node.name in scope:
+            raise SemanticError(f"Variable '{node.name}' already defined in scope")
+        check_semantics(node.value, functions, types, scope)
+        scope.names.add(node.name)
+    elif k == ASSIGNMENT:
+        if node.name not in scope:
+            raise SemanticError(f"Assignment to undefined variable '{node.name}'")
+        check_semantics(node.value, functions, types, scope)
+    elif k == IF_STATEMENT:
+        # Each branch binds in its own scope; what they bind is visible after the if.
+        branches = []
+        for when in node.whens:
+            check_semantics(when.condition, functions, types, scope)
+            branches.append(scope.child())
+            for stmt in when.body:
+                check_semantics(stmt, functions, types, branches[-1])
+        if node.otherwise:
+            branches.append(scope.child())
+            for stmt in node.otherwise.body:
+                check_semantics(stmt, functions, types, branches[-1])
+        for branch in branches:
+            scope.names.update(branch.names)
+    elif k == CYCLE_STATEMENT:
+        if node.parallel:
+            parallel_reductions(node)
+        check_semantics(node.collection, functions, types, scope)
+        local_scope = scope.child((node.element,))
+        for stmt in node.body:
             check_semantics(stmt, functions, types, local_scope)
-    elif t == 'TryCatchStatement':
-        for stmt in node['tryBlock']:
-            check_semantics(stmt, functions, types, scope)
-        catch_scope = scope | {node['errVar']}
-        for stmt in node['catchBlock']:
+    elif k == TRY_CATCH_STATEMENT:
+        try_scope = scope.child()
+        for stmt in node.tryBlock:
+            check_semantics(stmt, functions, types, try_scope)
+        catch_scope = scope.child((node.errVar,))
+        for stmt in node.catchBlock:
             check_semantics(stmt, functions, types, catch_scope)
-    elif t in ('ExpressionStatement', 'ReturnStatement'):
-        check_semantics(node['expression'] if t == 'ExpressionStatement' else node['value'],
+    elif k in (EXPRESSION_STATEMENT, RETURN_STATEMENT, THROW_STATEMENT):
+        check_semantics(node.expression if k == EXPRESSION_STATEMENT else node.value,
                        functions, types, scope)
-    elif t in ('NumberLiteral', 'StringLiteral', 'BooleanLiteral', 'ListLiteral', 'MapLiteral'):
+    elif k in LITERALS:
         pass
-    elif t == 'Identifier':
-        if node['value'] not in scope:
-            raise SemanticError(f"Variable '{node['value']}' not defined in scope")
-    elif t == 'FunctionCall':
-        if node['name'] not in functions:
-            raise SemanticError(f"Function '{node['name']}' not defined")
-        for arg in node.get('args', []):
+    elif k == IDENTIFIER:
+        if node.value not in scope:
+            raise SemanticError(f"Variable '{node.value}' not defined in scope")
+    elif k == BINARY_EXPR:
+        check_semantics(node.left, functions, types, scope)
+        check_semantics(node.right, functions, types, scope)
+    elif k == FUNCTION_CALL:
+        if node.name not in functions:
+            raise SemanticError(f"Function '{node.name}' not defined")
+        for arg in node.args or []:
             check_semantics(arg, functions, types, scope)
-    elif t == 'ImportStatement':
+    elif k == IMPORT_STATEMENT:
         pass
-    elif t == 'Pattern':
-        if node['asType'] not in types:
-            raise SemanticError(f"Pattern matches unknown type '{node['asType']}'")
+    elif k == PATTERN:
+        if node.asType not in types:
+            raise SemanticError(f"Pattern matches unknown type '{node.asType}'")
     else:
-        raise SemanticError(f"Unknown node type: {t}")
+        raise SemanticError(f"Unknown node type: {node.TYPE}")
+
+def _children(node):
+    """Direct child nodes of a node or record, in field order."""
+    for field in node.FIELDS:
+        value = getattr(node, field)
+        for item in (value if isinstance(value, list) else (value,)):
+            if isinstance(item, Node):
+                yield item
+            elif isinstance(item, Record):
+                yield from _children(item)
+
+def _walk(node):
+    yield node
+    for child in _children(node):
+        yield from _walk(child)
+
+def names_read(nodes):
+    """Every name nodes may look up: identifiers, called functions, and strings, which may name a pool."""
+    names = set()
+    for root in nodes:
+        for node in _walk(root):
+            k = node.KIND
+            if k in (IDENTIFIER, STRING_LITERAL):
+                names.add(node.value)
+            elif k == FUNCTION_CALL:
+                names.add(node.name)
+    return names
+
+def is_reduction(node, name):
+    """True for `fill name with name + <expr>` where <expr> does not read name."""
+    value = node.value
+    return (node.KIND == ASSIGNMENT and node.name == name and value.KIND == BINARY_EXPR
+            and value.operator == '+' and value.left.KIND == IDENTIFIER and value.left.value == name
+            and not any(n.KIND == IDENTIFIER and n.value == name for n in _walk(value.right)))
+
+def parallel_reductions(cycle):
+    """Names a parallel cycle's body reduces into, sorted; raises SemanticError for other outer writes.
+
+    Iterations of a parallel cycle run independently, so the only write to a
+    variable from outside the body it allows is `fill acc with acc + <expr>`;
+    the contributions are joined in element order and added to acc after the
+    loop. The body may not otherwise read acc, and may not return.
+    """
+    local = {cycle.element}
+    for stmt in cycle.body:
+        for node in _walk(stmt):
+            k = node.KIND
+            if k in (VARIABLE_DECLARATION, CONSTANT_DECLARATION):
+                local.add(node.name)
+            elif k == CYCLE_STATEMENT:
+                local.add(node.element)
+            elif k == TRY_CATCH_STATEMENT:
+                local.add(node.errVar)
+            elif k == FUNCTION_DECLARATION:
+                local.update(param.name for param in node.params)
+    targets = set()
+    def visit(nodes, in_pool):
+        for node in nodes:
+            k = node.KIND
+            if k == RETURN_STATEMENT and not in_pool:
+                raise SemanticError("Cannot return from inside a parallel cycle")
+            if k == ASSIGNMENT and not in_pool and node.name not in local:
+                if not is_reduction(node, node.name):
+                    raise SemanticError(f"Parallel cycle writes outer variable '{node.name}' "
+                                        f"other than as 'fill {node.name} with {node.name} + ...'")
+                targets.add(node.name)
+            visit(_children(node), in_pool or k == FUNCTION_DECLARATION)
+    visit(cycle.body, False)
+    def reads(node):
+        if node.KIND == ASSIGNMENT and node.name in targets and is_reduction(node, node.name):
+            return reads(node.value.right)
+        if node.KIND == IDENTIFIER and node.value in targets:
+            raise SemanticError(f"Parallel cycle reads reduction variable '{node.value}'")
+        for child in _children(node):
+            reads(child)
+    for stmt in cycle.body:
+        reads(stmt)
+    return sorted(targets)
@@ -2,9 +2,19 @@
 # All functions have clear docstrings.
 
 import math
+import os
+import pickle
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from functools import reduce
+from compiler.basin import DepthBasin, ReservoirBasin, StreamBasin, is_lazy
+from compiler.interpreter import CascadeRuntimeError, map_shipped, ship_pool
+
+# Workers for the parallel_* functions (None: one per CPU), and the number of
+# chunks each worker gets when no chunk_size is given.
+PARALLEL_WORKERS = None
+CHUNKS_PER_WORKER = 4
 
 def flow(value, destination=None):
     """Print value to output. Destination can be 'console' or None (default stdout)."""
@@ -12,23 +22,125 @@ def flow(value, destination=None):
         print(value)
 
 def measure(value):
-    """Return length of a list, string, or dict."""
-    if isinstance(value, (list, str, dict)):
+    """Return length of a list, string, or dict. Consumes a stream basin to count it."""
+    if isinstance(value, (list, str, dict, DepthBasin, ReservoirBasin)):
         return len(value)
+    if isinstance(value, StreamBasin):
+        return sum(1 for _ in value)
     raise TypeError("measure() expects list, string, or map")
 
-def filter_basin(basin, predicate):
-    """Return a filtered list using the predicate function."""
+def stream_basin(basin):
+    """Return a lazy view of basin; map_basin/filter_basin on it fuse into one pass."""
+    return basin if isinstance(basin, StreamBasin) else StreamBasin(basin)
+
+def collect_basin(basin):
+    """Materialize a basin (stream or list) into a list."""
+    return list(basin)
+
+def field_basin(basin, name):
+    """Return field name of every record in basin.
+
+    A columnar basin projects without touching its rows; its depth fields
+    come back as a basin sharing the column's storage.
+    """
+    if isinstance(basin, ReservoirBasin):
+        return basin.column(name)
+    return [record[name] for record in basin]
+
+def filter_basin(basin, predicate, lazy=False):
+    """Return a filtered list using the predicate function.
+
+    Returns a stream basin instead when basin is lazy or lazy is true.
+    """
+    if lazy or is_lazy(basin):
+        return stream_basin(basin).filter(predicate)
     return [x for x in basin if predicate(x)]
 
-def map_basin(basin, func):
-    """Apply func to each item in basin (list)."""
+def map_basin(basin, func, lazy=False):
+    """Apply func to each item in basin (list).
+
+    Returns a stream basin instead when basin is lazy or lazy is true.
+    """
+    if lazy or is_lazy(basin):
+        return stream_basin(basin).map(func)
     return [func(x) for x in basin]
 
 def reduce_basin(basin, func, initial):
     """Reduce basin with func and initial value."""
     return reduce(func, basin, initial)
 
+# Worker pools for the parallel_* functions, by (processes, workers), kept for the process.
+_executors = {}
+
+def _map_chunk(func, chunk):
+    return [func(x) for x in chunk]
+
+def _filter_chunk(predicate, chunk):
+    return [x for x in chunk if predicate(x)]
+
+def _reduce_chunk(func, chunk):
+    return reduce(func, chunk)
+
+def _picklable(func):
+    try:
+        pickle.dumps(func)
+    except Exception:
+        return False
+    return True
+
+def _run_chunks(work, basin, func, workers, chunk_size, processes):
+    """Split basin into chunks and return work(func, chunk) for each, in order.
+
+    Chunks run on a process pool (compiled pools are shipped with ship_pool,
+    once per worker; other callables that cannot be pickled fall back to
+    threads), or in this process when there is one worker or one chunk.
+    """
+    if not isinstance(basin, (list, DepthBasin)):
+        basin = list(basin)
+    # Cascade passes depths, and 0 for the default.
+    workers = int(workers or PARALLEL_WORKERS or os.cpu_count() or 1)
+    chunk_size = int(chunk_size or -(-len(basin) // (workers * CHUNKS_PER_WORKER)) or 1)
+    chunks = [basin[ix:ix + chunk_size] for ix in range(0, len(basin), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return [work(func, chunk) for chunk in chunks]
+    if processes:
+        func = ship_pool(func)
+        processes = _picklable(func)
+    key = (processes, workers)
+    executor = _executors.get(key)
+    if executor is None:
+        executor = _executors[key] = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(workers)
+    if processes:
+        return map_shipped(executor, workers, work, func, chunks)
+    return list(executor.map(work, [func] * len(chunks), chunks))
+
+def parallel_map_basin(basin, func, workers=None, chunk_size=None, processes=True):
+    """Apply func to each item in basin on a worker pool; returns a list in basin order."""
+    return [x for chunk in _run_chunks(_map_chunk, basin, func, workers, chunk_size, processes) for x in chunk]
+
+def parallel_filter_basin(basin, predicate, workers=None, chunk_size=None, processes=True):
+    """Return the items of basin passing predicate, tested on a worker pool, in basin order."""
+    return [x for chunk in _run_chunks(_filter_chunk, basin, predicate, workers, chunk_size, processes)
+            for x in chunk]
+
+def parallel_reduce_basin(basin, func, initial, associative=False, workers=None, chunk_size=None,
+                          processes=True):
+    """Reduce basin with func and initial value, chunks in parallel when func is associative.
+
+    Each chunk is reduced on a worker pool, the chunk results are combined
+    pairwise as a balanced tree and the total is combined with initial. A
+    combiner not declared associative is reduced sequentially.
+    """
+    if not associative:
+        return reduce_basin(basin, func, initial)
+    partials = _run_chunks(_reduce_chunk, basin, func, workers, chunk_size, processes)
+    if not partials:
+        return initial
+    while len(partials) > 1:
+        partials = [func(partials[ix], partials[ix + 1]) if ix + 1 < len(partials) else partials[ix]
+                    for ix in range(0, len(partials), 2)]
+    return func(initial, partials[0])
+
 def to_rivulet(value):
     """Convert value to string."""
     return str(value)
@@ -58,26 +170,146 @@ def now():
 
 def sort_basin(basin):
     """Return a sorted copy of basin (list)."""
+    if isinstance(basin, DepthBasin):
+        return basin.sorted()
     return sorted(basin)
 
 def max_basin(basin):
     """Return the max value of basin (list)."""
+    if isinstance(basin, DepthBasin):
+        return basin.max()
     return max(basin)
 
 def min_basin(basin):
     """Return the min value of basin (list)."""
+    if isinstance(basin, DepthBasin):
+        return basin.min()
     return min(basin)
 
 def sum_basin(basin):
     """Return the sum of basin (list)."""
+    if isinstance(basin, DepthBasin):
+        return basin.sum()
     return sum(basin)
 
 def avg_basin(basin):
     """Return the average of basin (list). Returns 0 for empty list."""
+    if is_lazy(basin):
+        count = 0
+        total = 0
+        for x in basin:
+            count += 1
+            total += x
+        return total / count if count else 0
     if not basin:
         return 0
+    if isinstance(basin, DepthBasin):
+        return basin.sum() / len(basin)
     return sum(basin) / len(basin)
 
+def _welford(values):
+    """One pass over values: (count, mean, sum of squared deviations, min, max)."""
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    lo = hi = None
+    for x in values:
+        count += 1
+        delta = x - mean
+        mean += delta / count
+        m2 += delta * (x - mean)
+        if lo is None or x < lo:
+            lo = x
+        if hi is None or x > hi:
+            hi = x
+    return count, mean, m2, lo, hi
+
+def stats_basin(basin):
+    """Return count, avg, min, max and stddev of basin (list or iterator) in one pass.
+
+    Uses Welford's update, so only a constant amount of state is kept. All
+    values are 0 for an empty basin.
+    """
+    if isinstance(basin, DepthBasin) and basin.vectorized:
+        count = len(basin)
+        if count == 0:
+            return {"count": 0, "avg": 0, "min": 0, "max": 0, "stddev": 0}
+        return {"count": count, "avg": basin.sum() / count, "min": basin.min(),
+                "max": basin.max(), "stddev": math.sqrt(basin.variance()) if count > 1 else 0}
+    count, mean, m2, lo, hi = _welford(basin)
+    if count == 0:
+        return {"count": 0, "avg": 0, "min": 0, "max": 0, "stddev": 0}
+    return {"count": count, "avg": mean, "min": lo, "max": hi,
+            "stddev": math.sqrt(m2 / (count - 1)) if count > 1 else 0}
+
+def variance_basin(basin):
+    """Return the sample variance of basin (list or iterator). Returns 0 for fewer than two values."""
+    if isinstance(basin, DepthBasin) and basin.vectorized:
+        return basin.variance() if len(basin) > 1 else 0
+    count, _, m2, _, _ = _welford(basin)
+    return m2 / (count - 1) if count > 1 else 0
+
+def stddev_basin(basin):
+    """Return the sample standard deviation of basin (list or iterator)."""
+    return math.sqrt(variance_basin(basin))
+
+def _select(values, k):
+    """Return the k-th smallest (0-based) of values and its successor, by quickselect.
+
+    Runs in expected linear time. The successor (the (k+1)-th smallest) is
+    None when k is the last position.
+    """
+    successor = None
+    while True:
+        if len(values) <= 64:
+            ordered = sorted(values)
+            return ordered[k], ordered[k + 1] if k + 1 < len(ordered) else successor
+        pivot = values[random.randrange(len(values))]
+        lower = [x for x in values if x < pivot]
+        if k < len(lower):
+            # Everything discarded is >= pivot, and pivot is the smallest of it.
+            values, successor = lower, pivot
+            continue
+        upper = [x for x in values if x > pivot]
+        equal = len(values) - len(lower) - len(upper)
+        if k < len(lower) + equal:
+            if k + 1 < len(lower) + equal:
+                return pivot, pivot
+            return pivot, min(upper) if upper else successor
+        k -= len(lower) + equal
+        values = upper
+
+def quantile_basin(basin, q):
+    """Return the q-quantile (0 <= q <= 1) of basin, interpolating linearly. Returns 0 for empty basin.
+
+    Values are selected rather than sorted; an iterator is buffered once.
+    """
+    if not 0 <= q <= 1:
+        raise ValueError("quantile_basin() expects q between 0 and 1")
+    if isinstance(basin, DepthBasin) and basin.vectorized:
+        return basin.quantile(q) if len(basin) else 0
+    values = basin if isinstance(basin, list) else list(basin)
+    if not values:
+        return 0
+    pos = q * (len(values) - 1)
+    lo = int(pos)
+    low, high = _select(values, lo)
+    if pos == lo:
+        return low
+    return low + (high - low) * (pos - lo)
+
+def median_basin(basin):
+    """Return the median of basin (list or iterator). Returns 0 for empty basin."""
+    return quantile_basin(basin, 0.5)
+
+def percentile_basin(basin, p):
+    """Return the p-th percentile (0 <= p <= 100) of basin."""
+    return quantile_basin(basin, p / 100)
+
+def unique_basin(basin):
+    """Return the distinct items of basin (list or iterator) in first-seen order."""
+    return list(dict.fromkeys(basin))
+
 def abs_depth(value):
     """Return the absolute value of a number."""
     return abs(value)
@@ -112,4 +344,72 @@ def split_rivulet(s, sep=None):
 
 def join_basin(basin, sep=""):
     """Join list of strings with separator."""
-    return sep.join(map(str, basin))
\ No newline at end of file
+    return sep.join(map(str, basin))
+
+# The stdlib pools a Cascade program can call without opening a channel, as
+# name -> ((param types, return type), function), the form host channels
+# export theirs in (see host.py). 'Any' accepts any argument and '[Any]' any
+# list; a trailing '?' marks a param that may be left out, along with all
+# after it. Pools taking a function take the name of a pool instead (see
+# builtin).
+BUILTIN_POOLS = {
+    'flow': ((['Any', 'Any?'], 'Any'), flow),
+    'measure': ((['Any'], 'depth'), measure),
+    'to_rivulet': ((['Any'], 'rivulet'), to_rivulet),
+    'to_depth': ((['Any'], 'depth'), to_depth),
+    'to_drop': ((['Any'], 'drop'), to_drop),
+    'random_depth': (([], 'depth'), random_depth),
+    'now': (([], 'depth'), now),
+    'abs_depth': ((['depth'], 'depth'), abs_depth),
+    'sqrt_depth': ((['depth'], 'depth'), sqrt_depth),
+    'log_depth': ((['depth', 'depth'], 'depth'), log_depth),
+    'pow_depth': ((['depth', 'depth'], 'depth'), pow_depth),
+    'upper_rivulet': ((['rivulet'], 'rivulet'), upper_rivulet),
+    'lower_rivulet': ((['rivulet'], 'rivulet'), lower_rivulet),
+    'strip_rivulet': ((['rivulet'], 'rivulet'), strip_rivulet),
+    'split_rivulet': ((['rivulet', 'rivulet'], '[rivulet]'), split_rivulet),
+    'join_basin': ((['[Any]', 'rivulet'], 'rivulet'), join_basin),
+    'stream_basin': ((['[Any]'], '[Any]'), stream_basin),
+    'collect_basin': ((['[Any]'], '[Any]'), collect_basin),
+    'field_basin': ((['[Any]', 'rivulet'], '[Any]'), field_basin),
+    'sort_basin': ((['[depth]'], '[depth]'), sort_basin),
+    'max_basin': ((['[depth]'], 'depth'), max_basin),
+    'min_basin': ((['[depth]'], 'depth'), min_basin),
+    'sum_basin': ((['[depth]'], 'depth'), sum_basin),
+    'avg_basin': ((['[depth]'], 'depth'), avg_basin),
+    'stats_basin': ((['[depth]'], 'map'), stats_basin),
+    'variance_basin': ((['[depth]'], 'depth'), variance_basin),
+    'stddev_basin': ((['[depth]'], 'depth'), stddev_basin),
+    'quantile_basin': ((['[depth]', 'depth'], 'depth'), quantile_basin),
+    'median_basin': ((['[depth]'], 'depth'), median_basin),
+    'percentile_basin': ((['[depth]', 'depth'], 'depth'), percentile_basin),
+    'unique_basin': ((['[Any]'], '[Any]'), unique_basin),
+    'map_basin': ((['[Any]', 'rivulet'], '[Any]'), map_basin),
+    'filter_basin': ((['[Any]', 'rivulet'], '[Any]'), filter_basin),
+    'reduce_basin': ((['[Any]', 'rivulet', 'depth'], 'depth'), reduce_basin),
+    'parallel_map_basin': ((['[Any]', 'rivulet', 'depth?', 'depth?', 'drop?'], '[Any]'), parallel_map_basin),
+    'parallel_filter_basin': ((['[Any]', 'rivulet', 'depth?', 'depth?', 'drop?'], '[Any]'),
+                              parallel_filter_basin),
+    'parallel_reduce_basin': ((['[Any]', 'rivulet', 'depth', 'drop?', 'depth?', 'depth?', 'drop?'], 'depth'),
+                              parallel_reduce_basin),
+}
+
+# Builtins whose second argument names the pool they apply.
+POOL_ARGUMENT = frozenset({'map_basin', 'filter_basin', 'reduce_basin', 'parallel_map_basin',
+                           'parallel_filter_basin', 'parallel_reduce_basin'})
+
+def builtin(name, functions):
+    """The callable for builtin pool name, or None; pool names it is passed are looked up in functions."""
+    entry = BUILTIN_POOLS.get(name)
+    if entry is None:
+        return None
+    kernel = entry[1]
+    if name not in POOL_ARGUMENT:
+        return kernel
+    def call(basin, pool, *rest):
+        try:
+            func = functions[pool]
+        except KeyError:
+            raise CascadeRuntimeError(f"{name}: undefined pool '{pool}'")
+        return kernel(basin, func, *rest)
+    return call
@@ -0,0 +1,195 @@
+# Position-indexed symbols for the Cascade language server.
+# A SymbolTable covers one group of parsed statements: the declarations it
+# makes (including params and locals in nested pool scopes), the references
+# it contains, and an interval tree over their spans so the entry under a
+# cursor is found in O(log n) rather than by scanning the AST.
+# Positions are (line, col) pairs in the spans' coordinates (1-based lines).
+
+from compiler.ast_nodes import (
+    CONSTANT_DECLARATION, CYCLE_STATEMENT, FUNCTION_CALL, FUNCTION_DECLARATION, IDENTIFIER,
+    TRY_CATCH_STATEMENT, TYPE_DECLARATION, VARIABLE_DECLARATION, Node, Record,
+)
+
+class IntervalTree:
+    """Static centered interval tree of (start, end, item) with inclusive ends."""
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        self.center = None
+        self.left = self.right = None
+        self.by_start = self.by_end = ()
+        if not intervals:
+            return
+        bounds = sorted(bound for start, end, _ in intervals for bound in (start, end))
+        center = self.center = bounds[len(bounds) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda iv: iv[0])
+        self.by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point):
+        """Items of every interval containing point, innermost (latest start) first."""
+        found = []
+        node = self
+        while node is not None and node.center is not None:
+            if point < node.center:
+                for interval in node.by_start:
+                    if interval[0] > point:
+                        break
+                    found.append(interval)
+                node = node.left
+            elif point > node.center:
+                for interval in node.by_end:
+                    if interval[1] < point:
+                        break
+                    found.append(interval)
+                node = node.right
+            else:
+                found.extend(node.by_start)
+                break
+        found.sort(key=lambda iv: (iv[0], _negate(iv[1])), reverse=True)
+        return [item for _, _, item in found]
+
+def _negate(position):
+    return (-position[0], -position[1])
+
+class Symbol:
+    """A declared name: kind is variable, constant, pool, param, type or element."""
+    __slots__ = ('name', 'kind', 'detail', 'span', 'scope')
+
+    def __init__(self, name, kind, detail, span, scope):
+        self.name = name
+        self.kind = kind
+        self.detail = detail
+        self.span = span
+        self.scope = scope
+
+    def __repr__(self):
+        return f"Symbol({self.kind} {self.name}: {self.detail})"
+
+class Reference:
+    """A use of a name (an identifier or a pool call)."""
+    __slots__ = ('name', 'span')
+
+    def __init__(self, name, span):
+        self.name = name
+        self.span = span
+
+class SymbolScope:
+    """A pool, cycle or catch scope: its span and the names declared in it."""
+    __slots__ = ('span', 'symbols', 'parent')
+
+    def __init__(self, span, parent):
+        self.span = span
+        self.symbols = {}
+        self.parent = parent
+
+def _bounds(span):
+    return (span[0], span[1]), (span[2], span[3])
+
+class SymbolTable:
+    """Declarations, references and scopes of a list of statements, indexed by position."""
+    def __init__(self, nodes):
+        self.top = {}
+        self.scopes = []
+        self._entries = []
+        for node in nodes:
+            self._walk(node, None)
+        self.tree = IntervalTree([_bounds(item.span) + (item,) for item in self._entries])
+        self.scope_tree = IntervalTree([_bounds(scope.span) + (scope,) for scope in self.scopes])
+        del self._entries
+
+    def _declare(self, name, kind, detail, span, scope):
+        symbol = Symbol(name, kind, detail, span, scope)
+        table = scope.symbols if scope is not None else self.top
+        table.setdefault(name, []).append(symbol)
+        if span is not None:
+            self._entries.append(symbol)
+        return symbol
+
+    def _open(self, span, parent):
+        scope = SymbolScope(span, parent)
+        if span is not None:
+            self.scopes.append(scope)
+        return scope
+
+    def _walk(self, node, scope):
+        k = node.KIND
+        if k == VARIABLE_DECLARATION or k == CONSTANT_DECLARATION:
+            kind = 'variable' if k == VARIABLE_DECLARATION else 'constant'
+            self._declare(node.name, kind, node.get('declaredType'), node.span, scope)
+        elif k == FUNCTION_DECLARATION:
+            params = ", ".join(f"{p.name}:{p.type}" for p in node.params)
+            self._declare(node.name, 'pool', f"({params}):{node.returnType}", node.span, scope)
+            inner = self._open(node.span, scope)
+            for param in node.params:
+                self._declare(param.name, 'param', param.type, param.span, inner)
+            self._walk_all(node.body, inner)
+            return
+        elif k == TYPE_DECLARATION:
+            self._declare(node.name, 'type', None, node.span, scope)
+            return
+        elif k == CYCLE_STATEMENT:
+            self._walk_value(node.collection, scope)
+            inner = self._open(node.span, scope)
+            self._declare(node.element, 'element', None, None, inner)
+            self._walk_all(node.body, inner)
+            return
+        elif k == TRY_CATCH_STATEMENT:
+            self._walk_all(node.tryBlock, scope)
+            inner = self._open(node.span, scope)
+            self._declare(node.errVar, 'variable', 'Turbulence', None, inner)
+            self._walk_all(node.catchBlock, inner)
+            return
+        elif k == IDENTIFIER or k == FUNCTION_CALL:
+            if node.span is not None:
+                self._entries.append(Reference(node.value if k == IDENTIFIER else node.name, node.span))
+        for field in node.FIELDS:
+            self._walk_value(getattr(node, field), scope)
+
+    def _walk_all(self, nodes, scope):
+        for node in nodes or ():
+            self._walk(node, scope)
+
+    def _walk_value(self, value, scope):
+        if isinstance(value, Node):
+            self._walk(value, scope)
+        elif isinstance(value, Record):
+            for field in value.FIELDS:
+                self._walk_value(getattr(value, field), scope)
+        elif isinstance(value, list):
+            for item in value:
+                self._walk_value(item, scope)
+
+    def at(self, position):
+        """The innermost declaration or reference whose span contains position, or None."""
+        items = self.tree.stab(position)
+        return items[0] if items else None
+
+    def scopes_at(self, position):
+        """Scopes containing position, innermost first."""
+        return self.scope_tree.stab(position)
+
+    def resolve(self, name, position):
+        """The local (pool/cycle/catch scope) symbol name refers to at position, or None."""
+        for scope in self.scopes_at(position):
+            symbols = scope.symbols.get(name)
+            if symbols:
+                return symbols[-1]
+        return None
+
+    def visible(self, position):
+        """Names declared in the scopes containing position."""
+        names = {}
+        for scope in reversed(self.scopes_at(position)):
+            for name, symbols in scope.symbols.items():
+                names[name] = symbols[-1]
+        return names
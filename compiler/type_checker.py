@@ -1,8 +1,48 @@
 # Full Cascade Language Type Checker
+# Types are interned Type strings, one object per spelling, so comparing two
+# of them is an identity check and a list type knows its element type. An
+# expression whose type does not depend on the environment (literals, and
+# lists and operators over them) keeps its inferred type on the node, so
+# re-checking an AST does not re-walk it. No node is inferred twice in one
+# check, which keeps check_type linear in the size of the AST.
+
+from compiler.ast_nodes import (
+    ASSIGNMENT, BINARY_EXPR, BOOLEAN_LITERAL, CONSTANT_DECLARATION, CYCLE_STATEMENT, EXPRESSION_STATEMENT,
+    FUNCTION_CALL, FUNCTION_DECLARATION, IDENTIFIER, IF_STATEMENT, IMPORT_STATEMENT, LIST_LITERAL,
+    MAP_LITERAL, NUMBER_LITERAL, PATTERN, PROGRAM, RETURN_STATEMENT, STRING_LITERAL, THROW_STATEMENT,
+    TRY_CATCH_STATEMENT, TYPE_DECLARATION, VARIABLE_DECLARATION, Node, from_dict,
+)
 
 class TypeError(Exception):
     pass
 
+class Type(str):
+    """An interned type name; element is the element type of a list type, else None."""
+
+    def __reduce__(self):
+        return (intern_type, (str(self),))
+
+_TYPES = {}
+
+def intern_type(name):
+    """The one Type spelled name."""
+    typ = _TYPES.get(name)
+    if typ is None:
+        typ = _TYPES[name] = Type(name)
+        typ.element = intern_type(name[1:-1]) if name.startswith('[') and name.endswith(']') else None
+    return typ
+
+def list_of(element):
+    return intern_type(f'[{element}]')
+
+DEPTH = intern_type('depth')
+RIVULET = intern_type('rivulet')
+DROP = intern_type('drop')
+MAP = intern_type('map')
+TURBULENCE = intern_type('Turbulence')
+ANY_LIST = intern_type('[Any]')
+DEPTH_LIST = intern_type('[depth]')
+
 class TypeEnv:
     def __init__(self, parent=None):
         self.vars = {}
@@ -11,7 +51,7 @@ class TypeEnv:
         self.parent = parent
 
     def set_var(self, name, typ):
-        self.vars[name] = typ
+        self.vars[name] = intern_type(typ)
 
     def set_type(self, name, fields):
         self.types[name] = fields
@@ -19,6 +59,15 @@ class TypeEnv:
     def set_func(self, name, signature):
         self.funcs[name] = signature
 
+    def has_var(self, name):
+        """Whether name is bound here or in an enclosing environment (not looked up elsewhere)."""
+        env = self
+        while env is not None:
+            if name in env.vars:
+                return True
+            env = env.parent
+        return False
+
     def get_var(self, name):
         if name in self.vars:
             return self.vars[name]
@@ -44,121 +93,168 @@ class TypeEnv:
             raise TypeError(f"Undefined function '{name}'")
 
 def check_type(node, env):
-    t = node['type']
-    if t == 'Program':
-        for stmt in node['body']:
+    if not isinstance(node, Node):
+        node = from_dict(node)
+    k = node.KIND
+    if k == PROGRAM:
+        for stmt in node.body:
             check_type(stmt, env)
-    elif t == 'VariableDeclaration':
-        val_type = infer_type(node['value'], env)
-        declared = node.get('declaredType')
-        if declared and declared != val_type:
-            raise TypeError(f"Type mismatch for {node['name']}: declared {declared}, assigned {val_type}")
-        env.set_var(node['name'], declared or val_type)
-    elif t == 'Assignment':
-        var_type = env.get_var(node['name'])
-        val_type = infer_type(node['value'], env)
-        if var_type != val_type:
-            raise TypeError(f"Cannot assign {val_type} to {node['name']} of type {var_type}")
-    elif t == 'ConstantDeclaration':
-        val_type = infer_type(node['value'], env)
-        env.set_var(node['name'], val_type)
-    elif t == 'FunctionDeclaration':
-        param_types = [p['type'] for p in node['params']]
-        env.set_func(node['name'], (param_types, node['returnType']))
+    elif k == VARIABLE_DECLARATION:
+        val_type = infer_type(node.value, env)
+        declared = node.declaredType and intern_type(node.declaredType)
+        if declared and declared is not val_type:
+            raise TypeError(f"Type mismatch for {node.name}: declared {declared}, assigned {val_type}")
+        env.set_var(node.name, declared or val_type)
+    elif k == ASSIGNMENT:
+        var_type = intern_type(env.get_var(node.name))
+        val_type = infer_type(node.value, env)
+        if var_type is not val_type:
+            raise TypeError(f"Cannot assign {val_type} to {node.name} of type {var_type}")
+    elif k == CONSTANT_DECLARATION:
+        val_type = infer_type(node.value, env)
+        env.set_var(node.name, val_type)
+    elif k == FUNCTION_DECLARATION:
+        param_types = [p.type for p in node.params]
+        env.set_func(node.name, (param_types, node.returnType))
         local_env = TypeEnv(env)
-        for param in node['params']:
-            local_env.set_var(param['name'], param['type'])
-        for stmt in node['body']:
+        for param in node.params:
+            local_env.set_var(param.name, param.type)
+        for stmt in node.body:
             check_type(stmt, local_env)
-    elif t == 'TypeDeclaration':
-        fields = {f['name']: f['type'] for f in node['fields']}
-        env.set_type(node['name'], fields)
-    elif t == 'IfStatement':
-        for when in node['whens']:
-            cond_type = infer_type(when['condition'], env)
-            if cond_type != 'drop':
+    elif k == TYPE_DECLARATION:
+        fields = {f.name: f.type for f in node.fields}
+        env.set_type(node.name, fields)
+    elif k == IF_STATEMENT:
+        for when in node.whens:
+            cond_type = infer_type(when.condition, env)
+            if cond_type is not DROP:
                 raise TypeError("If condition must be drop (boolean), got " + cond_type)
-            for stmt in when['body']:
+            for stmt in when.body:
                 check_type(stmt, env)
-        if node['otherwise']:
-            for stmt in node['otherwise']['body']:
+        if node.otherwise:
+            for stmt in node.otherwise.body:
                 check_type(stmt, env)
-    elif t == 'CycleStatement':
-        coll_type = infer_type(node['collection'], env)
-        if not coll_type.startswith('['):
+    elif k == CYCLE_STATEMENT:
+        coll_type = infer_type(node.collection, env)
+        if coll_type.element is None:
             raise TypeError("Can only cycle through lists, got " + coll_type)
-        elem_type = coll_type[1:-1]
         local_env = TypeEnv(env)
-        local_env.set_var(node['element'], elem_type)
-        for stmt in node['body']:
+        local_env.set_var(node.element, coll_type.element)
+        for stmt in node.body:
             check_type(stmt, local_env)
-    elif t == 'TryCatchStatement':
+    elif k == TRY_CATCH_STATEMENT:
         try_env = TypeEnv(env)
-        for stmt in node['tryBlock']:
+        for stmt in node.tryBlock:
             check_type(stmt, try_env)
         catch_env = TypeEnv(env)
-        catch_env.set_var(node['errVar'], 'Turbulence')
-        for stmt in node['catchBlock']:
+        catch_env.set_var(node.errVar, TURBULENCE)
+        for stmt in node.catchBlock:
             check_type(stmt, catch_env)
-    elif t == 'ThrowStatement':
-        val_type = infer_type(node['value'], env)
-        if val_type != 'rivulet':
+    elif k == THROW_STATEMENT:
+        val_type = infer_type(node.value, env)
+        if val_type is not RIVULET:
             raise TypeError("Turbulence/error must be rivulet (string)")
-    elif t == 'ReturnStatement':
-        infer_type(node['value'], env)
-    elif t == 'ExpressionStatement':
-        infer_type(node['expression'], env)
-    elif t == 'ImportStatement':
+    elif k == RETURN_STATEMENT:
+        infer_type(node.value, env)
+    elif k == EXPRESSION_STATEMENT:
+        infer_type(node.expression, env)
+    elif k == IMPORT_STATEMENT:
         pass
     else:
-        raise TypeError(f"Unknown node type: {t}")
+        raise TypeError(f"Unknown node type: {node.TYPE}")
+
+# Kinds whose type never depends on the environment.
+LITERAL_TYPES = {NUMBER_LITERAL: DEPTH, STRING_LITERAL: RIVULET, BOOLEAN_LITERAL: DROP, MAP_LITERAL: MAP}
 
 def infer_type(expr, env):
-    t = expr['type']
-    if t == 'NumberLiteral':
-        return 'depth'
-    if t == 'StringLiteral':
-        return 'rivulet'
-    if t == 'BooleanLiteral':
-        return 'drop'
-    if t == 'ListLiteral':
-        if not expr['elements']:
-            return '[Any]'
-        etype = infer_type(expr['elements'][0], env)
-        for el in expr['elements']:
-            if infer_type(el, env) != etype:
+    """The Type of expr, remembered on the node when it does not depend on env."""
+    if not isinstance(expr, Node):
+        expr = from_dict(expr)
+    if expr.inferred is not None:
+        return expr.inferred
+    k = expr.KIND
+    literal = LITERAL_TYPES.get(k)
+    if literal is not None:
+        expr.inferred = literal
+        return literal
+    if k == BINARY_EXPR:
+        left = expr.left
+        right = expr.right
+        typ = _binary_type(expr.operator, infer_type(left, env), infer_type(right, env))
+        if left.inferred is not None and right.inferred is not None:
+            expr.inferred = typ
+        return typ
+    if k == IDENTIFIER:
+        return intern_type(env.get_var(expr.value))
+    if k == LIST_LITERAL:
+        elements = expr.elements
+        if not elements:
+            expr.inferred = ANY_LIST
+            return ANY_LIST
+        etype = infer_type(elements[0], env)
+        closed = elements[0].inferred is not None
+        for el in elements:
+            # Literal tables are the common case: skip the call for them.
+            el_type = el.inferred
+            if el_type is None:
+                el_type = LITERAL_TYPES.get(el.KIND)
+                if el_type is None:
+                    el_type = infer_type(el, env)
+                    closed = closed and el.inferred is not None
+            if el_type is not etype:
                 raise TypeError("List elements must have same type")
-        return f'[{etype}]'
-    if t == 'MapLiteral':
-        return 'map'
-    if t == 'Identifier':
-        return env.get_var(expr['value'])
-    if t == 'FunctionCall':
-        sig = env.get_func(expr['name'])
-        args = expr.get('args', [])
-        if len(args) != len(sig[0]):
-            raise TypeError(f"Function {expr['name']} expects {len(sig[0])} args, got {len(args)}")
+        typ = list_of(etype)
+        if closed:
+            expr.inferred = typ
+        return typ
+    if k == FUNCTION_CALL:
+        sig = env.get_func(expr.name)
+        params = sig[0]
+        args = expr.args or []
+        # Builtins may end with optional params, typed with a trailing '?'.
+        if len(args) != len(params) and not (len(args) < len(params) and params[len(args)].endswith('?')):
+            required = sum(1 for param in params if not param.endswith('?'))
+            expected = len(params) if required == len(params) else f"{required} to {len(params)}"
+            raise TypeError(f"Function {expr.name} expects {expected} args, got {len(args)}")
         for ix, arg in enumerate(args):
             arg_type = infer_type(arg, env)
-            if arg_type != sig[0][ix]:
-                raise TypeError(f"Function {expr['name']} arg {ix+1} expects {sig[0][ix]}, got {arg_type}")
-        return sig[1]
-    if t == 'BinaryExpr':
-        ltype = infer_type(expr['left'], env)
-        rtype = infer_type(expr['right'], env)
-        op = expr['operator']
-        if op in ("+", "-", "*", "/"):
-            if ltype != rtype or ltype not in ("depth",):
-                raise TypeError(f"Operator {op} expects depth, got {ltype}, {rtype}")
-            return "depth"
-        if op in ("==", "!=", "<", "<=", ">", ">="):
-            if ltype != rtype:
-                raise TypeError(f"Comparison between {ltype} and {rtype}")
-            return "drop"
-        if op in ("&&", "||"):
-            if ltype != "drop" or rtype != "drop":
-                raise TypeError(f"Logical operator {op} expects drop, got {ltype}, {rtype}")
-            return "drop"
-    if t == 'Pattern':
-        return expr['asType']
-    raise TypeError(f"Cannot infer type for {t}")
+            param = params[ix].rstrip('?')
+            if arg_type != param and not _accepts(param, arg_type):
+                raise TypeError(f"Function {expr.name} arg {ix+1} expects {param}, got {arg_type}")
+        return intern_type(sig[1])
+    if k == PATTERN:
+        env.get_type(expr.asType)
+        return intern_type(expr.asType)
+    raise TypeError(f"Cannot infer type for {expr.TYPE}")
+
+def _accepts(param, arg_type):
+    """Whether arg_type may be passed for a builtin's param: Any takes anything, and [Any] stands for any list."""
+    if param == 'Any':
+        return True
+    param = intern_type(param)
+    return param.element is not None and arg_type.element is not None and ANY_LIST in (param, arg_type)
+
+def _binary_type(op, ltype, rtype):
+    if op in ("+", "-", "*", "/"):
+        if ltype is rtype is DEPTH:
+            return DEPTH
+        # + joins two lists of the same element type ([Any] is the empty list).
+        if op == "+" and ltype.element is not None and rtype.element is not None:
+            if ltype is rtype or rtype is ANY_LIST:
+                return ltype
+            if ltype is ANY_LIST:
+                return rtype
+        # Arithmetic on [depth] basins is element-wise, against a depth or a basin.
+        if DEPTH_LIST in (ltype, rtype) and {ltype, rtype} <= {DEPTH, DEPTH_LIST}:
+            if op != "+" or DEPTH in (ltype, rtype):
+                return DEPTH_LIST
+        raise TypeError(f"Operator {op} expects depth, got {ltype}, {rtype}")
+    if op in ("==", "!=", "<", "<=", ">", ">="):
+        if ltype is not rtype:
+            raise TypeError(f"Comparison between {ltype} and {rtype}")
+        return DROP
+    if op in ("&&", "||"):
+        if ltype is not DROP or rtype is not DROP:
+            raise TypeError(f"Logical operator {op} expects drop, got {ltype}, {rtype}")
+        return DROP
+    raise TypeError("Cannot infer type for BinaryExpr")
@@ -0,0 +1,436 @@
+# Register-based bytecode VM for Cascade.
+# Compiles the AST into fixed-width instructions stored in an array('l')
+# stream with a per-code-object constant pool, then runs them in a single
+# dispatch loop. Temporaries live in frame registers; variables keep the
+# interpreter's Env scoping so both engines observe identical semantics.
+
+from array import array
+from compiler.ast_nodes import (
+    ASSIGNMENT, BINARY_EXPR, BOOLEAN_LITERAL, CONSTANT_DECLARATION, CYCLE_STATEMENT, EXPRESSION_STATEMENT,
+    FUNCTION_CALL, FUNCTION_DECLARATION, IDENTIFIER, IF_STATEMENT, IMPORT_STATEMENT, LIST_LITERAL,
+    MAP_LITERAL, NUMBER_LITERAL, RETURN_STATEMENT, STRING_LITERAL, THROW_STATEMENT, TRY_CATCH_STATEMENT,
+    TYPE_DECLARATION, VARIABLE_DECLARATION, as_node,
+)
+from compiler.interpreter import Env, CascadeRuntimeError, ReturnSignal, list_arithmetic
+
+# Every instruction is four machine ints: opcode, a, b, c.
+INSTR_WIDTH = 4
+
+OPCODES = [
+    'LOAD_NAME',      # a=dst, b=name const
+    'STORE_NAME',     # a=src, b=name const
+    'MOVE',           # a=dst, b=src
+    'ADD', 'SUB', 'MUL', 'DIV',
+    'EQ', 'NE', 'LT', 'LE', 'GT', 'GE',
+    'AND', 'OR',      # a=dst, b=lhs, c=rhs
+    'BUILD_LIST',     # a=dst, b=first reg, c=count
+    'BUILD_MAP',      # a=dst, b=first reg, c=keys const
+    'CALL',           # a=dst, b=first arg reg, c=(name, argc) const
+    'JUMP',           # a=target
+    'JUMP_IF_FALSE',  # a=cond reg, b=target
+    'GET_ITER',       # a=dst, b=src
+    'FOR_ITER',       # a=iterator reg, b=element name const, c=target when exhausted
+    'END_CYCLE',      # a=FOR_ITER target
+    'PUSH_SCOPE',
+    'POP_SCOPE',
+    'SETUP_TRY',      # a=handler target, b=error reg
+    'POP_TRY',
+    'THROW',          # a=src
+    'RETURN',         # a=src
+    'MAKE_FUNCTION',  # a=function code const
+    'DECLARE_TYPE',   # a=(name, fields) const
+    'FAIL',           # a=message const
+    'HALT',
+]
+for _ix, _name in enumerate(OPCODES):
+    globals()[_name] = _ix
+
+BINARY_OPCODES = {
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV,
+    '==': EQ, '!=': NE, '<': LT, '<=': LE, '>': GT, '>=': GE,
+    '&&': AND, '||': OR,
+}
+
+# Operand slots (1..3) holding register numbers, per opcode.
+REG_SLOTS = {op: (1, 2, 3) for op in BINARY_OPCODES.values()}
+REG_SLOTS.update({
+    LOAD_NAME: (1,), STORE_NAME: (1,), MOVE: (1, 2),
+    BUILD_LIST: (1, 2), BUILD_MAP: (1, 2), CALL: (1, 2),
+    JUMP_IF_FALSE: (1,), GET_ITER: (1, 2), FOR_ITER: (1,),
+    SETUP_TRY: (2,), THROW: (1,), RETURN: (1,),
+})
+
+# Constants are addressable as registers (as in Lua's RK operands): the frame
+# holds the temporaries followed by a copy of the constant pool. While
+# compiling, constant operands are tagged with CONST_BASE and relocated past
+# the temporaries once their count is known.
+CONST_BASE = 1 << 24
+
+class CodeObject:
+    """Compiled bytecode for a program or pool body."""
+    __slots__ = ('name', 'instructions', 'constants', 'num_registers', 'params',
+                 'is_function', 'frame', 'decoded')
+
+    def __init__(self, name, instructions, constants, num_registers, params=(), is_function=False):
+        self.name = name
+        self.instructions = instructions
+        self.constants = constants
+        self.num_registers = num_registers
+        self.params = params
+        self.is_function = is_function
+        # Initial register file: temporaries, then the constant pool.
+        self.frame = [None] * num_registers + list(constants)
+        # Instructions predecoded into tuples; the dispatch loop indexes these.
+        self.decoded = tuple(tuple(instructions[ix:ix + INSTR_WIDTH])
+                             for ix in range(0, len(instructions), INSTR_WIDTH))
+
+class BytecodeCompiler:
+    """Compiles one program or pool body into a CodeObject."""
+    def __init__(self, name='<program>', params=(), is_function=False):
+        self.name = name
+        self.params = params
+        self.is_function = is_function
+        self.code = array('l')
+        self.constants = []
+        self.const_index = {}
+        self.next_reg = 0
+        self.max_reg = 0
+
+    def const(self, value):
+        """Intern value in the constant pool and return its index."""
+        key = (type(value), value) if isinstance(value, (int, float, str, bool, tuple)) else None
+        if key is not None and key in self.const_index:
+            return self.const_index[key]
+        self.constants.append(value)
+        ix = len(self.constants) - 1
+        if key is not None:
+            self.const_index[key] = ix
+        return ix
+
+    def const_reg(self, value):
+        """Return the (not yet relocated) register addressing a constant."""
+        return CONST_BASE + self.const(value)
+
+    def emit(self, op, a=0, b=0, c=0):
+        """Append an instruction and return its index."""
+        self.code.extend((op, a, b, c))
+        return len(self.code) // INSTR_WIDTH - 1
+
+    def patch(self, instr, slot, value):
+        """Backpatch operand slot (1..3) of an emitted instruction."""
+        self.code[instr * INSTR_WIDTH + slot] = value
+
+    def here(self):
+        return len(self.code) // INSTR_WIDTH
+
+    def alloc(self, count=1):
+        """Allocate consecutive temporary registers."""
+        reg = self.next_reg
+        self.next_reg += count
+        self.max_reg = max(self.max_reg, self.next_reg)
+        return reg
+
+    def finish(self):
+        """Relocate constant operands past the temporaries and build the CodeObject."""
+        code = self.code
+        for ix in range(0, len(code), INSTR_WIDTH):
+            for slot in REG_SLOTS.get(code[ix], ()):
+                if code[ix + slot] >= CONST_BASE:
+                    code[ix + slot] += self.max_reg - CONST_BASE
+        return CodeObject(self.name, code, tuple(self.constants), self.max_reg,
+                          self.params, self.is_function)
+
+    def compile_block(self, stmts):
+        for stmt in stmts:
+            self.compile_stmt(stmt)
+
+    def compile_stmt(self, stmt):
+        """Compile a statement. Temporaries are released once it completes."""
+        saved = self.next_reg
+        k = stmt.KIND
+        if k in (VARIABLE_DECLARATION, ASSIGNMENT, CONSTANT_DECLARATION):
+            reg = self.compile_expr(stmt.value)
+            self.emit(STORE_NAME, reg, self.const(stmt.name))
+        elif k == FUNCTION_DECLARATION:
+            params = tuple(param.name for param in stmt.params)
+            sub = BytecodeCompiler(stmt.name, params, is_function=True)
+            sub.compile_block(stmt.body)
+            sub.emit(RETURN, sub.const_reg(None))
+            self.emit(MAKE_FUNCTION, self.const(sub.finish()))
+        elif k == TYPE_DECLARATION:
+            fields = tuple((f.name, f.type) for f in stmt.fields)
+            self.emit(DECLARE_TYPE, self.const((stmt.name, fields)))
+        elif k == IF_STATEMENT:
+            exits = []
+            for when in stmt.whens:
+                cond = self.compile_expr(when.condition)
+                skip = self.emit(JUMP_IF_FALSE, cond)
+                self.next_reg = saved
+                self.compile_block(when.body)
+                exits.append(self.emit(JUMP))
+                self.patch(skip, 2, self.here())
+            if stmt.otherwise:
+                self.compile_block(stmt.otherwise.body)
+            for jump in exits:
+                self.patch(jump, 1, self.here())
+        elif k == CYCLE_STATEMENT and stmt.parallel:
+            # Partitioned execution needs the closure compiler's frames (see interpreter.py).
+            self.emit(FAIL, self.const("Parallel cycles require the interpreter engine"))
+        elif k == CYCLE_STATEMENT:
+            coll = self.compile_expr(stmt.collection)
+            self.next_reg = saved
+            it = self.alloc()
+            self.emit(GET_ITER, it, coll)
+            # FOR_ITER opens the per-element scope and END_CYCLE closes it.
+            loop = self.emit(FOR_ITER, it, self.const(stmt.element))
+            self.compile_block(stmt.body)
+            self.emit(END_CYCLE, loop)
+            self.patch(loop, 3, self.here())
+        elif k == TRY_CATCH_STATEMENT:
+            err = self.alloc()
+            setup = self.emit(SETUP_TRY, 0, err)
+            self.compile_block(stmt.tryBlock)
+            self.emit(POP_TRY)
+            done = self.emit(JUMP)
+            self.patch(setup, 1, self.here())
+            self.emit(PUSH_SCOPE)
+            self.emit(STORE_NAME, err, self.const(stmt.errVar))
+            self.compile_block(stmt.catchBlock)
+            self.emit(POP_SCOPE)
+            self.patch(done, 1, self.here())
+        elif k == THROW_STATEMENT:
+            self.emit(THROW, self.compile_expr(stmt.value))
+        elif k == RETURN_STATEMENT:
+            self.emit(RETURN, self.compile_expr(stmt.value))
+        elif k == EXPRESSION_STATEMENT:
+            self.compile_expr(stmt.expression)
+        elif k == IMPORT_STATEMENT:
+            # Channels are opened before the program runs and called through functions (see modules.py).
+            pass
+        else:
+            self.emit(FAIL, self.const(f"Unknown statement type: {stmt.TYPE}"))
+        self.next_reg = saved
+
+    def compile_expr(self, expr):
+        """Compile an expression and return the register holding its value.
+
+        Literals compile to no code at all: their constant register is returned.
+        Any other result is left in the first free temporary at entry.
+        """
+        k = expr.KIND
+        if k in (NUMBER_LITERAL, STRING_LITERAL, BOOLEAN_LITERAL):
+            return self.const_reg(expr.value)
+        if k == IDENTIFIER:
+            dst = self.alloc()
+            self.emit(LOAD_NAME, dst, self.const(expr.value))
+            return dst
+        if k == LIST_LITERAL:
+            return self.compile_sequence(BUILD_LIST, expr.elements, len(expr.elements))
+        if k == MAP_LITERAL:
+            keys = tuple(pair.key for pair in expr.pairs)
+            return self.compile_sequence(BUILD_MAP, [pair.value for pair in expr.pairs],
+                                         self.const(keys))
+        if k == FUNCTION_CALL:
+            args = (expr.args or [])
+            return self.compile_sequence(CALL, args, self.const((expr.name, len(args))))
+        if k == BINARY_EXPR:
+            op = BINARY_OPCODES.get(expr.operator)
+            if op is None:
+                self.emit(FAIL, self.const(f"Unknown operator {expr.operator}"))
+                return self.alloc()
+            base = self.next_reg
+            left = self.compile_expr(expr.left)
+            right = self.compile_expr(expr.right)
+            self.next_reg = base
+            dst = self.alloc()
+            self.emit(op, dst, left, right)
+            return dst
+        self.emit(FAIL, self.const(f"Unknown expression type: {expr.TYPE}"))
+        return self.alloc()
+
+    def compile_sequence(self, op, exprs, c):
+        """Evaluate exprs into consecutive registers and emit op over them."""
+        base = self.alloc(max(len(exprs), 1))
+        for ix, sub in enumerate(exprs):
+            self.next_reg = base + ix
+            reg = self.compile_expr(sub)
+            if reg != base + ix:
+                self.emit(MOVE, base + ix, reg)
+        self.next_reg = base + 1
+        self.emit(op, base, base, c)
+        return base
+
+class VMFunction:
+    """A user pool closed over the Env it was declared in."""
+    __slots__ = ('vm', 'code', 'env')
+
+    def __init__(self, vm, code, env):
+        self.vm = vm
+        self.code = code
+        self.env = env
+
+    def __call__(self, *args):
+        local_env = Env(self.env)
+        for ix, param in enumerate(self.code.params):
+            local_env.vars[param] = args[ix]
+        return self.vm.execute(self.code, local_env)
+
+class VM:
+    """Dispatch-loop VM sharing one function and type table per program."""
+    def __init__(self, functions=None, types=None):
+        self.functions = {} if functions is None else functions
+        self.types = {} if types is None else types
+
+    def execute(self, code, env):
+        """Run a CodeObject in env and return its RETURN value."""
+        instructions = code.decoded
+        consts = code.constants
+        functions = self.functions
+        regs = code.frame[:]
+        handlers = []
+        pc = 0
+        while True:
+            try:
+                # Opcodes are tested roughly in order of dynamic frequency.
+                while True:
+                    op, a, b, c = instructions[pc]
+                    pc += 1
+                    if op == LOAD_NAME:
+                        name = consts[b]
+                        scope = env
+                        while name not in scope.vars:
+                            scope = scope.parent
+                            if scope is None:
+                                raise CascadeRuntimeError(f"Variable '{name}' not found")
+                        regs[a] = scope.vars[name]
+                    elif op == STORE_NAME:
+                        env.vars[consts[b]] = regs[a]
+                    elif op == ADD:
+                        left, right = regs[b], regs[c]
+                        if type(left) is list or type(right) is list:
+                            regs[a] = list_arithmetic('+', left, right)
+                        else:
+                            regs[a] = left + right
+                    elif op == JUMP_IF_FALSE:
+                        if not regs[a]:
+                            pc = b
+                    elif op == FOR_ITER:
+                        try:
+                            value = next(regs[a])
+                        except StopIteration:
+                            pc = c
+                        else:
+                            env = Env(env)
+                            env.vars[consts[b]] = value
+                    elif op == END_CYCLE:
+                        env = env.parent
+                        pc = a
+                    elif op == JUMP:
+                        pc = a
+                    elif op == CALL:
+                        name, argc = consts[c]
+                        regs[a] = functions[name](*regs[b:b + argc])
+                    elif op == MOVE:
+                        regs[a] = regs[b]
+                    elif op == SUB:
+                        left, right = regs[b], regs[c]
+                        if type(left) is list or type(right) is list:
+                            regs[a] = list_arithmetic('-', left, right)
+                        else:
+                            regs[a] = left - right
+                    elif op == MUL:
+                        left, right = regs[b], regs[c]
+                        if type(left) is list or type(right) is list:
+                            regs[a] = list_arithmetic('*', left, right)
+                        else:
+                            regs[a] = left * right
+                    elif op == DIV:
+                        left, right = regs[b], regs[c]
+                        if type(left) is list or type(right) is list:
+                            regs[a] = list_arithmetic('/', left, right)
+                        else:
+                            regs[a] = left / right
+                    elif op == EQ:
+                        regs[a] = regs[b] == regs[c]
+                    elif op == NE:
+                        regs[a] = regs[b] != regs[c]
+                    elif op == LT:
+                        regs[a] = regs[b] < regs[c]
+                    elif op == LE:
+                        regs[a] = regs[b] <= regs[c]
+                    elif op == GT:
+                        regs[a] = regs[b] > regs[c]
+                    elif op == GE:
+                        regs[a] = regs[b] >= regs[c]
+                    elif op == AND:
+                        regs[a] = regs[b] and regs[c]
+                    elif op == OR:
+                        regs[a] = regs[b] or regs[c]
+                    elif op == PUSH_SCOPE:
+                        env = Env(env)
+                    elif op == POP_SCOPE:
+                        env = env.parent
+                    elif op == RETURN:
+                        if not code.is_function:
+                            raise ReturnSignal(regs[a])
+                        return regs[a]
+                    elif op == GET_ITER:
+                        regs[a] = iter(regs[b])
+                    elif op == BUILD_LIST:
+                        regs[a] = regs[b:b + c]
+                    elif op == BUILD_MAP:
+                        keys = consts[c]
+                        regs[a] = dict(zip(keys, regs[b:b + len(keys)]))
+                    elif op == SETUP_TRY:
+                        handlers.append((a, b, env))
+                    elif op == POP_TRY:
+                        handlers.pop()
+                    elif op == THROW:
+                        raise CascadeRuntimeError(str(regs[a]))
+                    elif op == MAKE_FUNCTION:
+                        fn_code = consts[a]
+                        functions[fn_code.name] = VMFunction(self, fn_code, env)
+                    elif op == DECLARE_TYPE:
+                        name, fields = consts[a]
+                        self.types[name] = dict(fields)
+                    elif op == HALT:
+                        return None
+                    elif op == FAIL:
+                        raise CascadeRuntimeError(consts[a])
+                    else:
+                        raise CascadeRuntimeError(f"Bad opcode {op} in {code.name}")
+            except CascadeRuntimeError as e:
+                if not handlers:
+                    raise
+                pc, err_reg, env = handlers.pop()
+                regs[err_reg] = str(e)
+
+def compile_program(ast):
+    """Compile a Program AST into a top-level CodeObject."""
+    compiler = BytecodeCompiler()
+    compiler.compile_block(as_node(ast).body)
+    compiler.emit(HALT)
+    return compiler.finish()
+
+def disassemble(code, indent=""):
+    """Return a human-readable listing of a CodeObject and its nested pools."""
+    lines = [f"{indent}code {code.name} (registers={code.num_registers}, params={list(code.params)})"]
+    for ix, value in enumerate(code.constants):
+        if not isinstance(value, CodeObject):
+            lines.append(f"{indent}  const r{code.num_registers + ix} = {value!r}")
+    for ix, (op, a, b, c) in enumerate(code.decoded):
+        lines.append(f"{indent}  {ix:4} {OPCODES[op]:<14} {a:4} {b:4} {c:4}")
+    for value in code.constants:
+        if isinstance(value, CodeObject):
+            lines.append(disassemble(value, indent + "  "))
+    return "\n".join(lines)
+
+def run_program(ast, functions=None):
+    """Run a Cascade program AST on the VM. Returns the final environment, functions, and types.
+
+    functions is the shared function table, as for interpreter.run_program.
+    """
+    env = Env()
+    vm = VM(functions)
+    vm.execute(compile_program(ast), env)
+    return env, vm.functions, vm.types
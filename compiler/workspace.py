@@ -0,0 +1,387 @@
+# Workspace-wide symbol index for the Cascade language server.
+# Every .casc/.pool/.filter/.res file under the workspace is scanned for its
+# top-level declarations (pools, reservoirs, pour/dam/let names) and its
+# `open channel` imports. Scanning is a tolerant, declaration-level pass over
+# the token stream: bodies are skipped by brace depth, so files using syntax
+# the full parser does not support yet still contribute their declarations.
+# Files are scanned in worker processes; the index itself lives in the server
+# and is updated per file as files change (keyed by mtime and size), so
+# requests never re-scan the workspace.
+# Module names are paths relative to the nearest directory holding a
+# fountain.config (else the workspace root), dotted and without the suffix:
+# pools/logging.pool is the channel `pools.logging`.
+
+import os
+from compiler.lexer import IDENT, OP, TokenBuffer
+from compiler.modules import CONFIG_NAME, SOURCE_SUFFIXES, module_name, read_config
+from compiler.symbols import Symbol
+
+SKIP_DIRS = frozenset(('__cascade_cache__', '__pycache__', 'node_modules'))
+
+# Files scanned per task sent to a worker process.
+INDEX_CHUNKSIZE = 8
+
+# Words that start a top-level statement; an unterminated pour/dam stops at the next one.
+STATEMENT_WORDS = frozenset(('open', 'pool', 'reservoir', 'pour', 'dam', 'let'))
+
+class FileIndex:
+    """Top-level declarations (name -> [Symbol]) and channel imports of one source file."""
+    __slots__ = ('path', 'stamp', 'symbols', 'imports')
+
+    def __init__(self, path, stamp, symbols, imports):
+        self.path = path
+        self.stamp = stamp
+        self.symbols = symbols
+        self.imports = imports
+
+def _skip_to(tokens, i, word):
+    """(found, index just past it) for the next IDENT word at bracket nesting 0."""
+    line = tokens.lines[i]
+    nesting = 0
+    while tokens.fill(i):
+        if tokens.kinds[i] == OP:
+            ch = tokens.code[tokens.starts[i]]
+            if ch in '([{':
+                nesting += 1
+            elif ch in ')]}':
+                if nesting == 0:
+                    return False, i
+                nesting -= 1
+        elif nesting == 0:
+            if tokens.matches(i, IDENT, word):
+                return True, i + 1
+            if tokens.lines[i] != line and tokens.value(i) in STATEMENT_WORDS:
+                return False, i
+        i += 1
+    return False, i
+
+def _type_at(tokens, i):
+    """(type text, next index) for a type annotation like depth or [WaterSample], else (None, i)."""
+    if tokens.matches(i, IDENT):
+        return tokens.value(i), i + 1
+    if tokens.matches(i, OP, '[') and tokens.matches(i + 1, IDENT) and tokens.matches(i + 2, OP, ']'):
+        return f"[{tokens.value(i + 1)}]", i + 3
+    return None, i
+
+def _declare(symbols, name, kind, detail, span):
+    symbols.setdefault(name, []).append(Symbol(name, kind, detail, span, None))
+
+def _scan_open(tokens, i, symbols, imports):
+    if not tokens.matches(i + 1, IDENT, 'channel') or not tokens.matches(i + 2, IDENT):
+        return i + 1
+    i += 2
+    parts = [tokens.value(i)]
+    while (tokens.matches(i + 1, OP, '.') or tokens.matches(i + 1, OP, '/')) and tokens.matches(i + 2, IDENT):
+        parts.append(tokens.value(i + 2))
+        i += 2
+    imports.append('.'.join(parts))
+    return i + 1
+
+def _scan_pool(tokens, i, symbols, imports):
+    first = i
+    if not tokens.matches(i + 1, IDENT) or not tokens.matches(i + 2, OP, '('):
+        return i + 1
+    name = tokens.value(i + 1)
+    i += 3
+    params = []
+    while tokens.matches(i, IDENT) and tokens.matches(i + 1, OP, ':'):
+        pname = tokens.value(i)
+        ptype, i = _type_at(tokens, i + 2)
+        params.append(f"{pname}:{ptype}")
+        if not tokens.matches(i, OP, ','):
+            break
+        i += 1
+    if not tokens.matches(i, OP, ')'):
+        return i
+    last = i
+    detail = f"({', '.join(params)})"
+    if tokens.matches(i + 1, OP, ':'):
+        rtype, after = _type_at(tokens, i + 2)
+        if rtype is not None:
+            detail += f":{rtype}"
+            last = after - 1
+    _declare(symbols, name, 'pool', detail, tokens.span(first, last))
+    return last + 1
+
+def _scan_reservoir(tokens, i, symbols, imports):
+    first = i
+    if not tokens.matches(i + 1, IDENT):
+        return i + 1
+    name = tokens.value(i + 1)
+    fields = []
+    j = i + 2
+    if tokens.matches(j, OP, '{'):
+        j += 1
+        while tokens.matches(j, IDENT) and tokens.matches(j + 1, OP, ':'):
+            fname = tokens.value(j)
+            ftype, j = _type_at(tokens, j + 2)
+            fields.append(f"{fname}:{ftype}")
+            if tokens.matches(j, OP, ','):
+                j += 1
+        if tokens.matches(j, OP, '}'):
+            _declare(symbols, name, 'type', f"{{{', '.join(fields)}}}", tokens.span(first, j))
+            return j + 1
+    # Malformed body: declare the name and let the caller track the braces.
+    _declare(symbols, name, 'type', None, tokens.span(first, i + 1))
+    return i + 2
+
+def _scan_named_value(word, kind):
+    def scan_value(tokens, i, symbols, imports):
+        first = i
+        found, i = _skip_to(tokens, i + 1, word)
+        if not found or not tokens.matches(i, IDENT):
+            return i
+        name = tokens.value(i)
+        last = i
+        detail = None
+        if tokens.matches(i + 1, OP, ':'):
+            detail, after = _type_at(tokens, i + 2)
+            if detail is not None:
+                last = after - 1
+        _declare(symbols, name, kind, detail, tokens.span(first, last))
+        return last + 1
+    return scan_value
+
+def _scan_let(tokens, i, symbols, imports):
+    if not tokens.matches(i + 1, IDENT):
+        return i + 1
+    _declare(symbols, tokens.value(i + 1), 'variable', None, tokens.span(i, i + 1))
+    return i + 2
+
+SCANNERS = {
+    'open': _scan_open,
+    'pool': _scan_pool,
+    'reservoir': _scan_reservoir,
+    'pour': _scan_named_value('into', 'variable'),
+    'dam': _scan_named_value('as', 'constant'),
+    'let': _scan_let,
+}
+
+def scan_declarations(code):
+    """(symbols by name, imported channel names) declared at the top level of code.
+
+    Spans use the parser's coordinates (1-based lines). A lexing error ends the
+    scan; declarations before it are kept.
+    """
+    tokens = TokenBuffer(code)
+    symbols, imports = {}, []
+    depth = i = 0
+    try:
+        while tokens.fill(i):
+            if tokens.kinds[i] == OP:
+                ch = code[tokens.starts[i]]
+                if ch == '{':
+                    depth += 1
+                elif ch == '}' and depth:
+                    depth -= 1
+                i += 1
+            elif depth or tokens.kinds[i] != IDENT:
+                i += 1
+            else:
+                scanner = SCANNERS.get(tokens.value(i))
+                i = scanner(tokens, i, symbols, imports) if scanner else i + 1
+    except RuntimeError:
+        pass
+    return symbols, imports
+
+def file_stamp(path):
+    """(mtime_ns, size) of path, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def index_file(path):
+    """FileIndex for a source on disk, or None if it cannot be read. Runs in worker processes."""
+    stamp = file_stamp(path)
+    if stamp is None:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    symbols, imports = scan_declarations(code)
+    return FileIndex(path, stamp, symbols, imports)
+
+def index_files(paths):
+    """index_file for each of paths; one worker task per batch."""
+    return [index_file(path) for path in paths]
+
+def qualified_name_at(text, col):
+    """(qualifier or None, name) of the dotted identifier around col in a line, e.g. ('logging', 'warn')."""
+    start = col
+    while start > 0 and (text[start - 1].isalnum() or text[start - 1] in '_.'):
+        start -= 1
+    end = col
+    while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+        end += 1
+    qualifier, _, name = text[start:end].strip('.').rpartition('.')
+    return qualifier or None, name
+
+class WorkspaceIndex:
+    """Cross-file index of top-level declarations, kept current file by file.
+
+    files maps each indexed path to its FileIndex; modules maps
+    (project root, channel name) to a path; configs holds each project's
+    fountain.config. Reservoir (.res) files are visible throughout their
+    project; other modules are visible where they are opened as channels or
+    listed under "channels" in fountain.config.
+    """
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.files = {}
+        self.modules = {}
+        self.configs = {}
+        self.reservoirs = {}
+
+    def discover(self):
+        """Yield every source file and fountain.config under the workspace root."""
+        for directory, dirs, names in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS)
+            for name in sorted(names):
+                if name == CONFIG_NAME or name.endswith(SOURCE_SUFFIXES):
+                    yield os.path.join(directory, name)
+
+    def project_of(self, path):
+        """Root of the project holding path: the nearest fountain.config directory, else the workspace root."""
+        directory = os.path.dirname(path)
+        while directory not in self.configs:
+            parent = os.path.dirname(directory)
+            if len(directory) <= len(self.root) or parent == directory:
+                return self.root
+            directory = parent
+        return directory
+
+    def stale(self, paths):
+        """The source paths among paths whose indexed entry is missing or out of date."""
+        return [path for path in paths
+                if path.endswith(SOURCE_SUFFIXES)
+                and (path not in self.files or self.files[path].stamp != file_stamp(path))]
+
+    def prepare(self, present):
+        """Given the paths discover() found, drop vanished files and load configs.
+
+        Returns the sources that still need scanning.
+        """
+        found = set(present)
+        for path in [path for path in self.files if path not in found]:
+            self.remove(path)
+        for project in [project for project in self.configs if os.path.join(project, CONFIG_NAME) not in found]:
+            self.set_config(project, None)
+        for path in present:
+            if os.path.basename(path) == CONFIG_NAME:
+                self.set_config(os.path.dirname(path), read_config(path))
+        return self.stale(present)
+
+    def refresh(self, executor=None):
+        """Bring the whole index in line with the disk; returns the number of files scanned.
+
+        With an executor (e.g. a ProcessPoolExecutor) files are scanned in its workers.
+        """
+        stale = self.prepare(list(self.discover()))
+        if executor is None:
+            results = map(index_file, stale)
+        else:
+            results = executor.map(index_file, stale, chunksize=INDEX_CHUNKSIZE)
+        for path, entry in zip(stale, results):
+            self.update(path, entry)
+        return len(stale)
+
+    def changed(self, path, deleted=False):
+        """Note that path changed on disk; True if it is a source to re-scan (see update)."""
+        if os.path.basename(path) == CONFIG_NAME:
+            self.set_config(os.path.dirname(path), None if deleted else read_config(path))
+            return False
+        if not path.endswith(SOURCE_SUFFIXES):
+            return False
+        if deleted:
+            self.remove(path)
+            return False
+        return True
+
+    def set_config(self, project, config):
+        """Record (or, with None, drop) a project's fountain.config and re-key module names."""
+        if config is None:
+            if self.configs.pop(project, None) is None:
+                return
+        else:
+            known = project in self.configs
+            self.configs[project] = config
+            if known:
+                return
+        entries = list(self.files.values())
+        self.files, self.modules, self.reservoirs = {}, {}, {}
+        for entry in entries:
+            self._add(entry)
+
+    def update(self, path, entry):
+        """Replace the entry for path with a FileIndex from index_file (None drops it)."""
+        self.remove(path)
+        if entry is not None:
+            self._add(entry)
+
+    def _add(self, entry):
+        project = self.project_of(entry.path)
+        self.files[entry.path] = entry
+        self.modules[(project, module_name(project, entry.path))] = entry.path
+        if entry.path.endswith('.res'):
+            self.reservoirs.setdefault(project, set()).add(entry.path)
+
+    def remove(self, path):
+        if self.files.pop(path, None) is None:
+            return
+        project = self.project_of(path)
+        key = (project, module_name(project, path))
+        if self.modules.get(key) == path:
+            del self.modules[key]
+        self.reservoirs.get(project, set()).discard(path)
+
+    def visible(self, path, imports=None):
+        """(channel name, path) of every module visible from path, in lookup order.
+
+        imports defaults to the channels path opened when it was last indexed.
+        """
+        project = self.project_of(path)
+        if imports is None:
+            entry = self.files.get(path)
+            imports = entry.imports if entry is not None else ()
+        names = list(imports)
+        for channel in self.configs.get(project, {}).get('channels', ()):
+            if isinstance(channel, str):
+                names.append(module_name(project, os.path.join(project, channel)))
+        seen = {path}
+        found = []
+        for name in names:
+            target = self.modules.get((project, name))
+            if target is not None and target not in seen:
+                seen.add(target)
+                found.append((name, target))
+        for target in sorted(self.reservoirs.get(project, ())):
+            if target not in seen:
+                seen.add(target)
+                found.append((module_name(project, target), target))
+        return found
+
+    def definition(self, path, name, qualifier=None, imports=None):
+        """(path, Symbol) for name as seen from path, or (None, None).
+
+        A qualifier (the `logging` in logging.warn) restricts the search to
+        channels whose name is, or ends with, it.
+        """
+        for channel, target in self.visible(path, imports):
+            if qualifier is not None and channel != qualifier and not channel.endswith('.' + qualifier):
+                continue
+            symbols = self.files[target].symbols.get(name)
+            if symbols:
+                return target, symbols[-1]
+        return None, None
+
+    def completions(self, path, imports=None):
+        """name -> (path, Symbol) for every declaration visible from path through its channels."""
+        visible = {}
+        for _, target in self.visible(path, imports):
+            for name, symbols in self.files[target].symbols.items():
+                visible.setdefault(name, (target, symbols[-1]))
+        return visible
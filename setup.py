@@ -13,6 +13,9 @@ setup(
     install_requires=[
         "pygls", # Required for LSP server
     ],
+    extras_require={
+        "numpy": ["numpy"], # Vectorized [depth] basins; array('d') is used without it
+    },
     entry_points={
         'console_scripts': [
             'cascade=compiler.cli:main'
@@ -0,0 +1,43 @@
+# Tests for the typed AST nodes and their dict bridge
+
+import pytest
+from compiler.ast_nodes import (NODE_CLASSES, NUMBER_LITERAL, FunctionDeclaration, NumberLiteral,
+                                Param, VariableDeclaration, as_node, from_dict, to_dict)
+from compiler.parser import parse_cascade
+from benchmarks.programs import call_program, loop_program
+
+def test_dict_round_trip():
+    for ast in (loop_program(5), call_program(5)):
+        nodes = from_dict(ast)
+        assert to_dict(nodes) == ast
+        assert from_dict(to_dict(nodes)) == nodes
+        assert as_node(nodes) is nodes
+
+def test_kinds_are_distinct_and_slotted():
+    assert sorted(cls.KIND for cls in NODE_CLASSES.values()) == list(range(len(NODE_CLASSES)))
+    node = NumberLiteral(1.0)
+    assert node.KIND == NUMBER_LITERAL
+    assert not hasattr(node, '__dict__')
+    with pytest.raises(AttributeError):
+        node.extra = 1
+
+def test_parser_builds_nodes():
+    ast = parse_cascade("pour 3 into x:depth\npool f(a:depth):depth { pour 1 into y }\n")
+    decl, func = ast.body
+    assert decl == VariableDeclaration('x', NumberLiteral(3.0), 'depth')
+    assert isinstance(func, FunctionDeclaration)
+    assert func.params == [Param('a', 'depth')]
+
+def test_mapping_access_for_dict_consumers():
+    func = from_dict(call_program(1))['body'][0]
+    assert func['type'] == 'FunctionDeclaration'
+    assert func.get('name') == 'clamp'
+    assert func['params'][0]['type'] == 'depth'
+    assert 'returnType' in func and 'missing' not in func
+    assert func.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        func['missing']
+
+def test_unknown_node_type():
+    with pytest.raises(ValueError):
+        from_dict({'type': 'Waterfall'})
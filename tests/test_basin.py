@@ -0,0 +1,93 @@
+# Tests for packed [depth] basins and columnar reservoir basins
+
+from array import array
+import pytest
+from compiler.basin import DepthBasin, ReservoirBasin, pack
+import compiler.stdlib as stdlib
+from compiler.interpreter import run_program
+from compiler.type_checker import infer_type, TypeEnv, TypeError
+from benchmarks.programs import num, ident, binop, pour, program
+
+def basins(values):
+    """The same values in every available representation."""
+    yield DepthBasin(array('d', values))
+    yield DepthBasin(pack(values))
+
+def test_behaves_like_a_list():
+    for b in basins([3.0, 1.0, 2.0]):
+        assert b == [3, 1, 2] and [3, 1, 2] == b
+        assert b != [3, 1]
+        assert len(b) == 3 and list(b) == [3.0, 1.0, 2.0]
+        assert b[1] == 1.0 and b[-1] == 2.0 and b[1:] == [1.0, 2.0]
+        assert 2.0 in b and "x" not in b
+        assert repr(b) == "[3.0, 1.0, 2.0]"
+        assert not DepthBasin(array('d'))
+
+def test_concatenation_keeps_packing():
+    for b in basins([1.0, 2.0]):
+        joined = b + [3.0]
+        assert isinstance(joined, DepthBasin) and joined == [1, 2, 3]
+        assert isinstance([0.0] + b, DepthBasin) and [0.0] + b == [0, 1, 2]
+        assert b + b == [1, 2, 1, 2]
+        mixed = b + ["x"]
+        assert isinstance(mixed, list) and mixed == [1.0, 2.0, "x"]
+        assert b == [1, 2]
+
+def test_elementwise_arithmetic():
+    for b in basins([1.0, 2.0, 4.0]):
+        assert b * 2 == [2, 4, 8]
+        assert 1 + b == [2, 3, 5] and b + 1 == [2, 3, 5]
+        assert 8 / b == [8, 4, 2] and b - b == [0, 0, 0]
+        try:
+            b / 0
+            assert False, "Expected ZeroDivisionError"
+        except ZeroDivisionError:
+            pass
+
+def test_stdlib_reductions_on_basins():
+    for b in basins([5.0, 1.0, 3.0]):
+        assert stdlib.sum_basin(b) == 9.0
+        assert stdlib.avg_basin(b) == 3.0
+        assert stdlib.max_basin(b) == 5.0
+        assert stdlib.min_basin(b) == 1.0
+        assert stdlib.sort_basin(b) == [1, 3, 5]
+        assert stdlib.measure(b) == 3
+
+def test_interpreter_packs_depth_literals():
+    nums = {'type': 'ListLiteral', 'elements': [num(1), num(2), num(3)]}
+    env, _, _ = run_program(program(pour('nums', nums), pour('scaled', binop('*', ident('nums'), num(2)))))
+    assert isinstance(env.get('nums'), DepthBasin)
+    assert env.get('scaled') == [2, 4, 6]
+
+def test_basin_arithmetic_types():
+    env = TypeEnv()
+    env.set_var('xs', '[depth]')
+    env.set_var('names', '[rivulet]')
+    assert infer_type(binop('*', ident('xs'), num(2)), env) == '[depth]'
+    assert infer_type(binop('+', ident('xs'), ident('xs')), env) == '[depth]'
+    assert infer_type(binop('+', ident('names'), {'type': 'ListLiteral', 'elements': []}), env) == '[rivulet]'
+    try:
+        infer_type(binop('*', ident('names'), num(2)), env)
+        assert False, "Expected TypeError"
+    except TypeError:
+        pass
+
+SAMPLE = {'site': 'rivulet', 'ph': 'depth', 'ok': 'drop'}
+
+def test_reservoir_basin_is_columnar():
+    rows = [{'site': 'North', 'ph': 7.0, 'ok': True}, {'site': 'South', 'ph': 6.5, 'ok': False},
+            {'site': 'North', 'ph': 8.0, 'ok': True}]
+    samples = ReservoirBasin.from_chunks(SAMPLE, [rows[:2], rows[2:]])
+    assert samples == rows and len(samples) == 3 and stdlib.measure(samples) == 3
+    assert samples[-1]['ph'] == 8.0 and dict(samples[1]) == rows[1] and samples[1:] == rows[1:]
+    assert samples.columns['site'][0] is samples.columns['site'][2]
+    ph = stdlib.field_basin(samples, 'ph')
+    assert isinstance(ph, DepthBasin) and ph.data is samples.columns['ph']
+    assert stdlib.stats_basin(ph)['max'] == 8.0
+    assert stdlib.field_basin(rows, 'site') == stdlib.field_basin(samples, 'site') == ['North', 'South', 'North']
+    assert ([] + samples) is samples
+    joined = samples + samples
+    assert isinstance(joined, ReservoirBasin) and joined == rows + rows
+    assert samples + [rows[0]] == rows + [rows[0]]
+    with pytest.raises(ValueError, match="field 'ok'"):
+        ReservoirBasin.from_records(SAMPLE, [{'site': 'x', 'ph': 1.0}])
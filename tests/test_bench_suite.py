@@ -0,0 +1,25 @@
+# Tests for the benchmark suite and its baseline comparison
+
+from benchmarks.suite import cases, compare, main, run_suite
+
+def test_every_stage_is_timed():
+    names = [name for name, _, _ in cases()]
+    assert len(names) == len(set(names))
+    stages = {name.split('.')[0] for name in names}
+    assert stages == {'tokenize', 'parse', 'check_type', 'analyze_semantics', 'run_program', 'vm_run_program',
+                      'stdlib'}
+    assert 'run_program.append' in names and 'vm_run_program.append' in names
+    result = run_suite(scale=0.001, repeat=1)
+    assert set(result['results']) == set(names) and result['scale'] == 0.001
+    assert all(timing['best'] >= 0 for timing in result['results'].values())
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    baseline = {'results': {'a': {'best': 1.0}, 'b': {'best': 1.0}, 'gone': {'best': 1.0}}}
+    current = {'results': {'a': {'best': 1.2}, 'b': {'best': 1.5}, 'new': {'best': 9.0}}}
+    assert compare(current, baseline) == [('b', 1.0, 1.5, 1.5)]
+    assert compare(current, baseline, tolerance=0.6) == []
+    path = str(tmp_path / "baseline.json")
+    assert main(["--scale", "0.001", "--repeat", "1", "--filter", "tokenize", "--output", path]) == 0
+    assert main(["--scale", "0.001", "--repeat", "1", "--filter", "tokenize", "--compare", path,
+                 "--tolerance", "1000"]) == 0
+    assert "No case slower" in capsys.readouterr().out
@@ -0,0 +1,41 @@
+# Tests for the persistent compilation cache
+
+import os
+import compiler.cache as cache_module
+from compiler.cache import CompilationCache
+from compiler.parser import parse_cascade
+
+CODE = "pour 3.14 into pi:depth\n"
+
+def test_round_trip_and_counts(tmp_path):
+    source = tmp_path / "prog.casc"
+    source.write_text(CODE)
+    cache = CompilationCache()
+    assert cache.load(str(source), CODE) is None
+    ast = parse_cascade(CODE)
+    cache.store(str(source), CODE, ast)
+    assert os.listdir(tmp_path / "__cascade_cache__")
+    assert cache.load(str(source), CODE) == ast
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_invalidation(tmp_path, monkeypatch):
+    cache = CompilationCache(str(tmp_path / "cache"))
+    cache.store("prog.casc", CODE, parse_cascade(CODE))
+    assert cache.load("prog.casc", CODE + "pour 1 into x\n") is None
+    monkeypatch.setattr(cache_module, "_compiler_fingerprint", "other-compiler")
+    assert cache.load("prog.casc", CODE) is None
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = CompilationCache(str(tmp_path))
+    with open(cache.entry_path("prog.casc", CODE), "wb") as f:
+        f.write(b"\x00garbage")
+    assert cache.load("prog.casc", CODE) is None
+    assert cache.misses == 1
+
+def test_stale_dependency_stamp_is_a_miss(tmp_path):
+    cache = CompilationCache(str(tmp_path))
+    cache.store("prog.casc", CODE, parse_cascade(CODE), "deps-1")
+    assert cache.peek("prog.casc", CODE)[0] == "deps-1"
+    assert cache.load("prog.casc", CODE, lambda ast: "deps-1") is not None
+    assert cache.load("prog.casc", CODE, lambda ast: "deps-2") is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,71 @@
+# Tests for the streaming CSV record reader and the current.file host channel
+
+import pytest
+from compiler.csv_records import CsvRowError, read_chunks, read_records
+from compiler.host import file_channel
+from compiler.interpreter import CascadeRuntimeError, run_program
+from compiler.modules import ModuleLoader, check_program
+from benchmarks.programs import call, pour, program
+
+FIELDS = {'site': 'rivulet', 'ph': 'depth', 'ok': 'drop'}
+
+SAMPLES = ('ph,site,ok,extra\n'
+           '7.1,"North, upper",yes,x\n'
+           '\n'
+           '6.8,South,no,y\n'
+           'bad,East,yes,z\n'
+           '7.4,"West\n bank",1\n'
+           '7.0,West,true,w\n')
+
+def write(tmp_path, text):
+    path = tmp_path / "samples.csv"
+    path.write_text(text)
+    return str(path)
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_records_stream_in_chunks(tmp_path, use_mmap):
+    path = write(tmp_path, SAMPLES)
+    errors = []
+    chunks = list(read_chunks(path, FIELDS, chunk_rows=2, errors='skip', on_error=errors.append,
+                              use_mmap=use_mmap))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[0][0] == {'site': 'North, upper', 'ph': 7.1, 'ok': True}
+    assert [r['site'] for r in chunks[0] + chunks[1]] == ['North, upper', 'South', 'West']
+    # Line numbers are those a row ends on, counting quoted newlines.
+    assert [(e.line, str(e).split(': ', 1)[1]) for e in errors] == [
+        (5, "bad depth value 'bad' for 'ph'"), (7, "expected 4 fields, got 3")]
+
+def test_malformed_rows_raise_by_default(tmp_path):
+    path = write(tmp_path, SAMPLES)
+    records = read_records(path, FIELDS, chunk_rows=2)
+    assert next(records)['ph'] == 7.1
+    next(records)
+    with pytest.raises(CsvRowError, match=r"samples.csv:5: bad depth"):
+        next(records)
+    with pytest.raises(CsvRowError, match="missing column.s. temp"):
+        list(read_records(path, {'temp': 'depth'}))
+    assert list(read_records(write(tmp_path, ""), FIELDS)) == []
+
+def test_current_file_reads_reservoir_records(tmp_path, capsys):
+    path = write(tmp_path, SAMPLES)
+    read_csv = file_channel({'Sample': FIELDS}.get)['read_csv'][1]
+    samples = read_csv(path, 'Sample')
+    assert [r['ph'] for r in samples] == [7.1, 6.8, 7.0]
+    assert capsys.readouterr().out.count("[WARN]") == 2
+    with pytest.raises(CascadeRuntimeError, match="Undefined type 'Other'"):
+        read_csv(path, 'Other')
+    columns = file_channel({'Sample': FIELDS}.get)['load_csv'][1](path, 'Sample')
+    assert columns == [{'site': 'North, upper', 'ph': 7.1, 'ok': True}, {'site': 'South', 'ph': 6.8, 'ok': False},
+                       {'site': 'West', 'ph': 7.0, 'ok': True}]
+    assert list(columns.column('ph')) == [7.1, 6.8, 7.0]
+
+def test_current_file_is_a_host_channel(tmp_path):
+    (tmp_path / "fountain.config").write_text('{"dependencies": ["current.file"]}')
+    path = write(tmp_path, "ph\n7.5\n")
+    ast = program({'type': 'ImportStatement', 'path': 'current.file'},
+                  pour('text', call('read', {'type': 'StringLiteral', 'value': path})))
+    channels = ModuleLoader(str(tmp_path)).channels(ast)
+    assert channels.hosts == ['current.file'] and channels.names == []
+    check_program(ast, channels)
+    env, _, _ = run_program(ast, channels.functions())
+    assert env.get('text') == "ph\n7.5\n"
@@ -0,0 +1,83 @@
+# Tests for the incremental document model used by the language server
+
+import compiler.document as document_module
+from compiler.document import Document
+
+SOURCE = """pour 1 into a:depth
+pool scale(x:depth, k:depth):depth {
+  pour 2 into y
+}
+
+pour "s" into b:rivulet
+"""
+
+def lines_of(document):
+    return [(chunk.start, chunk.end) for chunk in document.chunks]
+
+def test_chunks_follow_top_level_statements():
+    document = Document(SOURCE)
+    assert lines_of(document) == [(0, 1), (1, 4), (5, 6)]
+    assert document.diagnostics() == []
+    assert [line for line, _ in document.statements()] == [0, 1, 5]
+
+def test_edit_reparses_only_touched_chunk():
+    document = Document(SOURCE)
+    document.diagnostics()
+    pool, rest = document.chunks[1].nodes, document.chunks[2].nodes
+    document.apply_change("3", ((0, 5), (0, 6)))
+    assert document.analyze() == 1
+    assert document.chunks[1].nodes is pool and document.chunks[2].nodes is rest
+    assert document.text.startswith("pour 3 into a:depth\n")
+
+def test_inserted_lines_shift_diagnostics():
+    document = Document(SOURCE)
+    document.apply_change("pour into", ((5, 0), (5, 23)))
+    issue, = document.diagnostics()
+    assert (issue.line, issue.kind) == (5, 'syntax')
+    document.apply_change("\n\n", ((0, 0), (0, 0)))
+    issue, = document.diagnostics()
+    assert issue.line == 7
+
+def test_dependents_are_rechecked():
+    document = Document("pool f(x:depth):depth { }\npour 1 into n:depth\npool f(y:depth):depth { }\n")
+    assert [(i.line, i.message) for i in document.diagnostics()] == [(2, "Function 'f' already defined")]
+    # Deleting the first pool clears the error on the untouched second one.
+    document.apply_change("", ((0, 0), (1, 0)))
+    assert document.diagnostics() == []
+    document.apply_change("pour n into m:depth\n", ((2, 0), (2, 0)))
+    # n resolves to the pour on line 0, declared by an earlier chunk.
+    assert document.diagnostics() == []
+    # Retyping n re-checks the reader of n on line 2 as well.
+    document.apply_change('pour "s" into n:rivulet', ((0, 0), (0, 19)))
+    assert [(i.line, i.message) for i in document.diagnostics()] == [
+        (2, "Type mismatch for m: declared depth, assigned rivulet")]
+
+def test_unbalanced_brace_swallows_following_chunks():
+    document = Document(SOURCE)
+    document.apply_change("", ((3, 0), (3, 1)))
+    assert lines_of(document) == [(0, 1), (1, 7)]
+    document.apply_change("}", ((3, 0), (3, 0)))
+    assert lines_of(document) == lines_of(Document(SOURCE))
+    assert document.diagnostics() == []
+
+def test_opened_brace_scans_each_swallowed_line_once(monkeypatch):
+    pools = 200
+    document = Document(''.join(f"pool f{i}(x:depth):depth {{\n  return x\n}}\n" for i in range(pools)))
+    scanned = []
+    original = document_module.split_chunks
+    def spy(lines, lo, hi, carry=None):
+        scanned.append(hi - lo)
+        return original(lines, lo, hi, carry)
+    monkeypatch.setattr(document_module, 'split_chunks', spy)
+    document.apply_change("pool g() {\n", ((0, 0), (0, 0)))
+    assert len(document.chunks) == 1
+    # One call per swallowed chunk, together covering the document once.
+    assert len(scanned) == pools and sum(scanned) == len(document.lines)
+
+def test_duplicate_pour_across_chunks():
+    document = Document("pour 1 into x:depth\npour 2 into x:depth\n")
+    assert [(i.line, i.message) for i in document.diagnostics()] == [
+        (1, "Variable 'x' already defined in scope")]
+    # Renaming the first pour clears the error on the untouched second one.
+    document.apply_change("y", ((0, 12), (0, 13)))
+    assert document.diagnostics() == []
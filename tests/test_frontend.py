@@ -0,0 +1,45 @@
+# Tests for the fused type-checking and semantic-analysis front end
+
+import pytest
+from compiler.frontend import check_program
+from compiler.semantic_analyzer import Scope, SemanticError, analyze_semantics
+from compiler.type_checker import TypeEnv, TypeError, check_type
+from benchmarks.programs import (
+    binop, call, call_program, cycle, fill, ident, loop_program, nested_program, num,
+    pool, pour, program, when,
+)
+
+def test_agrees_with_separate_passes():
+    for ast in (loop_program(10), call_program(10), nested_program(27)):
+        separate = TypeEnv()
+        check_type(ast, separate)
+        analyze_semantics(ast)
+        fused = TypeEnv()
+        check_program(ast, fused)
+        assert fused.vars == separate.vars and fused.funcs == separate.funcs
+
+def test_scopes():
+    env = TypeEnv()
+    check_program(program(
+        pour('base', num(1)),
+        when(binop('>', ident('base'), num(0)), [pour('flag', num(1))], [pour('flag', num(2))]),
+        pour('sum', binop('+', ident('base'), ident('flag'))),
+        pool('scale', [('x', 'depth')], 'depth', [pour('y', binop('*', ident('x'), ident('base')))]),
+    ), env)
+    assert set(env.vars) == {'base', 'flag', 'sum'}
+    with pytest.raises(SemanticError, match="'base' already defined"):
+        check_program(program(pour('base', num(1)), cycle({'type': 'ListLiteral', 'elements': [num(1)]}, 'x', [pour('base', num(2))])),
+                      TypeEnv())
+    with pytest.raises(SemanticError, match="Duplicate parameter: x"):
+        check_program(pool('f', [('x', 'depth'), ('x', 'depth')], 'depth', []), TypeEnv())
+    with pytest.raises(SemanticError, match="Assignment to undefined variable 'n'"):
+        check_program(program(fill('n', num(1))), TypeEnv())
+    scope = Scope({'a'}).child(('b',))
+    assert 'a' in scope and 'b' in scope and 'b' not in scope.parent
+
+def test_errors_in_source_order():
+    with pytest.raises(SemanticError, match="Function 'f' already defined"):
+        check_program(program(pool('f', [], 'depth', []), pool('f', [], 'depth', []),
+                              pour('bad', binop('+', num(1), {'type': 'StringLiteral', 'value': 's'}))), TypeEnv())
+    with pytest.raises(TypeError, match="Undefined function 'g'"):
+        check_program(program(pour('n', call('g')), pour('n', num(1))), TypeEnv())
@@ -0,0 +1,173 @@
+# Tests for the closure-compiled interpreter backend
+
+import compiler.interpreter as interpreter
+import compiler.vm as vm
+from compiler.basin import ReservoirBasin
+from compiler.interpreter import Env, exec_stmt, run_program, CascadeRuntimeError, ReturnSignal
+from benchmarks.programs import (num, ident, binop, call, pour, fill, ret, cycle, when, pool,
+                                 program, loop_program, call_program, early_return_program,
+                                 SAMPLE_FIELDS, sample_records)
+
+def run_tree_walker(ast, functions=None):
+    env = Env()
+    functions = {} if functions is None else functions
+    types = {}
+    for stmt in ast['body']:
+        exec_stmt(stmt, env, functions, types)
+    return env, functions, types
+
+def test_closures_match_tree_walker():
+    for ast in (loop_program(50), call_program(50)):
+        env, functions, _ = run_program(ast)
+        ref_env, ref_functions, _ = run_tree_walker(ast)
+        assert env.vars == ref_env.vars
+        assert set(functions) == set(ref_functions)
+    _, functions, _ = run_program(call_program(1))
+    assert functions['clamp'](80.0, 50.0) == 50.0
+    assert functions['clamp'](20.0, 50.0) == 20.0
+
+def test_function_call_and_return():
+    ast = program(
+        pool('add', [('a', 'depth'), ('b', 'depth')], 'depth', [ret(binop('+', ident('a'), ident('b')))]),
+        pour('total', call('add', num(2), num(3))),
+    )
+    env, functions, types = run_program(ast)
+    assert env.get('total') == 5.0
+
+def test_try_catch_and_throw():
+    ast = program(
+        pool('guarded', [], 'rivulet', [
+            {'type': 'TryCatchStatement',
+             'tryBlock': [{'type': 'ThrowStatement', 'value': {'type': 'StringLiteral', 'value': 'boom'}}],
+             'errVar': 'e',
+             'catchBlock': [ret(ident('e'))]},
+        ]),
+        pour('msg', call('guarded')),
+    )
+    env, _, _ = run_program(ast)
+    assert env.get('msg') == 'boom'
+
+def test_unknown_operator_fails_only_when_evaluated():
+    bad = binop('%', num(1), num(2))
+    ast = program(when(binop('==', num(1), num(2)), [pour('x', bad)]))
+    run_program(ast)
+    try:
+        run_program(program(pour('x', bad)))
+        assert False, "Expected CascadeRuntimeError"
+    except CascadeRuntimeError:
+        pass
+
+def test_slot_scopes_follow_dynamic_binding():
+    # The cycle-local `total` shadows the outer one only after its first write.
+    ast = program(
+        pour('total', num(10)),
+        pour('seen', {'type': 'ListLiteral', 'elements': []}),
+        cycle({'type': 'ListLiteral', 'elements': [num(1), num(2)]}, 'x', [
+            fill('total', binop('+', ident('total'), ident('x'))),
+            fill('seen', binop('+', ident('seen'), {'type': 'ListLiteral', 'elements': [ident('total')]})),
+        ]),
+        pool('late', [], 'depth', [ret(ident('declared_later'))]),
+        pour('declared_later', num(7)),
+        pour('got', call('late')),
+    )
+    env, _, _ = run_program(ast)
+    ref_env, _, _ = run_tree_walker(ast)
+    assert env.vars == ref_env.vars
+    assert env.get('total') == 10.0
+    assert env.get('got') == 7.0
+
+def test_unbound_variable_raises():
+    ast = program(
+        when(binop('==', num(1), num(2)), [pour('maybe', num(1))]),
+        pour('x', ident('maybe')),
+    )
+    try:
+        run_program(ast)
+        assert False, "Expected CascadeRuntimeError"
+    except CascadeRuntimeError as e:
+        assert "maybe" in str(e)
+
+def test_return_status_passes_through_try_and_cycle():
+    env, functions, _ = run_program(early_return_program(3))
+    assert env.vars == run_tree_walker(early_return_program(3))[0].vars
+    assert functions['first_above'](3.0) == 4.0
+    assert functions['first_above'](100.0) == 0.0
+
+def test_top_level_return_escapes_program():
+    try:
+        run_program(program(ret(num(1))))
+        assert False, "Expected ReturnSignal"
+    except ReturnSignal as sig:
+        assert sig.value == 1.0
+
+def test_self_append_preserves_aliases():
+    lst = lambda *els: {'type': 'ListLiteral', 'elements': list(els)}
+    app = lambda e: fill('acc', binop('+', ident('acc'), e))
+    ast = program(
+        pour('acc', lst()),
+        app(lst(num(1))),
+        pour('alias', ident('acc')),
+        app(lst(num(2))),
+        pool('grab', [], '[depth]', [ret(ident('acc'))]),
+        pour('snap', call('grab')),
+        app(lst(num(3))),
+        cycle(ident('acc'), 'x', [app(lst(ident('x'))), app(lst(ident('x')))]),
+        app(lst(num(4))),
+    )
+    env, _, _ = run_program(ast)
+    assert env.vars == run_tree_walker(ast)[0].vars
+    assert env.get('acc') == [1, 2, 3, 4]
+    assert env.get('alias') == [1] and env.get('snap') == [1, 2]
+    # Unaliased, the slot keeps extending the list it holds; aliased, it gets a new one.
+    ids = []
+    peek = pour('seen', call('peek', ident('acc')))
+    env, _, _ = run_program(program(
+        pour('acc', lst()), peek, app(lst(num(1))), peek, app(lst(num(2))), peek,
+        pour('alias', ident('acc')), app(lst(num(3))), peek,
+    ), {'peek': lambda xs: ids.append(id(xs)) or 0.0})
+    assert ids[0] == ids[1] == ids[2] != ids[3]
+    assert env.get('alias') == [1, 2] and env.get('acc') == [1, 2, 3]
+
+def test_self_append_compiles_to_the_in_place_path(monkeypatch):
+    compiled = []
+    original = interpreter._compile_self_append
+    def spy(*args):
+        compiled.append(args[0])
+        return original(*args)
+    monkeypatch.setattr(interpreter, '_compile_self_append', spy)
+    empty = {'type': 'ListLiteral', 'elements': []}
+    env, _, _ = run_program(program(
+        pour('acc', empty), pour('other', empty),
+        fill('acc', binop('+', ident('acc'), {'type': 'ListLiteral', 'elements': [num(1)]})),
+        # Not a self-append: the variable is the right operand.
+        fill('acc', binop('+', ident('other'), ident('acc')))))
+    assert env.get('acc') == [1]
+    assert len(compiled) == 1
+
+def test_list_plus_reservoir_basin_concatenates_in_every_engine():
+    # The accumulator idiom: all_samples = all_samples + site_samples.
+    rows = sample_records(3)
+    ast = program(
+        pour('all', {'type': 'ListLiteral', 'elements': []}),
+        fill('all', binop('+', ident('all'), call('site'))),
+        pour('twice', binop('+', ident('all'), call('site'))))
+    for run in (run_program, run_tree_walker, vm.run_program):
+        env, _, _ = run(ast, {'site': lambda: ReservoirBasin.from_records(SAMPLE_FIELDS, rows)})
+        assert env.get('all') == rows
+        assert env.get('twice') == rows + rows
+
+def test_self_append_matches_plus_in_every_engine():
+    lst = lambda *els: {'type': 'ListLiteral', 'elements': list(els)}
+    ast = program(
+        # An identifier element keeps the literal a plain list rather than a packed basin.
+        pour('a', num(1)),
+        pour('xs', lst(ident('a'), num(2))),
+        fill('xs', binop('+', ident('xs'), num(1))),
+        fill('xs', binop('+', ident('xs'), lst(num(7)))),
+        fill('xs', binop('*', ident('xs'), num(2))),
+        pour('acc', lst(ident('a'))),
+        fill('acc', binop('+', ident('acc'), lst(ident('a')))),
+        fill('acc', binop('+', ident('acc'), lst(num(3)))))
+    results = [run(ast)[0].vars for run in (run_program, run_tree_walker, vm.run_program)]
+    assert results[0] == results[1] == results[2]
+    assert results[0]['xs'] == [4.0, 6.0, 14.0] and results[0]['acc'] == [1.0, 1.0, 3.0]
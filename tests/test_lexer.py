@@ -0,0 +1,52 @@
+# Tests for the streaming lexer and the token buffer
+
+import pytest
+from compiler.cascade_parser import Parser
+from compiler.lexer import IDENT, NUMBER, OP, TokenBuffer, iter_tokens, tokenize
+
+CODE = 'pour 3.5 into x:depth  # comment\npool f(a:depth):depth { pour "s" into y }\n'
+
+def test_buffer_matches_token_list():
+    tokens = tokenize(CODE)
+    buffer = TokenBuffer(CODE)
+    assert buffer.fill(len(tokens) - 1) and not buffer.fill(len(tokens))
+    for ix, tok in enumerate(tokens):
+        got = buffer.token(ix)
+        assert (got.type, got.value, got.line, got.col) == (tok.type, tok.value, tok.line, tok.col)
+    assert tokens[6].value == "pool" and (tokens[6].line, tokens[6].col) == (2, 0)
+
+def test_buffer_lookups():
+    buffer = TokenBuffer(CODE)
+    assert buffer.matches(0, IDENT, 'pour')
+    assert not buffer.matches(0, IDENT, 'pool') and not buffer.matches(0, IDENT, 'po')
+    assert buffer.kind(1) == NUMBER and buffer.value(1) == '3.5'
+    assert buffer.matches(4, OP, ':')
+    assert buffer.kind(1000) is None and buffer.position(1000) == (-1, -1)
+
+def test_tokens_are_produced_lazily():
+    code = "pour 1 into x\n" * 2000 + "pour 'bad' into y\n"
+    gen = iter_tokens(code)
+    assert next(gen).value == 'pour'
+    parser = Parser(code)
+    assert parser.parse_statement().name == 'x'
+    assert len(parser.tokens.kinds) < 1000
+    with pytest.raises(RuntimeError):
+        parser.parse()
+
+def test_lexing_error_is_raised_when_reached():
+    buffer = TokenBuffer("pour 1 into x.y\npour 'bad' into z\n")
+    assert buffer.kind(6) == IDENT and buffer.value(4) == '.'
+    with pytest.raises(RuntimeError):
+        buffer.kind(7)
+    with pytest.raises(RuntimeError):
+        buffer.fill(8)
+
+def test_tokens_index_like_dicts():
+    tok = tokenize(CODE)[1]
+    assert (tok['type'], tok['value'], tok['line'], tok['col']) == ('NUMBER', '3.5', 1, 5)
+    assert tok.get('value') == '3.5' and tok.get('missing', 0) == 0
+    assert 'line' in tok and 'missing' not in tok
+    assert dict(zip(tok.keys(), (tok[key] for key in tok.keys()))) == {
+        'type': 'NUMBER', 'value': '3.5', 'line': 1, 'col': 5}
+    with pytest.raises(KeyError):
+        tok['missing']
@@ -0,0 +1,144 @@
+# Tests for `open channel` module loading
+
+import json
+import os
+import pytest
+from compiler.cache import CompilationCache
+from compiler.interpreter import run_program
+import compiler.modules as modules_module
+import compiler.stdlib as stdlib
+from compiler.modules import ModuleError, ModuleLoader, check_program
+from compiler.type_checker import TypeError
+import compiler.vm as vm
+from benchmarks.programs import binop, call, ident, num, pool, pour, program, ret
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+def imports(*names):
+    return [{'type': 'ImportStatement', 'path': name} for name in names]
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path / "fountain.config", json.dumps({"dependencies": ["wellspring.math"],
+                                                    "channels": ["shared/util.pool"]}))
+    write(tmp_path / "pools" / "stats.pool",
+          "open channel pools.base\npool identity(x:depth):depth {\n  return x\n}\n")
+    write(tmp_path / "pools" / "base.pool", "pour 1 into unused\npool first(x:depth):depth {\n  return x\n}\n")
+    write(tmp_path / "shared" / "util.pool", "pool echo(s:rivulet):rivulet {\n  return s\n}\n")
+    write(tmp_path / "pools" / "broken.pool", 'pour "s" into y:depth\n')
+    return tmp_path
+
+def test_channels_resolve_lazily(project):
+    loader = ModuleLoader.for_source(str(project / "main.casc"))
+    ast = program(*imports("wellspring.math", "pools.stats", "pools.broken"),
+                  pour('a', call('identity', num(4))), pour('b', call('echo', {'type': 'StringLiteral', 'value': 'hi'})))
+    channels = loader.channels(ast)
+    assert channels.names == ['shared.util', 'pools.stats', 'pools.broken']
+    check_program(ast, channels)
+    # pools.broken is never compiled: every name was found before reaching it.
+    assert sorted(loader.modules) == ['pools.base', 'pools.stats', 'shared.util']
+    assert all(module.functions is None for module in loader.modules.values())
+    env, _, _ = run_program(ast, channels.functions())
+    assert (env.get('a'), env.get('b')) == (4.0, 'hi')
+    assert loader.modules['pools.stats'].functions is not None
+    assert loader.modules['pools.base'].functions is None
+    env, _, _ = vm.run_program(ast, loader.channels(ast).functions())
+    assert env.get('a') == 4.0
+
+def test_modules_compile_once(project):
+    loader = ModuleLoader(str(project))
+    stats = loader.load("pools.stats")
+    assert loader.load("pools.stats") is stats
+    functions = loader.run(stats)
+    assert loader.run(stats) is functions
+    assert functions['first'](2.0) == 2.0
+    assert loader.modules['pools.base'].funcs == {'first': (['depth'], 'depth')}
+
+def test_channel_errors(project):
+    loader = ModuleLoader(str(project))
+    with pytest.raises(ModuleError, match="no such module"):
+        loader.channels(program(*imports("pools.missing")))
+    with pytest.raises(ModuleError, match="In channel 'pools.broken'.*Type mismatch"):
+        loader.load("pools.broken")
+    assert 'pools.broken' not in loader.modules
+    ast = program(*imports("pools.stats"), pour('a', call('identity', {'type': 'StringLiteral', 'value': 's'})))
+    with pytest.raises(TypeError, match="arg 1 expects depth"):
+        check_program(ast, loader.channels(ast))
+
+def test_cached_module_is_rechecked_when_a_dependency_changes(project, tmp_path_factory, monkeypatch):
+    cache = CompilationCache(str(tmp_path_factory.mktemp("cache")))
+    checked = []
+    original = check_program
+    monkeypatch.setattr(modules_module, 'check_program', lambda ast, channels: checked.append(channels.owner)
+                        or original(ast, channels))
+    ModuleLoader(str(project), cache).load("pools.stats")
+    assert sorted(checked) == ['pools.base', 'pools.stats', 'shared.util']
+    del checked[:]
+    loader = ModuleLoader(str(project), cache)
+    loader.load("pools.stats")
+    assert checked == []
+    # A hit reads the sources of its dependencies but compiles none of them.
+    assert list(loader.modules) == ['pools.stats']
+    # A change to pools.base invalidates what pools.stats was checked against.
+    write(project / "pools" / "base.pool", "pool first(x:rivulet):rivulet {\n  return x\n}\n")
+    ModuleLoader(str(project), cache).load("pools.stats")
+    assert sorted(checked) == ['pools.base', 'pools.stats']
+
+def test_stdlib_pools_are_callable_from_cascade(project):
+    lst = lambda *els: {'type': 'ListLiteral', 'elements': list(els)}
+    text = lambda value: {'type': 'StringLiteral', 'value': value}
+    ast = program(
+        pool('double', [('x', 'depth')], 'depth', [ret(binop('*', ident('x'), num(2)))]),
+        pour('xs', lst(num(3), num(1), num(2)), '[depth]'),
+        pour('mid', call('median_basin', ident('xs')), 'depth'),
+        pour('spread', call('stddev_basin', ident('xs'))),
+        pour('doubled', call('parallel_map_basin', ident('xs'), text('double'))),
+        pour('n', call('measure', ident('doubled'))),
+        pool('add', [('a', 'depth'), ('b', 'depth')], 'depth', [ret(binop('+', ident('a'), ident('b')))]),
+        pour('total', call('parallel_reduce_basin', ident('xs'), text('add'), num(0))),
+    )
+    loader = ModuleLoader(str(project))
+    check_program(ast, loader.channels(ast))
+    for run in (run_program, vm.run_program):
+        env, _, _ = run(ast, loader.channels(ast).functions())
+        assert (env.get('mid'), env.get('spread'), env.get('n')) == (2.0, 1.0, 3)
+        assert list(env.get('doubled')) == [6.0, 2.0, 4.0] and env.get('total') == 6.0
+    output = program(pour('x', call('flow', text('a'))), pour('y', call('flow', num(1), text('console'))))
+    check_program(output, loader.channels(output))
+    bad = program(pour('m', call('median_basin', text('s'))))
+    with pytest.raises(TypeError, match="arg 1 expects \\[depth\\]"):
+        check_program(bad, loader.channels(bad))
+
+def test_parallel_options_are_passed_from_cascade(project, monkeypatch):
+    lst = lambda *els: {'type': 'ListLiteral', 'elements': list(els)}
+    text = lambda value: {'type': 'StringLiteral', 'value': value}
+    true = {'type': 'BooleanLiteral', 'value': True}
+    false = {'type': 'BooleanLiteral', 'value': False}
+    runs = []
+    original = stdlib._run_chunks
+    def spy(work, basin, func, workers, chunk_size, processes):
+        runs.append((work.__name__, workers, chunk_size, processes))
+        return original(work, basin, func, workers, chunk_size, processes)
+    monkeypatch.setattr(stdlib, '_run_chunks', spy)
+    ast = program(
+        pool('add', [('a', 'depth'), ('b', 'depth')], 'depth', [ret(binop('+', ident('a'), ident('b')))]),
+        pour('xs', lst(num(1), num(2), num(3), num(4), num(5)), '[depth]'),
+        pour('total', call('parallel_reduce_basin', ident('xs'), text('add'), num(10), true, num(2), num(2), false)),
+        pool('inc', [('x', 'depth')], 'depth', [ret(binop('+', ident('x'), num(1)))]),
+        # 0 workers: as many as the default.
+        pour('ys', call('parallel_map_basin', ident('xs'), text('inc'), num(0))),
+    )
+    loader = ModuleLoader(str(project))
+    check_program(ast, loader.channels(ast))
+    env, _, _ = run_program(ast, loader.channels(ast).functions())
+    assert env.get('total') == 25.0 and list(env.get('ys')) == [2.0, 3.0, 4.0, 5.0, 6.0]
+    assert runs == [('_reduce_chunk', 2.0, 2.0, False), ('_map_chunk', 0.0, None, True)]
+    too_many = program(pour('m', call('parallel_map_basin', ident('xs'), text('add'), num(0), num(0),
+                                      false, false)))
+    with pytest.raises(TypeError, match="expects 2 to 5 args, got 6"):
+        check_program(too_many, loader.channels(too_many))
+
@@ -0,0 +1,69 @@
+# Tests for the AST optimizer pass
+
+import pytest
+from compiler.ast_nodes import from_dict
+from compiler.interpreter import run_program
+from compiler.optimizer import count_nodes, optimize, user_vars
+import compiler.vm as vm
+from benchmarks.programs import binop, call, cycle, fill, ident, num, pool, pour, program, ret, when
+
+def items(*values):
+    return {'type': 'ListLiteral', 'elements': [num(v) for v in values]}
+
+def sample_program():
+    return program(
+        pool('load', [('x', 'depth')], 'depth', [ret(ident('x'))]),
+        pour('rate', binop('*', num(2), num(3))),
+        pour('base', call('load', num(4))),
+        pour('count', num(0)),
+        fill('count', binop('+', ident('count'), num(1))),
+        when(binop('>', ident('rate'), num(10)), [pour('big', num(1))], [pour('small', ident('rate'))]),
+        cycle(items(1, 2, 3), 'x', [
+            pour('y', binop('*', ident('x'), binop('+', ident('base'), ident('rate')))),
+            pour('ratio', binop('/', ident('x'), ident('base'))),
+            pour('z', binop('+', ident('y'), ident('count'))),
+        ]),
+    )
+
+def test_levels_agree_on_results():
+    results = []
+    for level in (0, 1, 2):
+        ast = optimize(sample_program(), level)
+        env, _, _ = run_program(ast)
+        venv, _, _ = vm.run_program(ast)
+        assert user_vars(venv.vars) == user_vars(env.vars)
+        results.append(user_vars(env.vars))
+    assert results[0] == results[1] == results[2]
+    assert results[0]['small'] == 6.0 and 'big' not in results[0]
+
+def test_folding_pruning_propagation_and_hoisting():
+    original = from_dict(sample_program())
+    ast = optimize(original, 2)
+    assert original == from_dict(sample_program())
+    body = ast.body
+    assert body[1].value == from_dict(num(6))
+    # The constant branch is gone, its otherwise inlined with rate propagated.
+    assert [s.name for s in body[5:7]] == ['small', '%0']
+    assert body[5].value == from_dict(num(6))
+    # base + 6 is invariant; x / base and reads of the reassigned count stay in the loop.
+    assert body[6].value == from_dict(binop('+', ident('base'), num(6)))
+    loop = body[7].body
+    assert loop[0].value == from_dict(binop('*', ident('x'), ident('%0')))
+    assert loop[1].value == from_dict(binop('/', ident('x'), ident('base')))
+    assert loop[2].value == from_dict(binop('+', ident('y'), ident('count')))
+    assert count_nodes(optimize(original, 1)) < count_nodes(original)
+
+def test_failing_expressions_are_left_to_run_time():
+    ast = program(pour('n', num(0)), when(binop('==', num(1), num(2)), [pour('q', binop('/', num(1), ident('n')))]),
+                  pour('d', binop('/', num(1), num(0))))
+    optimized = optimize(ast, 2)
+    assert optimized.body[-1].value == from_dict(binop('/', num(1), num(0)))
+    with pytest.raises(ZeroDivisionError):
+        run_program(optimized)
+    # Division by a variable is not hoisted: the loop may run zero times.
+    ast = optimize(program(pool('load', [('x', 'depth')], 'depth', [ret(ident('x'))]),
+                           pour('n', call('load', num(0))),
+                           cycle(items(), 'x', [pour('q', binop('/', num(1), ident('n')))])), 2)
+    assert len(ast.body) == 3
+    env, _, _ = run_program(ast)
+    assert user_vars(env.vars) == {'n': 0.0}
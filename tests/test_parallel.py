@@ -0,0 +1,91 @@
+# Tests for `cycle through ... in parallel`
+
+import pytest
+import compiler.interpreter as interpreter
+from compiler.interpreter import CascadeRuntimeError, Env, exec_stmt, run_program
+from compiler.semantic_analyzer import SemanticError, parallel_reductions
+from compiler.ast_nodes import from_dict
+import compiler.vm as vm
+from benchmarks.programs import binop, call, cycle, fill, ident, num, pool, pour, program, ret, when
+
+def items(n):
+    return {'type': 'ListLiteral', 'elements': [num(i) for i in range(n)]}
+
+def one(value):
+    return {'type': 'ListLiteral', 'elements': [value]}
+
+def reduction_program(n):
+    return program(
+        pool('square', [('x', 'depth')], 'depth', [ret(binop('*', ident('x'), ident('x')))]),
+        pour('offset', num(3)),
+        pour('total', num(0)),
+        pour('tail', {'type': 'ListLiteral', 'elements': []}),
+        cycle(items(n), 'x', [
+            pour('y', binop('+', call('square', ident('x')), ident('offset'))),
+            fill('total', binop('+', ident('total'), ident('y'))),
+            when(binop('>', ident('x'), num(0)), [fill('tail', binop('+', ident('tail'), one(ident('x'))))]),
+        ], parallel=True),
+    )
+
+@pytest.fixture
+def workers(monkeypatch):
+    monkeypatch.setattr(interpreter, 'PARALLEL_MIN_CHUNK', 4)
+    yield interpreter.set_parallel_workers
+    interpreter.set_parallel_workers(None)
+
+def test_partitions_merge_in_order(workers):
+    expected = sum(x * x + 3 for x in range(50))
+    results = []
+    for count in (1, 2):
+        workers(count)
+        env, _, _ = run_program(reduction_program(50))
+        results.append((env.get('total'), env.get('tail')))
+    assert results[0] == results[1] == (expected, [float(x) for x in range(1, 50)])
+    env, functions, types = Env(), {}, {}
+    for stmt in reduction_program(50)['body']:
+        exec_stmt(stmt, env, functions, types)
+    assert (env.get('total'), env.get('tail')) == results[0]
+
+def test_workers_get_only_what_the_body_reads(workers, monkeypatch):
+    workers(2)
+    shipped = []
+    original = interpreter.map_shipped
+    def spy(executor, count, run, job, chunks):
+        shipped.append(job.parts)
+        return original(executor, count, run, job, chunks)
+    monkeypatch.setattr(interpreter, 'map_shipped', spy)
+    ast = reduction_program(50)
+    ast['body'][1:1] = [pool('unused', [], 'depth', [ret(num(0))]), pour('xs', items(50)), pour('other', num(1))]
+    ast['body'][-1]['collection'] = ident('xs')
+    env, _, _ = run_program(ast)
+    assert env.get('total') == sum(x * x + 3 for x in range(50))
+    (frame, _, _, pools, _, _, _, _), = shipped
+    # Not the collection, nor the reduction targets: the partitions only ever add to those.
+    assert frame.vars == {'offset': 3.0}
+    assert [declaration.name for declaration, _ in pools] == ['square']
+
+def test_worker_errors_are_raised_in_order(workers):
+    workers(2)
+    ast = program(pour('total', num(0)), cycle(items(20), 'x', [
+        fill('total', binop('+', ident('total'), call('missing', ident('x')))),
+    ], parallel=True))
+    with pytest.raises(KeyError, match='missing'):
+        run_program(ast)
+
+def test_analyzer_rejects_unreducible_writes():
+    def check(*body):
+        return parallel_reductions(from_dict(cycle(items(3), 'x', list(body), parallel=True)))
+    assert check(pour('y', ident('x')), fill('t', binop('+', ident('t'), ident('y')))) == ['t']
+    with pytest.raises(SemanticError, match="writes outer variable 't'"):
+        check(fill('t', binop('*', ident('t'), ident('x'))))
+    with pytest.raises(SemanticError, match="writes outer variable 't'"):
+        check(fill('t', binop('+', ident('t'), ident('t'))))
+    with pytest.raises(SemanticError, match="reads reduction variable 't'"):
+        check(fill('t', binop('+', ident('t'), ident('x'))), pour('y', ident('t')))
+    with pytest.raises(SemanticError, match="Cannot return"):
+        check(ret(ident('x')))
+    ast = program(pour('t', num(0)), cycle(items(3), 'x', [fill('t', ident('x'))], parallel=True))
+    with pytest.raises(CascadeRuntimeError, match="writes outer variable"):
+        run_program(ast)
+    with pytest.raises(CascadeRuntimeError, match="interpreter engine"):
+        vm.run_program(reduction_program(3))
@@ -0,0 +1,74 @@
+# Tests for the --profile call and line profiler
+
+import itertools
+import pytest
+import compiler.interpreter as interpreter
+from compiler.ast_nodes import as_node, from_dict
+from compiler.interpreter import compile_block, run_program, set_profiler
+from compiler.parser import parse_cascade
+from compiler.profiler import BUILTIN, POOL, Profiler
+from benchmarks.programs import binop, call, ident, num, pool, pour, program, ret, when
+
+@pytest.fixture
+def profiler():
+    # Every clock reading is one second after the last, so times count readings.
+    profiler = Profiler('main', clock=itertools.count().__next__)
+    set_profiler(profiler)
+    yield profiler
+    set_profiler(None)
+
+def test_calls_are_counted_inclusive_and_exclusive(profiler):
+    ast = program(pool('inner', [('x', 'depth')], 'depth', [ret(call('twice', ident('x')))]),
+                  pool('outer', [('x', 'depth')], 'depth', [ret(call('inner', ident('x')))]),
+                  pour('a', call('outer', num(1))),
+                  pour('b', call('outer', ident('a'))))
+    profiler.start()
+    env, _, _ = run_program(ast, {'twice': lambda x: x * 2})
+    profiler.stop()
+    assert env.get('b') == 4.0
+    calls = profiler.calls
+    assert {name: (stats.kind, stats.calls) for name, stats in calls.items()} == {
+        'outer': (POOL, 2), 'inner': (POOL, 2), 'twice': (BUILTIN, 2)}
+    # A call takes two readings plus its callees': 1, 3 and 5 seconds each.
+    assert (calls['twice'].inclusive, calls['inner'].inclusive, calls['outer'].inclusive) == (2, 6, 10)
+    assert (calls['twice'].exclusive, calls['inner'].exclusive, calls['outer'].exclusive) == (2, 4, 4)
+    assert sum(profiler.stacks.values()) == profiler.total
+    assert profiler.collapsed().splitlines()[-1] == 'main;outer;inner;twice 2000000'
+
+def test_recursion_is_not_counted_twice(profiler):
+    countdown = pool('down', [('n', 'depth')], 'depth', [
+        when(binop('>', ident('n'), num(0)), [ret(call('down', binop('-', ident('n'), num(1))))]),
+        ret(ident('n'))])
+    run_program(program(countdown, pour('r', call('down', num(2)))))
+    stats = profiler.calls['down']
+    # Only the outermost of the three nested calls adds to the inclusive time.
+    assert (stats.calls, stats.inclusive, stats.exclusive) == (3, 5, 5)
+    assert profiler.stacks[('main', 'down', 'down', 'down')] == 1
+
+def test_lines_are_hit_per_statement(profiler):
+    ast = as_node(parse_cascade('pour 2 into a:depth\npool f(x:depth):depth {\n  return x\n}\n'))
+    ast.body.append(from_dict(pour('b', call('f', ident('a')))))
+    ast.body.append(from_dict(pour('c', call('f', binop('+', ident('a'), num(1))))))
+    run_program(ast, source='main.casc')
+    assert {key: stats.hits for key, stats in profiler.lines.items()} == {
+        ('main.casc', 1): 1, ('main.casc', 2): 1, ('main.casc', 3): 2}
+    report = profiler.report()
+    assert '         2 ' in report and 'main.casc:3' in report
+    assert report.index(' pool     f') < report.index('main.casc:1')
+
+def test_disabled_profiling_compiles_plain_closures():
+    assert interpreter.PROFILER is None
+    stmts = [from_dict(pour('a', num(1)))]
+    assert compile_block(stmts, {}, {}, interpreter.Scope(['a'])).__name__ != 'profiled'
+
+def test_writes_report_and_collapsed_stacks(profiler, tmp_path):
+    profiler.start()
+    run_program(program(pool('f', [], 'depth', [ret(num(1))]), pour('a', call('f'))))
+    profiler.stop()
+    text, folded = profiler.write(str(tmp_path / "out" / "main.profile"))
+    assert text.endswith("main.profile.txt") and folded.endswith("main.profile.folded")
+    with open(folded) as f:
+        lines = f.read().splitlines()
+    assert lines == ['main 2000000', 'main;f 1000000']
+    with open(text) as f:
+        assert f.readline().startswith("Profile of main:")
@@ -0,0 +1,70 @@
+# Tests for compiling a whole project in parallel
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from compiler.cache import CompilationCache
+from compiler.interpreter import run_program
+import compiler.project as project_module
+from compiler.project import build_project, project_root, project_sources
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+@pytest.fixture
+def project(tmp_path):
+    write(tmp_path / "fountain.config", json.dumps({"entry": "sources/main.casc",
+                                                    "channels": ["shared/util.pool"]}))
+    write(tmp_path / "pools" / "stats.pool",
+          "open channel pools.base\npool identity(x:depth):depth {\n  return x\n}\n")
+    write(tmp_path / "pools" / "base.pool", "pour 1 into unused\npool first(x:depth):depth {\n  return x\n}\n")
+    write(tmp_path / "shared" / "util.pool", "pool echo(s:rivulet):rivulet {\n  return s\n}\n")
+    write(tmp_path / "sources" / "main.casc", "open channel pools.stats\npour 4 into a:depth\npour a into b:depth\n")
+    write(tmp_path / "__cascade_cache__" / "stale.pool", "not cascade")
+    return tmp_path
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_builds_every_source(project, workers, monkeypatch):
+    # One file per task, so the files spread over the workers.
+    monkeypatch.setattr(project_module, 'BUILD_CHUNKSIZE', 1)
+    if workers:
+        with ProcessPoolExecutor(workers) as executor:
+            build = build_project(str(project), executor)
+    else:
+        build = build_project(str(project))
+    assert build.errors == []
+    assert sorted(build.loader.modules) == ['pools.base', 'pools.stats', 'shared.util', 'sources.main']
+    entry = build.entry()
+    channels = build.loader.channels(entry.ast)
+    env, _, _ = run_program(entry.ast, channels.functions())
+    assert env.get('b') == 4.0
+    assert build.loader.run(build.loader.modules['pools.stats'])['identity'](2.0) == 2.0
+
+def test_reports_errors_per_file(project):
+    write(project / "pools" / "base.pool", 'pour "s" into y:depth\npool first(x:depth):depth {\n  return x\n}\n')
+    write(project / "pools" / "bad.pool", "pool (\n")
+    write(project / "pools" / "lost.pool", "open channel pools.missing\n")
+    build = build_project(str(project))
+    assert [os.path.basename(path) for path, _ in build.errors] == ['bad.pool', 'base.pool', 'lost.pool']
+    assert 'Type mismatch for y' in build.errors[1][1]
+    assert 'no such module' in build.errors[2][1]
+    # Modules that failed still export their signatures to the others.
+    assert build.loader.modules['pools.base'].funcs == {'first': (['depth'], 'depth')}
+
+def test_cached_sources_skip_the_front_end(project, tmp_path_factory):
+    cache = CompilationCache(str(tmp_path_factory.mktemp("cache")))
+    assert build_project(str(project), cache=cache).errors == []
+    hits = cache.hits
+    build = build_project(str(project), cache=cache)
+    assert build.errors == [] and cache.hits == hits + 4
+    # pools.stats opens pools.base, so a change to its source re-checks it; sources.main sees only pools.stats.
+    write(project / "pools" / "base.pool", "pool first(x:rivulet):rivulet {\n  return x\n}\n")
+    hits, misses = cache.hits, cache.misses
+    assert build_project(str(project), cache=cache).errors == []
+    assert (cache.hits, cache.misses) == (hits + 2, misses + 2)
+    assert project_root(str(project / "fountain.config")) == str(project)
+    assert len(project_sources(str(project))) == 4
@@ -3,6 +3,7 @@
 import compiler.stdlib as stdlib
 import math
 
+
 def test_flow_and_measure(capsys):
     stdlib.flow("hello world")
     out, _ = capsys.readouterr()
@@ -11,12 +12,14 @@ def test_flow_and_measure(capsys):
     assert stdlib.measure("abc") == 3
     assert stdlib.measure({"a":1, "b":2}) == 2
 
+
 def test_map_and_filter():
     res = stdlib.map_basin([1,2,3], lambda x: x+1)
     assert res == [2,3,4]
     res = stdlib.filter_basin([1,2,3,4], lambda x: x%2==0)
     assert res == [2,4]
 
+
 def test_reduce_and_math():
     res = stdlib.reduce_basin([1,2,3], lambda a,b: a+b, 0)
     assert res == 6
@@ -25,6 +28,7 @@ def test_reduce_and_math():
     assert stdlib.sum_basin([1,2,3]) == 6
     assert abs(stdlib.avg_basin([1,2,3]) - 2) < 1e-6
 
+
 def test_string_utils():
     assert stdlib.upper_rivulet("abc") == "ABC"
     assert stdlib.lower_rivulet("ABC") == "abc"
@@ -32,19 +36,153 @@ def test_string_utils():
     assert stdlib.split_rivulet("a,b,c", ",") == ["a", "b", "c"]
     assert stdlib.join_basin(["x","y","z"], "-") == "x-y-z"
 
+
 def test_numeric_utils():
     assert stdlib.abs_depth(-5) == 5
     assert stdlib.sqrt_depth(9) == 3
     assert abs(stdlib.log_depth(math.e) - 1) < 1e-6
     assert stdlib.pow_depth(2,3) == 8
 
+
 def test_type_conversions():
     assert stdlib.to_rivulet(123) == "123"
     assert stdlib.to_depth("3.14") == 3.14
     assert stdlib.to_drop("true") is True
     assert stdlib.to_drop(0) is False
 
+
 def test_random_and_now():
     val = stdlib.random_depth()
     assert 0 <= val <= 1
-    assert stdlib.now() > 0
\ No newline at end of file
+    assert stdlib.now() > 0
+
+
+def test_streaming_statistics():
+    data = [4.0, 1.0, 7.0, 3.0, 3.0, 9.0]
+    stats = stdlib.stats_basin(iter(data))
+    assert stats["count"] == 6 and stats["min"] == 1.0 and stats["max"] == 9.0
+    assert abs(stats["avg"] - 4.5) < 1e-9
+    assert abs(stats["stddev"] - 2.949576240750525) < 1e-9
+    assert abs(stdlib.variance_basin(x for x in data) - 8.7) < 1e-9
+    assert stdlib.stats_basin([])["count"] == 0
+    assert stdlib.stddev_basin([5.0]) == 0
+
+
+def test_selection_median_and_quantiles():
+    assert stdlib.median_basin([5.0, 1.0, 3.0]) == 3.0
+    assert stdlib.median_basin(iter([4.0, 1.0, 3.0, 2.0])) == 2.5
+    assert stdlib.median_basin([]) == 0
+    big = [float((i * 7919) % 1000) for i in range(1000)]
+    assert stdlib.median_basin(big) == 499.5
+    assert stdlib.quantile_basin(big, 0.25) == sorted(big)[249] + 0.75 * (sorted(big)[250] - sorted(big)[249])
+    assert stdlib.percentile_basin([1.0, 2.0, 3.0, 4.0, 5.0], 100) == 5.0
+
+
+def test_unique_is_order_preserving():
+    assert stdlib.unique_basin(["b", "a", "b", "c", "a"]) == ["b", "a", "c"]
+    assert stdlib.unique_basin(iter([])) == []
+
+
+def test_lazy_stream_pipelines():
+    seen = []
+    def source():
+        for x in range(10):
+            seen.append(x)
+            yield x
+    evens = stdlib.filter_basin(source(), lambda x: x % 2 == 0)
+    squares = stdlib.map_basin(evens, lambda x: x * x)
+    assert seen == []  # nothing runs until a terminal operation
+    assert stdlib.reduce_basin(squares, lambda a, b: a + b, 0) == 120
+    assert seen == list(range(10))
+    try:
+        stdlib.measure(squares)
+        assert False, "Expected ValueError for a consumed one-shot stream"
+    except ValueError:
+        pass
+    # The parent shares the consumed source with the stream derived from it.
+    assert evens.consumed
+    try:
+        stdlib.measure(evens)
+        assert False, "Expected ValueError for the parent of a consumed stream"
+    except ValueError:
+        pass
+
+
+def test_stream_over_list_is_reusable():
+    stream = stdlib.map_basin([3, 1, 2], lambda x: x * 10, lazy=True)
+    assert stdlib.measure(stream) == 3
+    assert stdlib.sort_basin(stream) == [10, 20, 30]
+    assert stdlib.join_basin(stdlib.stream_basin(["a", "b"]), ",") == "a,b"
+    assert stdlib.avg_basin(stdlib.stream_basin([1, 2, 3])) == 2
+    assert stdlib.collect_basin(stdlib.filter_basin(stream, lambda x: x > 10)) == [30, 20]
+    assert stdlib.map_basin([1, 2], lambda x: x + 1) == [2, 3]
+
+
+def double(x):
+    return x * 2
+
+
+def add(a, b):
+    return a + b
+
+
+def test_parallel_map_filter_reduce():
+    data = list(range(40))
+    assert stdlib.parallel_map_basin(data, double, workers=2, chunk_size=7) == [x * 2 for x in data]
+    # Lambdas cannot be pickled and run on threads instead.
+    assert stdlib.parallel_filter_basin(data, lambda x: x % 3 == 0, workers=2, chunk_size=5) == data[::3]
+    assert stdlib.parallel_reduce_basin(data, add, 10, associative=True, workers=2, chunk_size=3) == 790
+    assert stdlib.parallel_reduce_basin([], add, 10, associative=True, workers=2) == 10
+    assert stdlib.parallel_reduce_basin(["a", "b", "c"], add, "", associative=True, workers=1) == "abc"
+
+
+def test_parallel_map_ships_compiled_pools():
+    from compiler.interpreter import run_program
+    from benchmarks.programs import binop, ident, num, pool, pour, program, ret
+    _, functions, _ = run_program(program(
+        pour('scale', num(3)),
+        pool('scaled', [('x', 'depth')], 'depth', [ret(binop('*', ident('x'), ident('scale')))]),
+    ))
+    data = stdlib.DepthBasin.from_values(range(20))
+    assert stdlib.parallel_map_basin(data, functions['scaled'], workers=2, chunk_size=6) == [x * 3.0 for x in range(20)]
+
+
+def test_shipped_pools_carry_only_what_they_read():
+    import pickle
+    from compiler.interpreter import run_program, ship_pool
+    from benchmarks.programs import binop, call, ident, num, pool, pour, program, ret
+    big = {'type': 'ListLiteral', 'elements': [binop('+', num(i), num(0)) for i in range(5000)]}
+    _, functions, _ = run_program(program(
+        pour('big', big),
+        pour('scale', num(3)),
+        pool('unused', [], 'depth', [ret(call('measure', ident('big')))]),
+        pool('times', [('x', 'depth')], 'depth', [ret(binop('*', ident('x'), ident('scale')))]),
+        pool('scaled', [('x', 'depth')], 'depth', [ret(call('times', ident('x')))]),
+    ))
+    _, (job,) = ship_pool(functions['scaled']).__reduce__()
+    frame, _, _, pools, _ = pickle.loads(job)
+    assert frame.vars == {'scale': 3.0}
+    assert sorted(declaration.name for declaration, _ in pools) == ['scaled', 'times']
+
+
+def test_shipped_jobs_go_to_one_task_per_worker(monkeypatch):
+    from concurrent.futures import Future
+    import compiler.interpreter as interpreter
+    sent = []
+    class Executor:
+        """Runs each task at once, in a worker that has lost the job by the time chunk 12 comes."""
+        def submit(self, fn, run, key, job, items):
+            sent.append(job is not None)
+            if items[0] == 12:
+                monkeypatch.setattr(interpreter, '_received', None)
+            future = Future()
+            try:
+                future.set_result(fn(run, key, job, items))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+    chunks = [[x, x + 1] for x in range(0, 20, 2)]
+    result = interpreter.map_shipped(Executor(), 2, stdlib._map_chunk, double, chunks)
+    assert result == [[x * 2, x * 2 + 2] for x in range(0, 20, 2)]
+    # Two tasks carry the job; the four key-only ones after it was lost are sent again with it.
+    assert sent == [True, True] + [False] * 8 + [True] * 4
@@ -0,0 +1,59 @@
+# Tests for parser spans, the interval tree and position-indexed symbol lookup
+
+import random
+from compiler.document import Document
+from compiler.parser import parse_cascade
+from compiler.symbols import IntervalTree
+
+SOURCE = """pour 1 into a:depth
+pool f(a:rivulet, b:depth):depth {
+  pour a into y
+}
+pour a into d
+"""
+
+def test_parser_records_spans():
+    decl, pool, _ = parse_cascade(SOURCE).body
+    assert decl.span == (1, 0, 1, 19)
+    assert pool.span == (2, 0, 4, 1)
+    assert pool.params[1].span == (2, 18, 2, 25)
+    assert pool.body[0].value.span == (3, 7, 3, 8)
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    intervals = []
+    for ix in range(300):
+        start = (rng.randrange(50), rng.randrange(40))
+        end = max(start, (start[0] + rng.randrange(4), rng.randrange(40)))
+        intervals.append((start, end, ix))
+    tree = IntervalTree(intervals)
+    for _ in range(200):
+        point = (rng.randrange(55), rng.randrange(40))
+        expected = {ix for start, end, ix in intervals if start <= point <= end}
+        assert set(tree.stab(point)) == expected
+    assert IntervalTree([]).stab((1, 1)) == []
+
+def test_definition_resolves_nested_scopes():
+    document = Document(SOURCE)
+    chunk, symbol = document.definition_at(2, 8)
+    assert (symbol.kind, symbol.detail) == ('param', 'rivulet')
+    assert document.location(chunk, symbol.span) == (1, 7, 1, 16)
+    chunk, symbol = document.definition_at(4, 6)
+    assert (symbol.kind, chunk.start) == ('variable', 0)
+    _, symbol = document.definition_at(1, 6)
+    assert symbol.detail == '(a:rivulet, b:depth):depth'
+
+def test_completions_include_enclosing_scopes():
+    document = Document(SOURCE)
+    assert set(document.completions(2, 2)) == {'a', 'b', 'd', 'f', 'y'}
+    assert document.completions(2, 2)['a'].kind == 'param'
+    assert document.completions(4, 0)['a'].kind == 'variable'
+    assert [symbol.name for _, symbol in document.outline()] == ['a', 'f', 'd']
+
+def test_symbols_follow_edits():
+    document = Document(SOURCE)
+    document.apply_change("\n\npool g(k:depth):depth { }", ((4, 13), (4, 13)))
+    chunk, symbol = document.definition("g", 0, 0)
+    assert (symbol.kind, chunk.start) == ('pool', 6)
+    document.apply_change("", ((5, 0), (6, 25)))
+    assert document.definition("g", 0, 0) == (None, None)
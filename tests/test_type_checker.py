@@ -0,0 +1,44 @@
+# Tests for interned types and remembered inference in the type checker
+
+import pickle
+import pytest
+from compiler.ast_nodes import ListLiteral, NumberLiteral, from_dict
+from compiler.type_checker import (
+    DEPTH, DEPTH_LIST, TypeEnv, TypeError, check_type, infer_type, intern_type, list_of,
+)
+from benchmarks.programs import binop, cycle, ident, num, pour, program
+
+def test_types_are_interned():
+    assert intern_type('[depth]') is DEPTH_LIST is list_of(DEPTH)
+    assert DEPTH_LIST.element is DEPTH and DEPTH.element is None
+    assert intern_type('[[rivulet]]').element is intern_type('[rivulet]')
+    assert pickle.loads(pickle.dumps(DEPTH_LIST)) is DEPTH_LIST
+    table = from_dict({'type': 'ListLiteral', 'elements': [{'type': 'ListLiteral', 'elements': [num(1)]}]})
+    assert infer_type(table, TypeEnv()) is intern_type('[[depth]]')
+    assert infer_type(table, TypeEnv()) == '[[depth]]'
+
+def test_only_closed_expressions_are_remembered():
+    closed = from_dict(binop('*', num(2), {'type': 'ListLiteral', 'elements': [num(1)]}))
+    scoped = from_dict(binop('*', ident('x'), num(2)))
+    env = TypeEnv()
+    env.set_var('x', 'depth')
+    assert infer_type(closed, env) is DEPTH_LIST and closed.inferred is DEPTH_LIST
+    assert infer_type(scoped, env) is DEPTH and scoped.inferred is None
+    env.set_var('x', '[depth]')
+    assert infer_type(scoped, env) is DEPTH_LIST
+    assert closed == from_dict(binop('*', num(2), {'type': 'ListLiteral', 'elements': [num(1)]}))
+
+def test_each_node_is_inferred_once():
+    # Shared subtrees make this a 2**60-path DAG; walking it more than once per node never finishes.
+    value = NumberLiteral(1.0)
+    for _ in range(60):
+        value = ListLiteral([value, value])
+    assert infer_type(value, TypeEnv()).startswith('[' * 60)
+
+def test_cycle_element_type():
+    env = TypeEnv()
+    check_type(program(pour('rows', {'type': 'ListLiteral', 'elements': [
+        {'type': 'ListLiteral', 'elements': [num(1)]}]}),
+        cycle(ident('rows'), 'row', [pour('first', ident('row'), '[depth]')])), env)
+    with pytest.raises(TypeError, match='Can only cycle through lists'):
+        check_type(cycle(num(1), 'x', []), TypeEnv())
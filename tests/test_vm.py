@@ -0,0 +1,98 @@
+# Tests for the bytecode VM engine
+
+from compiler.interpreter import run_program, CascadeRuntimeError, ReturnSignal
+import compiler.vm as vm
+from benchmarks.programs import (num, ident, binop, call, pour, fill, ret, cycle, when,
+                                 pool, program, loop_program, call_program)
+
+def string(value):
+    return {'type': 'StringLiteral', 'value': value}
+
+def test_vm_matches_interpreter():
+    for ast in (loop_program(40), call_program(40)):
+        env, functions, _ = vm.run_program(ast)
+        ref_env, ref_functions, _ = run_program(ast)
+        assert env.vars == ref_env.vars
+        assert set(functions) == set(ref_functions)
+
+def test_calls_lists_and_maps():
+    ast = program(
+        pool('pair', [('a', 'depth'), ('b', 'depth')], '[depth]', [
+            ret({'type': 'ListLiteral', 'elements': [ident('a'), binop('+', ident('a'), ident('b'))]}),
+        ]),
+        pour('xs', call('pair', num(1), num(2))),
+        pour('m', {'type': 'MapLiteral', 'pairs': [{'key': 'first', 'value': call('pair', num(3), num(4))}]}),
+        {'type': 'TypeDeclaration', 'name': 'Sample', 'fields': [{'name': 'ph', 'type': 'depth'}]},
+    )
+    env, functions, types = vm.run_program(ast)
+    assert env.get('xs') == [1.0, 3.0]
+    assert env.get('m') == {'first': [3.0, 7.0]}
+    assert types == {'Sample': {'ph': 'depth'}}
+
+def test_if_otherwise_and_cycle_return():
+    ast = program(
+        pool('first_big', [('xs', '[depth]')], 'depth', [
+            cycle(ident('xs'), 'x', [when(binop('>', ident('x'), num(10)), [ret(ident('x'))])]),
+            ret(num(-1)),
+        ]),
+        pour('hit', call('first_big', {'type': 'ListLiteral', 'elements': [num(3), num(12), num(20)]})),
+        pour('miss', call('first_big', {'type': 'ListLiteral', 'elements': [num(3)]})),
+        when(binop('==', ident('hit'), num(12)), [fill('hit', num(0))], [fill('hit', num(1))]),
+    )
+    env, _, _ = vm.run_program(ast)
+    assert env.get('hit') == 0
+    assert env.get('miss') == -1
+
+def test_try_catch_throw():
+    ast = program(
+        pool('guarded', [], 'rivulet', [
+            {'type': 'TryCatchStatement',
+             'tryBlock': [cycle({'type': 'ListLiteral', 'elements': [num(1)]}, 'x',
+                                [{'type': 'ThrowStatement', 'value': string('boom')}])],
+             'errVar': 'e',
+             'catchBlock': [ret(ident('e'))]},
+        ]),
+        pour('msg', call('guarded')),
+    )
+    env, _, _ = vm.run_program(ast)
+    assert env.get('msg') == 'boom'
+    try:
+        vm.run_program(program({'type': 'ThrowStatement', 'value': string('bad')}))
+        assert False, "Expected CascadeRuntimeError"
+    except CascadeRuntimeError as e:
+        assert str(e) == 'bad'
+
+def test_top_level_return_and_disassemble():
+    try:
+        vm.run_program(program(ret(num(1))))
+        assert False, "Expected ReturnSignal"
+    except ReturnSignal as sig:
+        assert sig.value == 1.0
+    listing = vm.disassemble(vm.compile_program(call_program(2)))
+    assert 'MAKE_FUNCTION' in listing and 'code clamp' in listing
+
+def test_list_arithmetic_matches_interpreter():
+    lst = lambda *els: {'type': 'ListLiteral', 'elements': list(els)}
+    ast = program(
+        pour('a', num(1)),
+        pour('xs', lst(ident('a'), num(2))),
+        pour('ys', binop('*', ident('xs'), num(2))),
+        pour('zs', binop('-', lst(num(1), num(2)), num(2))),
+        pour('ws', binop('+', ident('xs'), lst(num(3)))),
+        pour('vs', binop('/', ident('ys'), ident('xs'))),
+        pool('mismatch', [('xs', '[depth]')], 'rivulet', [
+            {'type': 'TryCatchStatement',
+             'tryBlock': [pour('bad', binop('*', ident('xs'), lst(num(1))))],
+             'errVar': 'e',
+             'catchBlock': [ret(ident('e'))]},
+            ret(string('')),
+        ]),
+        pour('caught', call('mismatch', ident('xs'))),
+    )
+    env, _, _ = vm.run_program(ast)
+    ref_env, _, _ = run_program(ast)
+    for name in ('ys', 'zs', 'ws', 'vs', 'caught'):
+        assert env.get(name) == ref_env.get(name)
+    assert env.get('ys') == [2.0, 4.0] and env.get('zs') == [-1.0, 0.0]
+    assert env.get('ws') == [1.0, 2.0, 3.0] and env.get('vs') == [2.0, 2.0]
+    assert 'length mismatch' in env.get('caught')
@@ -0,0 +1,66 @@
+# Tests for the workspace declaration index behind cross-file LSP requests
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from compiler.workspace import WorkspaceIndex, index_file, qualified_name_at, scan_declarations
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+def make_project(tmp_path):
+    project = tmp_path / "app"
+    write(project / "fountain.config", json.dumps({"channels": ["shared/util.pool"]}))
+    write(project / "pools" / "logging.pool", "pool warn(msg:rivulet) {\n  print(msg)\n}\n")
+    write(project / "shared" / "util.pool", "pool clamp(x:depth, lo:depth):depth { }\n")
+    write(project / "types" / "Sample.res", "reservoir Sample {\n  ph: depth,\n  sites: [rivulet]\n}\n")
+    main = write(project / "main.casc", "open channel pools.logging\nlet total = 0\n")
+    return project, main
+
+def test_scan_skips_bodies_and_survives_unsupported_syntax():
+    symbols, imports = scan_declarations(
+        "open channel a.b\npool f(xs:[depth]):[depth] {\n  pour 1 into inner\n}\n"
+        "pour {k: 1,\n  j: 2} into m:map\ndam 3 as limit\nlet y = 'oops'\npool late() { }\n")
+    assert imports == ['a.b']
+    assert sorted(symbols) == ['f', 'limit', 'm', 'y']
+    f, = symbols['f']
+    assert (f.kind, f.detail, f.span) == ('pool', '(xs:[depth]):[depth]', (2, 0, 2, 26))
+    assert symbols['m'][0].span[:3] == (5, 0, 6)
+
+def test_index_resolves_across_channels(tmp_path):
+    project, main = make_project(tmp_path)
+    index = WorkspaceIndex(str(tmp_path))
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert index.refresh(executor) == 4
+    assert index.refresh() == 0
+    path, symbol = index.definition(main, "warn", "logging")
+    assert path.endswith("logging.pool") and symbol.detail == "(msg:rivulet)"
+    assert index.definition(main, "warn", "other") == (None, None)
+    # fountain.config channels and reservoirs are visible without an explicit open.
+    assert index.definition(main, "clamp")[1].detail == "(x:depth, lo:depth):depth"
+    assert index.definition(main, "Sample")[1].detail == "{ph:depth, sites:[rivulet]}"
+    assert sorted(index.completions(main)) == ['Sample', 'clamp', 'warn']
+
+def test_index_follows_file_changes(tmp_path):
+    project, main = make_project(tmp_path)
+    index = WorkspaceIndex(str(tmp_path))
+    index.refresh()
+    logging = str(project / "pools" / "logging.pool")
+    write(logging, "pool shout(msg:rivulet) { }\n")
+    assert index.changed(logging)
+    index.update(logging, index_file(logging))
+    assert sorted(index.completions(main)) == ['Sample', 'clamp', 'shout']
+    os.remove(logging)
+    assert not index.changed(logging, deleted=True)
+    assert index.definition(main, "shout") == (None, None)
+    # Removing fountain.config moves module names to the workspace root.
+    assert not index.changed(str(project / "fountain.config"), deleted=True)
+    assert index.definition(main, "clamp") == (None, None)
+    assert index.definition(main, "Sample", imports=["app.types.Sample"])[1].kind == 'type'
+
+def test_qualified_name_at():
+    assert qualified_name_at("draw from logging.warn(x)", 20) == ('logging', 'warn')
+    assert qualified_name_at("pour total into t", 6) == (None, 'total')